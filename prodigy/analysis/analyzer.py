@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-import functools
 import logging
-from typing import Union, Sequence, get_args
+from dataclasses import dataclass
+from typing import Union, Sequence, Callable, Collection, Dict, Tuple, Type, get_args
 
 from probably.pgcl import Program, Instr, SkipInstr, AbortInstr, WhileInstr, LoopInstr, QueryInstr, Query, \
     ObserveInstr, ChoiceInstr, AsgnInstr, IfInstr
@@ -10,6 +10,7 @@ from probably.pgcl import Program, Instr, SkipInstr, AbortInstr, WhileInstr, Loo
 from prodigy.analysis.config import ForwardAnalysisConfig
 from prodigy.analysis.exceptions import ObserveZeroEventError
 from prodigy.analysis.instructionhandler.assignment_handler import AssignmentHandler
+from prodigy.analysis.instructionhandler.instruction_handler import InstructionHandler
 from prodigy.analysis.instructionhandler.ite_handler import ITEHandler
 from prodigy.analysis.instructionhandler.loop_handler import LoopHandler
 from prodigy.analysis.instructionhandler.observe_handler import ObserveHandler
@@ -18,12 +19,27 @@ from prodigy.analysis.instructionhandler.program_info import ProgramInfo
 from prodigy.analysis.instructionhandler.query_handler import QueryHandler
 from prodigy.analysis.instructionhandler.queryblock_handler import QueryBlockHandler
 from prodigy.analysis.instructionhandler.while_handler import WhileHandler
-from prodigy.distribution import Distribution
+from prodigy.analysis.fusion import FusedAssignments, fuse_assignments
+from prodigy.analysis.independence import independent_vars
+from prodigy.analysis.independence.utils import _written_vars
+from prodigy.analysis.liveness import live_variables
+from prodigy.distribution import Distribution, MarginalType
+from prodigy.distribution.factored_distribution import FactoredDistribution
 from prodigy.util.color import Style
 from prodigy.util.logger import log_setup
 
 logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
 
+Analyzer = Callable[
+    [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
+    tuple[Distribution, Distribution]
+]
+
+Semantics = Callable[
+    [Instr, ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig, Analyzer],
+    tuple[Distribution, Distribution]
+]
+
 
 def condition_distribution(
         dist: Distribution, error_prob: Distribution,
@@ -48,15 +64,282 @@ def compute_discrete_distribution(
     variables = set(prog_info.variables.keys()).union(dist.get_variables())
     parameters = set(prog_info.parameters.keys()).union(dist.get_parameters())
     initial_dist = dist.set_variables(*variables).set_parameters(*parameters)
+    if config.factorize_distribution:
+        initial_dist = FactoredDistribution.factorize(initial_dist, _dependent_groups(prog_info, variables))
     error_prob = config.factory.one(*variables) * 0
-    dist, error_prob = compute_semantics(prog_info.instructions,
-                                         prog_info, initial_dist,
-                                         error_prob, config)
-    if config.normalize:
+    analyzer: Analyzer = ProgramPlan(prog_info) if config.use_program_plan else compute_semantics
+    if config.checkpoints is not None or config.marginalize_dead_variables:
+        dist, error_prob = _analyze_top_level_instructions(prog_info, initial_dist, error_prob, config, analyzer)
+    else:
+        dist, error_prob = analyzer(prog_info.instructions,
+                                    prog_info, initial_dist,
+                                    error_prob, config)
+    if isinstance(dist, FactoredDistribution):
+        dist = dist.joint()
+    if isinstance(error_prob, FactoredDistribution):
+        error_prob = error_prob.joint()
+    if config.normalize and not prog_info.is_conditioning_free:
         dist, error_prob = condition_distribution(dist, error_prob, config)
     return dist, error_prob
 
 
+def _dependent_groups(prog_info: ProgramInfo, variables: Collection[str]) -> list[set[str]]:
+    """
+    Groups the variables into the connected components of the relation "not known to be independent". Variables in
+    different groups stay independent throughout the program, so they can be kept in separate factors.
+    """
+    independent = prog_info.independents_vars or frozenset(independent_vars(prog_info.program))
+    groups: list[set[str]] = []
+    for var in variables:
+        dependent = [group for group in groups if any(frozenset((var, other)) not in independent for other in group)]
+        groups = [group for group in groups if group not in dependent]
+        groups.append({var}.union(*dependent))
+    return groups
+
+
+def _dead_variables(prog_info: ProgramInfo, variables: Collection[str]) -> list[set[str]]:
+    """
+    Determines for every top-level instruction which variables are dead after it and have not been marginalized out
+    before. Dead variables stay declared, i.e., they are reset to zero until they are written again.
+    """
+    program_vars = frozenset(prog_info.variables.keys())
+    eliminated: set[str] = set()
+    result = []
+    for instr, live in zip(prog_info.instructions, live_variables(prog_info.instructions, variables)):
+        eliminated.difference_update(_written_vars([instr]))
+        dead = program_vars - live - eliminated - prog_info.so_vars
+        result.append(set(dead))
+        eliminated.update(dead)
+    return result
+
+
+def _analyze_top_level_instructions(
+        prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution, config: ForwardAnalysisConfig,
+        analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    """
+    Analyzes the top-level instructions one after another. If configured, variables are marginalized out of the
+    distribution as soon as they are dead, and the analysis resumes from the checkpoints of an `AnalysisSession`.
+    """
+    variables = distribution.get_variables()
+    dead = _dead_variables(prog_info, variables) if config.marginalize_dead_variables else None
+
+    def step(index: int, distribution: Distribution, error_prob: Distribution) -> tuple[Distribution, Distribution]:
+        instr = prog_info.instructions[index]
+        if config.trace is None:
+            distribution, error_prob = analyzer([instr], prog_info, distribution, error_prob, config)
+        else:
+            # The instruction is analyzed as a block of its own, but traced at its position in the program.
+            with config.trace.scope(config.trace.position(), offset=index):
+                distribution, error_prob = analyzer([instr], prog_info, distribution, error_prob, config)
+        if dead is not None and len(dead[index]) > 0:
+            logger.debug("Marginalizing dead variables %s after %s", dead[index], instr)
+            distribution = distribution.marginal(*dead[index], method=MarginalType.EXCLUDE).set_variables(*variables)
+        return distribution, error_prob
+
+    if config.checkpoints is not None:
+        return config.checkpoints.analyze(prog_info, distribution, error_prob, config, step, dead)
+    for index in range(len(prog_info.instructions)):
+        distribution, error_prob = step(index, distribution, error_prob)
+    return distribution, error_prob
+
+
+# ==================================== INSTRUCTION SEMANTICS ====================================
+
+def _skip(instruction: Instr, prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution,
+          config: ForwardAnalysisConfig, analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    # pylint: disable=unused-argument
+    return distribution, error_prob
+
+
+def _abort(instruction: Instr, prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution,
+           config: ForwardAnalysisConfig, analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    # pylint: disable=unused-argument
+    return distribution.factory().undefined(*distribution.get_variables()), error_prob
+
+
+def _query(instruction: Instr, prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution,
+           config: ForwardAnalysisConfig, analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    logger.info("%s gets handled", instruction)
+    if config.normalize and not prog_info.is_conditioning_free:
+        distribution, error_prob = condition_distribution(
+            distribution, error_prob,
+            config)  # evaluate queries on conditioned distribution
+        error_prob *= "0"
+    return QueryHandler.compute(instruction, prog_info, distribution,
+                                error_prob, config, analyzer)
+
+
+def _fused_assignments(instruction: FusedAssignments, prog_info: ProgramInfo, distribution: Distribution,
+                       error_prob: Distribution, config: ForwardAnalysisConfig,
+                       analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    # pylint: disable=unused-argument
+    logger.info("Applying fused assignments %s", instruction)
+    return distribution.update_affine(dict(instruction.updates)), error_prob
+
+
+def _handled_by(handler: Type[InstructionHandler], message: str | None = None) -> Semantics:
+    """Creates the semantics of an instruction which is entirely described by the given `handler`."""
+
+    def semantics(instruction: Instr, prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution,
+                  config: ForwardAnalysisConfig, analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+        if message is not None:
+            logger.info(message, instruction)
+        return handler.compute(instruction, prog_info, distribution, error_prob, config, analyzer)
+
+    semantics.__name__ = handler.__name__
+    return semantics
+
+
+_SEMANTICS: Dict[type, Semantics] = {
+    SkipInstr: _skip,
+    AbortInstr: _abort,
+    WhileInstr: _handled_by(WhileHandler, "\n%s gets handled"),
+    IfInstr: _handled_by(ITEHandler),
+    AsgnInstr: _handled_by(AssignmentHandler),
+    ChoiceInstr: _handled_by(PChoiceHandler),
+    ObserveInstr: _handled_by(ObserveHandler, "%s gets handled"),
+    LoopInstr: _handled_by(LoopHandler, "%s gets handled"),
+    QueryInstr: _handled_by(QueryBlockHandler, "entering query block %s"),
+    FusedAssignments: _fused_assignments,
+    **{query_type: _query for query_type in get_args(Query)}
+}
+"""Maps each instruction type to its semantics. Lookup is done on the exact type of an instruction."""
+
+
+def _semantics_of(instruction: Instr) -> Semantics:
+    """Returns the semantics for the given instruction, falling back to subclass checks for unknown types."""
+    semantics = _SEMANTICS.get(type(instruction))
+    if semantics is not None:
+        return semantics
+    for instr_type, candidate in _SEMANTICS.items():
+        if isinstance(instruction, instr_type):
+            return candidate
+    raise TypeError("illegal instruction")
+
+
+# ==================================== EXECUTION PLANS ====================================
+
+@dataclass(frozen=True)
+class PlanStep:
+    """A single instruction together with its (already resolved) semantics."""
+
+    instruction: Instr
+    semantics: Semantics
+
+
+@dataclass(frozen=True)
+class Plan:
+    """A flat sequence of plan steps, lowered from either a single instruction or a block of instructions."""
+
+    steps: Tuple[PlanStep, ...]
+    is_block: bool
+    """Whether the plan originates from an instruction list (only then intermediate results are shown)."""
+
+
+def lower(instruction: Union[Instr, Sequence[Instr]], fusion_vars: Collection[str] | None = None) -> Plan:
+    """
+    Lowers an instruction or an instruction block into a flat plan. If `fusion_vars` are given, runs of affine
+    assignments to these variables are fused into single steps.
+    """
+    if isinstance(instruction, list):
+        instrs = instruction if fusion_vars is None else fuse_assignments(instruction, fusion_vars)
+        return Plan(tuple(PlanStep(instr, _semantics_of(instr)) for instr in instrs), True)
+    return Plan((PlanStep(instruction, _semantics_of(instruction)),), False)
+
+
+def _fusion_vars(prog_info: ProgramInfo, config: ForwardAnalysisConfig) -> Collection[str] | None:
+    if config.fuse_assignments and not config.show_intermediate_steps:
+        return prog_info.variables.keys()
+    return None
+
+
+def _show_step(instr: Instr, result: Distribution, prog_info: ProgramInfo, config: ForwardAnalysisConfig):
+    if isinstance(instr, (WhileInstr, IfInstr, LoopInstr)):
+        print("\n")
+    output = f"\n{Style.BLUE}Instruction:{Style.RESET} {instr}\t {Style.GREEN}Result:{Style.RESET} {result}"
+    print(output, prog_info.so_vars)
+    if config.step_wise:
+        input("Next step [Enter]")
+
+
+def execute(plan: Plan, prog_info: ProgramInfo, distribution: Distribution, error_prob: Distribution,
+            config: ForwardAnalysisConfig, analyzer: Analyzer) -> tuple[Distribution, Distribution]:
+    """Runs all steps of `plan` in order. Nested blocks are analyzed by calling `analyzer`."""
+    show_steps = plan.is_block and config.show_intermediate_steps
+    for index, step in enumerate(plan.steps):
+        if config.trace is None:
+            distribution, error_prob = step.semantics(step.instruction, prog_info, distribution, error_prob, config,
+                                                      analyzer)
+        else:
+            with config.trace.record(step.semantics.__name__.lstrip("_"), step.instruction, index,
+                                     distribution) as record_result:
+                distribution, error_prob = step.semantics(step.instruction, prog_info, distribution, error_prob,
+                                                          config, analyzer)
+                record_result(distribution)
+        if show_steps:
+            _show_step(step.instruction, distribution, prog_info, config)
+    return distribution, error_prob
+
+
+def _analyze(planner: Callable[[Union[Instr, Sequence[Instr]], Collection[str] | None], Plan], analyzer: Analyzer,
+             instruction: Union[Instr, Sequence[Instr]], prog_info: ProgramInfo, distribution: Distribution,
+             error_prob: Distribution, config: ForwardAnalysisConfig) -> tuple[Distribution, Distribution]:
+    """Executes the plan for `instruction`, consulting the semantics cache first if one is configured."""
+    fusion_vars = _fusion_vars(prog_info, config)
+    if config.semantics_cache is None:
+        return execute(planner(instruction, fusion_vars), prog_info, distribution, error_prob, config, analyzer)
+    return config.semantics_cache.lookup_or_compute(
+        instruction, prog_info, distribution, error_prob, config,
+        lambda: execute(planner(instruction, fusion_vars), prog_info, distribution, error_prob, config, analyzer))
+
+
+class ProgramPlan:
+    """
+    Analyzer that lowers a program once into flat plans of instruction semantics and reuses them whenever a block
+    is executed again, e.g., in every iteration of a loop or for every branch of a conditional.
+
+    Instances can be used anywhere a `compute_semantics`-like analyzer is expected.
+    """
+
+    def __init__(self, prog_info: ProgramInfo | None = None):
+        # Plans are keyed by the id of the lowered object (and whether assignments are fused). We keep a reference to
+        # the object itself, so that its id cannot be reused as long as the plan is cached.
+        self._plans: Dict[Tuple[int, bool], Tuple[object, Plan]] = {}
+        if prog_info is not None:
+            self._lower_recursively(prog_info.instructions)
+
+    def __getstate__(self):
+        # Plans hold references to local functions and are cheap to recompute, so they are not transferred.
+        return {"_plans": {}}
+
+    def _lower_recursively(self, instructions: Sequence[Instr]):
+        self.plan(instructions)
+        for instr in instructions:
+            for block_name in ("body", "true", "false", "lhs", "rhs"):
+                block = getattr(instr, block_name, None)
+                if isinstance(block, list):
+                    self._lower_recursively(block)
+
+    def plan(self, instruction: Union[Instr, Sequence[Instr]], fusion_vars: Collection[str] | None = None) -> Plan:
+        """Returns the (cached) plan for the given instruction or instruction block."""
+        key = (id(instruction), fusion_vars is not None)
+        cached = self._plans.get(key)
+        if cached is not None and cached[0] is instruction:
+            return cached[1]
+        plan = lower(instruction, fusion_vars)
+        self._plans[key] = (instruction, plan)
+        return plan
+
+    def __call__(self,
+                 instruction: Union[Instr, Sequence[Instr]],
+                 prog_info: ProgramInfo,
+                 distribution: Distribution,
+                 error_prob: Distribution,
+                 config: ForwardAnalysisConfig = ForwardAnalysisConfig()
+                 ) -> tuple[Distribution, Distribution]:
+        return _analyze(self.plan, self, instruction, prog_info, distribution, error_prob, config)
+
+
 def compute_semantics(
         instruction: Union[Instr, Sequence[Instr]],
         prog_info: ProgramInfo,
@@ -64,78 +347,4 @@ def compute_semantics(
         error_prob: Distribution,
         config=ForwardAnalysisConfig()
 ) -> tuple[Distribution, Distribution]:
-    def _show_steps(inp: tuple[Distribution, Distribution],
-                    instr: Instr) -> tuple[Distribution, Distribution]:
-        dist, error_prob = inp
-        res, error_prob = compute_semantics(instr, prog_info, dist,
-                                            error_prob, config)
-        if isinstance(instr, (WhileInstr, IfInstr, LoopInstr)):
-            print("\n")
-        output = f"\n{Style.BLUE}Instruction:{Style.RESET} {instr}\t {Style.GREEN}Result:{Style.RESET} {res}"
-        print(output, prog_info.so_vars)
-        if config.step_wise:
-            input("Next step [Enter]")
-        return res, error_prob
-
-    def _dont_show_steps(
-            inp: tuple[Distribution, Distribution],
-            instr: Instr) -> tuple[Distribution, Distribution]:
-        dist, error_prob = inp
-        return compute_semantics(instr, prog_info, dist, error_prob,
-                                 config)
-
-    if isinstance(instruction, list):
-        func = _show_steps if config.show_intermediate_steps else _dont_show_steps
-        return functools.reduce(func, instruction,
-                                (distribution, error_prob))
-
-    elif isinstance(instruction, SkipInstr):
-        return distribution, error_prob
-
-    elif isinstance(instruction, AbortInstr):
-        return distribution.factory().undefined(
-            *distribution.get_variables()), error_prob
-
-    elif isinstance(instruction, WhileInstr):
-        logger.info("\n%s gets handled", instruction)
-        return WhileHandler.compute(instruction, prog_info, distribution,
-                                    error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, IfInstr):
-        return ITEHandler.compute(instruction, prog_info, distribution,
-                                  error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, AsgnInstr):
-        return AssignmentHandler.compute(instruction, prog_info,
-                                         distribution, error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, ChoiceInstr):
-        return PChoiceHandler.compute(instruction, prog_info, distribution,
-                                      error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, ObserveInstr):
-        logger.info("%s gets handled", instruction)
-        return ObserveHandler.compute(instruction, prog_info, distribution,
-                                      error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, get_args(Query)):
-        logger.info("%s gets handled", instruction)
-        if config.normalize:
-            distribution, error_prob = condition_distribution(
-                distribution, error_prob,
-                config)  # evaluate queries on conditioned distribution
-            error_prob *= "0"
-        return QueryHandler.compute(instruction, prog_info, distribution,
-                                    error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, LoopInstr):
-        logger.info("%s gets handled", instruction)
-        return LoopHandler.compute(instruction, prog_info, distribution,
-                                   error_prob, config, compute_semantics)
-
-    elif isinstance(instruction, QueryInstr):
-        logger.info("entering query block")
-        return QueryBlockHandler.compute(instruction, prog_info,
-                                         distribution, error_prob, config, compute_semantics)
-
-    raise TypeError("illegal instruction")
+    return _analyze(lower, compute_semantics, instruction, prog_info, distribution, error_prob, config)
@@ -0,0 +1,156 @@
+"""
+---------------
+Semantics Cache
+---------------
+
+Memoizes the results of the forward analysis for (sub-)programs. Whenever the same instruction block is analyzed on
+the same input distribution again, e.g., a loop body during repeated equivalence checks or candidate invariants
+during synthesis, the previously computed result is reused instead of being recomputed symbolically.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Sequence, Tuple, Union, get_args
+
+from probably.pgcl import Instr, Query, QueryInstr, Walk, WhileInstr, walk_instrs
+
+from prodigy.analysis.loop_policy import LoopPolicy
+from prodigy.distribution import Distribution
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+
+def distribution_key(dist: Distribution) -> Hashable:
+    """A hashable key identifying `dist` up to its normal form, see `Distribution.canonical_key`."""
+    return dist.canonical_key()
+
+
+def config_key(config) -> Hashable:
+    """A hashable key of all settings of `config` which affect the results of the analysis."""
+    return (config.engine,
+            config.use_rings,
+            config.use_long_double,
+            config.truncation_degree,
+            config.strategy,
+            config.templ_heuristic,
+            config.positivity_heuristic,
+            config.solver_type)
+
+
+class SemanticsCache:
+    """
+    A least-recently-used cache for results of `compute_semantics`.
+
+    Entries are keyed by the structure of the analyzed instruction block, the input distribution, the input error
+    probability, the relevant configuration (see `config_key`) and the policies of contained loops. Blocks containing
+    queries (which have side effects like printing) or interactively handled while-loops are never cached.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        if maxsize <= 0:
+            raise ValueError("The cache size has to be positive.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Tuple[Distribution, Distribution]] = OrderedDict()
+        # The structural key of an instruction block is cached by id. The block itself is kept alive as long as its
+        # key is cached, so that ids cannot be reused by other blocks. At most `maxsize` blocks are kept.
+        self._instruction_keys: OrderedDict[int, Tuple[object, Hashable | None, Tuple[WhileInstr, ...]]] = \
+            OrderedDict()
+        # Branches may be analyzed concurrently, see `prodigy.analysis.parallel`.
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._instruction_keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def _instruction_key(self, instruction: Union[Instr, Sequence[Instr]]
+                         ) -> Tuple[Hashable | None, Tuple[WhileInstr, ...]]:
+        """
+        Computes a structural key for the instruction (block) or `None` in case it must not be cached, together with
+        all while-loops contained in the block.
+        """
+        with self._lock:
+            cached = self._instruction_keys.get(id(instruction))
+            if cached is not None and cached[0] is instruction:
+                self._instruction_keys.move_to_end(id(instruction))
+                return cached[1], cached[2]
+
+        instrs = instruction if isinstance(instruction, list) else [instruction]
+        key: Hashable | None = tuple((type(instr).__name__, str(instr)) for instr in instrs)
+        loops = []
+        for instr_ref in walk_instrs(Walk.DOWN, instrs):
+            if isinstance(instr_ref.val, (QueryInstr, *get_args(Query))):
+                key = None
+                break
+            if isinstance(instr_ref.val, WhileInstr):
+                loops.append(instr_ref.val)
+        with self._lock:
+            self._instruction_keys[id(instruction)] = (instruction, key, tuple(loops))
+            if len(self._instruction_keys) > self.maxsize:
+                self._instruction_keys.popitem(last=False)
+        return key, tuple(loops)
+
+    def lookup_or_compute(self,
+                          instruction: Union[Instr, Sequence[Instr]],
+                          prog_info,
+                          distribution: Distribution,
+                          error_prob: Distribution,
+                          config,
+                          compute: Callable[[], Tuple[Distribution, Distribution]]
+                          ) -> Tuple[Distribution, Distribution]:
+        """
+        Returns the cached result for analyzing `instruction` on the given inputs. If there is none, the result
+        is computed by calling `compute` and stored afterwards.
+        """
+        instruction_key, loops = self._instruction_key(instruction)
+        if instruction_key is None or config.show_intermediate_steps:
+            return compute()
+        loop_policies = tuple(config.loop_policy_for(loop) for loop in loops)
+        if any(policy.strategy == LoopPolicy.Strategy.INTERACTIVE for policy in loop_policies):
+            return compute()
+
+        key = (instruction_key,
+               prog_info.so_vars,
+               str(prog_info.functions),
+               distribution_key(distribution),
+               distribution_key(error_prob),
+               config_key(config),
+               loop_policies)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                logger.debug("Cache hit for %s", instruction)
+                return result
+            self.misses += 1
+
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def __str__(self) -> str:
+        return f"SemanticsCache(size={len(self)}/{self.maxsize}, hits={self.hits}, misses={self.misses})"
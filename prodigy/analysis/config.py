@@ -3,21 +3,31 @@
 Forward Analysis Config
 -----------------------
 """
+import os
 from enum import Enum, auto
-from typing import Type
+from typing import Dict, Optional, Type
 
 import attr
+import numpy as np
+from probably.pgcl import WhileInstr
 
 from prodigy.analysis.optimization import Optimizer
 from prodigy.analysis.optimization.gf_optimizer import GFOptimizer
+from prodigy.distribution.dense_distribution import DensePGF
 from prodigy.distribution.fast_generating_function import ProdigyPGF
 from prodigy.distribution.generating_function import (GeneratingFunction,
                                                       SympyPGF)
+from prodigy.distribution.sparse_distribution import SparsePGF
 from prodigy.distribution.symengine_distribution import SymenginePGF
+from prodigy.distribution.truncated_distribution import TruncatedPGF
+from .cache import SemanticsCache
 from .evtinvariants.heuristics.positivity.heuristics_factory import PositivityHeuristics
 from .evtinvariants.heuristics.strategies import SynthesisStrategies
 from .evtinvariants.heuristics.templates.templates_factory import TemplateHeuristics
 from .exceptions import ConfigurationError
+from .incremental import AnalysisSession
+from .loop_policy import LoopPolicy
+from .trace import Trace
 from .solver.solver_type import SolverType
 from ..distribution.distribution import CommonDistributionsFactory
 
@@ -33,6 +43,17 @@ class ForwardAnalysisConfig:
         SYMPY = auto()
         GINAC = auto()
         SYMENGINE = auto()
+        SPARSE = auto()
+        NUMPY = auto()
+        TRUNCATED = auto()
+
+    class Parallelism(Enum):
+        """
+        This enumeration specifies how independent branches of a program are evaluated.
+        """
+        NONE = auto()
+        THREADS = auto()
+        PROCESSES = auto()
 
     show_intermediate_steps: bool = attr.ib(default=False)
     """Enables the printing of results after each instruction."""
@@ -43,12 +64,21 @@ class ForwardAnalysisConfig:
     use_simplification: bool = attr.ib(default=False)
     """Enables simplification heuristics for expressions."""
 
+    use_rings: bool = attr.ib(default=False)
+    """Lets the sympy engine represent rational functions as fractions of sparse polynomials over QQ."""
+
     use_latex: bool = attr.ib(default=False)
     """Toggle to print LaTeX-Code instead of ASCII expressions."""
 
     engine: Engine = attr.ib(default=Engine.SYMPY)
     """Selects the distribution backend."""
 
+    use_long_double: bool = attr.ib(default=False)
+    """Uses extended precision floats instead of doubles in the numpy engine."""
+
+    truncation_degree: int = attr.ib(default=100)
+    """The largest value of each variable that is stored by the truncated engine."""
+
     normalize: bool = attr.ib(default=True)
     """Switch to compute the normalized distribution"""
 
@@ -67,6 +97,52 @@ class ForwardAnalysisConfig:
     show_all_invs: bool = attr.ib(default=False)
     """Toggels printing of spurious invariants"""
 
+    use_program_plan: bool = attr.ib(default=False)
+    """Lowers the program once into a dispatch plan which is reused for repeatedly executed blocks."""
+
+    semantics_cache: Optional[SemanticsCache] = attr.ib(default=None)
+    """If set, results of analyzed (sub-)programs are memoized in this cache and reused on identical inputs."""
+
+    branch_parallelism: Parallelism = attr.ib(default=Parallelism.NONE)
+    """Selects whether branches of conditionals and probabilistic choices are analyzed concurrently."""
+
+    max_workers: int = attr.ib(default=os.cpu_count() or 1)
+    """The maximal number of workers used for concurrently analyzing branches."""
+
+    loop_policy: LoopPolicy = attr.ib(factory=LoopPolicy)
+    """The default policy for handling while-loops."""
+
+    loop_policies: Dict[str, LoopPolicy] = attr.ib(factory=dict)
+    """Policies for individual while-loops, keyed either by the loop itself or by its guard (as strings)."""
+
+    marginalize_dead_variables: bool = attr.ib(default=False)
+    """Marginalizes variables out of the distribution as soon as they are no longer read by the remaining program."""
+
+    fuse_assignments: bool = attr.ib(default=False)
+    """Applies runs of consecutive affine assignments as a single simultaneous update."""
+
+    factorize_distribution: bool = attr.ib(default=False)
+    """
+    Keeps groups of independent variables (according to the static independence analysis) in separate factors of
+    the distribution, which are only multiplied out when an instruction couples them.
+    """
+
+    trace: Optional[Trace] = attr.ib(default=None)
+    """If set, an event with timing and size metrics is recorded for every analyzed instruction."""
+
+    checkpoints: Optional[AnalysisSession] = attr.ib(default=None)
+    """
+    If set, the distribution after every top-level instruction is checkpointed in the session, and the analysis of a
+    program resumes from the longest prefix which has been analyzed before on the same input.
+    """
+
+    def loop_policy_for(self, loop: WhileInstr) -> LoopPolicy:
+        """Returns the policy used to handle `loop`."""
+        for key in (str(loop), str(loop.cond)):
+            if key in self.loop_policies:
+                return self.loop_policies[key]
+        return self.loop_policy
+
     @property
     def optimizer(self) -> Type[Optimizer]:
         if self.engine == ForwardAnalysisConfig.Engine.SYMPY:
@@ -75,6 +151,10 @@ class ForwardAnalysisConfig:
             raise ConfigurationError(
                 "The configured engine does not implement an optimizer.")
 
+    @property
+    def _dtype(self) -> Type[np.floating]:
+        return np.longdouble if self.use_long_double else np.float64
+
     @property
     def factory(self) -> Type[CommonDistributionsFactory]:
         if self.engine == self.Engine.SYMPY:
@@ -83,9 +163,16 @@ class ForwardAnalysisConfig:
             return ProdigyPGF
         elif self.engine == self.Engine.SYMENGINE:
             return SymenginePGF
+        elif self.engine == self.Engine.SPARSE:
+            return SparsePGF
+        elif self.engine == self.Engine.NUMPY:
+            return DensePGF.configured(dtype=self._dtype)
+        elif self.engine == self.Engine.TRUNCATED:
+            return TruncatedPGF.configured(dtype=self._dtype, degree=self.truncation_degree)
         else:
             return CommonDistributionsFactory
 
     def __attrs_post_init__(self):
         GeneratingFunction.use_latex_output = self.use_latex
         GeneratingFunction.use_simplification = self.use_simplification
+        GeneratingFunction.use_rings = self.use_rings
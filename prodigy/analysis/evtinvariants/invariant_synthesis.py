@@ -1,5 +1,6 @@
+import itertools
 import logging
-from typing import List, Callable, Union, Sequence, Tuple
+from typing import List, Callable, Optional, Union, Sequence, Tuple
 
 import sympy
 from probably.pgcl import WhileInstr, Instr
@@ -25,14 +26,25 @@ def evt_invariant_synthesis(loop: WhileInstr,
                                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution,
                                  ForwardAnalysisConfig],
                                 Tuple[Distribution, Distribution]
-                            ]
+                            ],
+                            max_candidates: Optional[int] = None,
+                            verbose: bool = True
                             ) -> List[Tuple[Distribution, Union[bool, None]]]:
+    """
+    Synthesizes EVT invariants for the loop by checking the candidates of the strategy's template heuristic. If
+    `max_candidates` is given, at most this many candidates are checked, otherwise the enumeration may not terminate.
+    Progress is printed if `verbose` is set, and logged otherwise.
+    """
     logger.debug("Invariant Synthesis for loop %s with initial distribution %s.", loop, distribution)
     zero_dist: Distribution = config.factory.from_expr("0", *prog_info.program.variables)
-    print(f"{Style.YELLOW}Invariant synthesis initiated...{Style.RESET}")
+    logger.info("Invariant synthesis initiated...")
+    if verbose:
+        print(f"{Style.YELLOW}Invariant synthesis initiated...{Style.RESET}")
     # enumerate potential candidates given by a heuristic
-    for evt_candidate in strategy.template_heuristics.generate():
-        print(f"{Style.YELLOW}Invariant candidate: {evt_candidate}{Style.RESET}{Style.CLEARTOEND}", end="\r")
+    for evt_candidate in itertools.islice(strategy.template_heuristics.generate(), max_candidates):
+        logger.debug("Invariant candidate: %s", evt_candidate)
+        if verbose:
+            print(f"{Style.YELLOW}Invariant candidate: {evt_candidate}{Style.RESET}{Style.CLEARTOEND}", end="\r")
 
         # Compute one iteration step.
         evt_inv = evt_candidate
@@ -80,17 +92,23 @@ def evt_invariant_synthesis(loop: WhileInstr,
 
                 logger.debug("Possible solution: %s", sol)
                 if sol_is_positive is None:
-                    print(f"{Style.CYAN}Possible invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
+                    logger.info("Possible invariant: %s", sol_inv)
+                    if verbose:
+                        print(f"{Style.CYAN}Possible invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
                     sol_inv = config.factory.from_expr(str(sol_inv).replace("**", "^"), *prog_info.program.variables)
                     result.append((sol_inv, sol_is_positive))
                 elif sol_is_positive is True:
-                    print(f"{Style.GREEN}Invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
+                    logger.info("Invariant: %s", sol_inv)
+                    if verbose:
+                        print(f"{Style.GREEN}Invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
                     sol_inv = config.factory.from_expr(str(sol_inv).replace("**", "^"), *prog_info.program.variables)
                     result.append((sol_inv, sol_is_positive))
                     inv_found = True
                 else:
                     if config.show_all_invs:
-                        print(f"{Style.RED}Spurious invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
+                        logger.info("Spurious invariant: %s", sol_inv)
+                        if verbose:
+                            print(f"{Style.RED}Spurious invariant: {sol_inv}{Style.RESET}{Style.CLEARTOEND}")
 
             # Just return if we know that not all invariants are spurious.
             if inv_found:
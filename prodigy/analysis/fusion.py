@@ -0,0 +1,101 @@
+"""
+-----------------
+Assignment Fusion
+-----------------
+
+Consecutive assignments with affine right-hand sides (sums of natural multiples of variables and natural constants)
+compose to a single affine transformation of all variables. Such runs are fused, so that the distribution is only
+updated once by a simultaneous substitution, instead of once per assignment.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Sequence, Tuple
+
+from probably.pgcl import AsgnInstr, Binop, BinopExpr, Expr, Instr, NatLitExpr, RealLitExpr, VarExpr
+
+from prodigy.distribution import AffineUpdate
+
+
+def affine_form(expr: Expr, variables: Collection[str]) -> Optional[AffineUpdate]:
+    """Returns the affine form of `expr` over `variables`, or `None` if `expr` is not affine."""
+    if isinstance(expr, NatLitExpr):
+        return expr.value, {}
+    if isinstance(expr, RealLitExpr):
+        value = expr.to_fraction()
+        if value.denominator == 1 and value.numerator >= 0:
+            return value.numerator, {}
+        return None
+    if isinstance(expr, VarExpr):
+        return (0, {expr.var: 1}) if expr.var in variables else None
+    if isinstance(expr, BinopExpr) and expr.operator in (Binop.PLUS, Binop.TIMES):
+        lhs, rhs = affine_form(expr.lhs, variables), affine_form(expr.rhs, variables)
+        if lhs is None or rhs is None:
+            return None
+        if expr.operator == Binop.PLUS:
+            coefficients = dict(lhs[1])
+            for var, coefficient in rhs[1].items():
+                coefficients[var] = coefficients.get(var, 0) + coefficient
+            return lhs[0] + rhs[0], coefficients
+        if len(lhs[1]) == 0:
+            lhs, rhs = rhs, lhs
+        if len(rhs[1]) > 0:
+            return None  # product of two variables
+        factor = rhs[0]
+        return lhs[0] * factor, {var: coefficient * factor for var, coefficient in lhs[1].items() if factor != 0}
+    return None
+
+
+def compose(updates: Dict[str, AffineUpdate], var: str, update: AffineUpdate) -> Dict[str, AffineUpdate]:
+    """
+    Composes the simultaneous affine `updates` with a subsequent assignment of `update` to `var`. The result
+    expresses all new values in terms of the variable values before `updates`.
+    """
+    constant = update[0]
+    coefficients: Dict[str, int] = {}
+    for read, coefficient in update[1].items():
+        read_constant, read_coefficients = updates.get(read, (0, {read: 1}))
+        constant += coefficient * read_constant
+        for initial, initial_coefficient in read_coefficients.items():
+            coefficients[initial] = coefficients.get(initial, 0) + coefficient * initial_coefficient
+    result = dict(updates)
+    result[var] = (constant, {read: coefficient for read, coefficient in coefficients.items() if coefficient != 0})
+    return result
+
+
+@dataclass(frozen=True)
+class FusedAssignments:
+    """A run of affine assignments, together with the simultaneous update it amounts to."""
+
+    instructions: Tuple[AsgnInstr, ...]
+    updates: Tuple[Tuple[str, AffineUpdate], ...]
+
+    def __str__(self) -> str:
+        return "; ".join(str(instr) for instr in self.instructions)
+
+
+def fuse_assignments(instrs: Sequence[Instr], variables: Collection[str]) -> List[Instr | FusedAssignments]:
+    """Replaces every run of at least two consecutive affine assignments in `instrs` by a `FusedAssignments`."""
+    result: List[Instr | FusedAssignments] = []
+    run: List[AsgnInstr] = []
+    updates: Dict[str, AffineUpdate] = {}
+
+    def close_run():
+        if len(run) > 1:
+            result.append(FusedAssignments(tuple(run), tuple(updates.items())))
+        else:
+            result.extend(run)
+        run.clear()
+        updates.clear()
+
+    for instr in instrs:
+        form = affine_form(instr.rhs, variables) \
+            if isinstance(instr, AsgnInstr) and instr.lhs in variables else None
+        if form is None:
+            close_run()
+            result.append(instr)
+        else:
+            run.append(instr)
+            updates.update(compose(updates, instr.lhs, form))
+    close_run()
+    return result
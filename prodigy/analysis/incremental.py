@@ -0,0 +1,181 @@
+"""
+--------------------
+Incremental Analysis
+--------------------
+
+Programs are often edited at their end while their beginning stays the same. An `AnalysisSession` checkpoints the
+distribution after every top-level instruction, keyed by a structural hash of the input distribution and the program
+prefix analyzed so far. When a program is analyzed again, the analysis resumes from the longest prefix for which a
+checkpoint exists. Checkpoints are kept in memory or, using a `DiskStore`, across processes.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, get_args
+
+from probably.pgcl import Instr, Query, QueryInstr, Walk, WhileInstr, walk_instrs
+
+from prodigy.analysis.cache import config_key, distribution_key
+from prodigy.analysis.loop_policy import LoopPolicy
+from prodigy.distribution import Distribution
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+Checkpoint = Tuple[Distribution, Distribution]
+"""The distribution and the error probability after a prefix of the program."""
+
+Step = Callable[[int, Distribution, Distribution], Checkpoint]
+"""Analyzes the top-level instruction with the given index on the given distribution and error probability."""
+
+
+class MemoryStore:
+    """Keeps checkpoints in a dictionary."""
+
+    def __init__(self):
+        self._checkpoints: Dict[str, Checkpoint] = {}
+
+    def __len__(self) -> int:
+        return len(self._checkpoints)
+
+    def get(self, key: str) -> Optional[Checkpoint]:
+        return self._checkpoints.get(key)
+
+    def put(self, key: str, checkpoint: Checkpoint):
+        self._checkpoints[key] = checkpoint
+
+    def clear(self):
+        self._checkpoints.clear()
+
+
+class DiskStore:
+    """
+    Keeps checkpoints as pickled files in a directory, such that they can be shared between processes. Loading a
+    checkpoint unpickles it, which can execute arbitrary code, so the directory must only be writable by trusted users.
+    """
+
+    def __init__(self, directory: str | os.PathLike):
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.directory) if name.endswith(".pickle"))
+
+    def get(self, key: str) -> Optional[Checkpoint]:
+        try:
+            with open(self._path(key), "rb") as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as err:
+            logger.warning("Ignoring unreadable checkpoint %s: %s", key, err)
+            return None
+
+    def put(self, key: str, checkpoint: Checkpoint):
+        try:
+            data = pickle.dumps(checkpoint)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            logger.warning("Cannot store checkpoint %s: %s", key, err)
+            return
+        # Write to a temporary file first, so that concurrent readers never see partial checkpoints.
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.directory, name))
+
+
+def _is_checkpointable(instr: Instr, config) -> bool:
+    """Instructions with side effects (queries and interactively handled loops) must always be re-analyzed."""
+    for instr_ref in walk_instrs(Walk.DOWN, [instr]):
+        if isinstance(instr_ref.val, (QueryInstr, *get_args(Query))):
+            return False
+        if isinstance(instr_ref.val, WhileInstr) \
+                and config.loop_policy_for(instr_ref.val).strategy == LoopPolicy.Strategy.INTERACTIVE:
+            return False
+    return True
+
+
+def _policy_key(policy: LoopPolicy) -> Tuple[str, Optional[str]]:
+    """Describes a loop policy, including a hash of the contents of its invariant file (which may be edited)."""
+    if policy.invariant_file is None:
+        return str(policy), None
+    try:
+        with open(policy.invariant_file, "rb") as file:
+            return str(policy), hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        # The analysis of the loop fails as well, so no checkpoint is stored after it.
+        return str(policy), None
+
+
+def checkpoint_keys(prog_info, distribution: Distribution, error_prob: Distribution, config,
+                    dead: Optional[Sequence[Set[str]]] = None) -> List[str]:
+    """
+    Computes the checkpoint key after each top-level instruction, up to the first instruction which cannot be
+    checkpointed. The key of a prefix only depends on the key of the previous prefix, the last instruction and the
+    variables marginalized out after it. The latter are given by `dead` and depend on the rest of the program, so a
+    checkpoint is not reused once the rest of the program reads a variable which was dead before.
+    """
+    if config.show_intermediate_steps or config.step_wise:
+        return []
+    digest = hashlib.sha256(repr((distribution_key(distribution),
+                                  distribution_key(error_prob),
+                                  sorted(prog_info.so_vars),
+                                  str(prog_info.functions),
+                                  config_key(config),
+                                  config.marginalize_dead_variables,
+                                  config.factorize_distribution)).encode()).hexdigest()
+    keys = []
+    for index, instr in enumerate(prog_info.instructions):
+        if not _is_checkpointable(instr, config):
+            break
+        loops = [_policy_key(config.loop_policy_for(instr_ref.val)) for instr_ref in walk_instrs(Walk.DOWN, [instr])
+                 if isinstance(instr_ref.val, WhileInstr)]
+        marginalized = sorted(dead[index]) if dead is not None else None
+        digest = hashlib.sha256(repr((digest, type(instr).__name__, str(instr), loops,
+                                      marginalized)).encode()).hexdigest()
+        keys.append(digest)
+    return keys
+
+
+class AnalysisSession:
+    """Analyzes programs top-level instruction by top-level instruction, resuming from stored checkpoints."""
+
+    def __init__(self, store: MemoryStore | DiskStore | None = None):
+        self.store = MemoryStore() if store is None else store
+        self.resumed_instructions = 0
+        """The number of top-level instructions skipped in the last analysis."""
+
+    def analyze(self, prog_info, distribution: Distribution, error_prob: Distribution, config, step: Step,
+                dead: Optional[Sequence[Set[str]]] = None) -> Checkpoint:
+        """
+        Analyzes the program using `step`, resuming from the longest stored prefix. `dead` are the variables which
+        `step` marginalizes out after each top-level instruction, if any.
+        """
+        keys = checkpoint_keys(prog_info, distribution, error_prob, config, dead)
+        start = 0
+        for index in reversed(range(len(keys))):
+            checkpoint = self.store.get(keys[index])
+            if checkpoint is not None:
+                logger.debug("Resuming after %i of %i instructions", index + 1, len(prog_info.instructions))
+                distribution, error_prob = checkpoint
+                start = index + 1
+                break
+        self.resumed_instructions = start
+
+        for index in range(start, len(prog_info.instructions)):
+            distribution, error_prob = step(index, distribution, error_prob)
+            if index < len(keys):
+                self.store.put(keys[index], (distribution, error_prob))
+        return distribution, error_prob
@@ -9,6 +9,7 @@ from prodigy.analysis.config import ForwardAnalysisConfig
 from prodigy.analysis.instructionhandler import _assume
 from prodigy.analysis.instructionhandler.instruction_handler import InstructionHandler
 from prodigy.analysis.instructionhandler.program_info import ProgramInfo
+from prodigy.analysis.parallel import analyze_branches, traced_branch
 from prodigy.distribution import Distribution
 from prodigy.util.color import Style
 from prodigy.util.logger import log_setup
@@ -32,7 +33,8 @@ class ITEHandler(InstructionHandler):
         logger.info("Filtering the guard %s", instruction.cond)
         sat_part = distribution.filter(instruction.cond)
         non_sat_part = distribution - sat_part
-        zero = error_prob * "0"
+        # Without observations, the branches leave the error probability untouched, so we can simply pass it through.
+        zero = error_prob if prog_info.is_conditioning_free else error_prob * "0"
         if config.show_intermediate_steps:
             print(
                 f"\n{Style.YELLOW}Filter:{Style.RESET} {instruction.cond} \t " \
@@ -41,18 +43,18 @@ class ITEHandler(InstructionHandler):
             print(
                 f"\n{Style.YELLOW} If-branch: ({instruction.cond}){Style.RESET}"
             )
-            if_branch, if_error_prob = analyzer(
+            if_branch, if_error_prob = traced_branch(analyzer, config, 0)(
                 instruction.true, prog_info, sat_part, zero, config)
             print(f"\n{Style.YELLOW} Else-branch:{Style.RESET}")
-            else_branch, else_error_prob = analyzer(
+            else_branch, else_error_prob = traced_branch(analyzer, config, 1)(
                 instruction.false, prog_info, non_sat_part, zero, config)
             print(f"\n{Style.YELLOW}Combined:{Style.RESET}")
         else:
-            if_branch, if_error_prob = analyzer(
-                instruction.true, prog_info, sat_part, zero, config)
-            else_branch, else_error_prob = analyzer(
-                instruction.false, prog_info, non_sat_part, zero, config)
+            (if_branch, if_error_prob), (else_branch, else_error_prob) = analyze_branches(
+                [(instruction.true, sat_part, zero), (instruction.false, non_sat_part, zero)],
+                prog_info, config, analyzer)
         result = if_branch + else_branch
-        res_error_prob = error_prob + if_error_prob + else_error_prob
+        res_error_prob = error_prob if prog_info.is_conditioning_free \
+            else error_prob + if_error_prob + else_error_prob
         logger.info("Combining if-branches.\n%s", instruction)
         return result, res_error_prob
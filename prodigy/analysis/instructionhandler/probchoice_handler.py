@@ -9,6 +9,7 @@ from prodigy.analysis.config import ForwardAnalysisConfig
 from prodigy.analysis.instructionhandler import _assume
 from prodigy.analysis.instructionhandler.instruction_handler import InstructionHandler
 from prodigy.analysis.instructionhandler.program_info import ProgramInfo
+from prodigy.analysis.parallel import analyze_branches
 from prodigy.distribution import Distribution
 from prodigy.util.logger import log_setup
 
@@ -28,10 +29,14 @@ class PChoiceHandler(InstructionHandler):
     ) -> tuple[Distribution, Distribution]:
         _assume(instruction, ChoiceInstr, 'PChoiceHandlerGF')
 
-        lhs_block, lhs_error_prob = analyzer(instruction.lhs, prog_info, distribution, error_prob, config)
-        rhs_block, rhs_error_prob = analyzer(instruction.rhs, prog_info, distribution, error_prob, config)
+        (lhs_block, lhs_error_prob), (rhs_block, rhs_error_prob) = analyze_branches(
+            [(instruction.lhs, distribution, error_prob), (instruction.rhs, distribution, error_prob)],
+            prog_info, config, analyzer)
         logger.info("Combining PChoice branches.\n%s", instruction)
-        new_prob = lhs_error_prob * str(instruction.prob) + rhs_error_prob * f"1-({instruction.prob})"
+        if prog_info.is_conditioning_free:
+            new_prob = error_prob
+        else:
+            new_prob = lhs_error_prob * str(instruction.prob) + rhs_error_prob * f"1-({instruction.prob})"
         # res_error_prob = new_prob.set_variables(*(error_prob.get_variables() | new_prob.get_variables()))
         return lhs_block * str(
             instruction.prob) + rhs_block * f"1-({instruction.prob})", new_prob
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any
 
 from probably.pgcl import Program, Var
 
+from prodigy.pgcl.pgcl_checks import check_is_conditioning_free
+
 
 @dataclass(frozen=True)
 class ProgramInfo():
@@ -24,5 +27,10 @@ class ProgramInfo():
     `prodigy.analysis.static.independence.independent_vars`.
     """
 
+    @cached_property
+    def is_conditioning_free(self) -> bool:
+        """Whether the program contains no observations, such that the error probability never changes."""
+        return check_is_conditioning_free(self.program.instructions)
+
     def __getattr__(self, __name: str) -> Any:
         return getattr(self.program, __name)
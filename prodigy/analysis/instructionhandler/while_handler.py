@@ -3,16 +3,16 @@ from __future__ import annotations
 import logging
 import sys
 from fractions import Fraction
-from typing import Callable, Union, Sequence
+from typing import Callable, Optional, Union, Sequence
 
 import sympy
 from probably.pgcl import Instr, parse_pgcl, Program, WhileInstr
 
-from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.config import ForwardAnalysisConfig, LoopPolicy
 from prodigy.analysis.equivalence.equivalence_check import check_equivalence
 from prodigy.analysis.evtinvariants.heuristics.strategies import SynthesisStrategy, SynthesisStrategies
 from prodigy.analysis.evtinvariants.invariant_synthesis import evt_invariant_synthesis
-from prodigy.analysis.exceptions import VerificationError
+from prodigy.analysis.exceptions import ConfigurationError, HeuristicsError, VerificationError
 from prodigy.analysis.instructionhandler import _assume
 from prodigy.analysis.instructionhandler.instruction_handler import InstructionHandler
 from prodigy.analysis.instructionhandler.program_info import ProgramInfo
@@ -33,9 +33,11 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            inv_filepath: Optional[str] = None
     ) -> tuple[Distribution, Distribution]:
-        inv_filepath = input("Invariant file:\t")
+        if inv_filepath is None:
+            inv_filepath = input("Invariant file:\t")
         with open(inv_filepath, 'r', encoding="utf-8") as inv_file:
             inv_src = inv_file.read()
             inv_prog = parse_pgcl(inv_src)
@@ -88,9 +90,11 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            max_iter: Optional[int] = None
     ) -> tuple[Distribution, Distribution]:
-        max_iter = int(input("Specify a maximum iteration limit: "))
+        if max_iter is None:
+            max_iter = int(input("Specify a maximum iteration limit: "))
         logger.debug("Compute %i iterations", max_iter)
 
         sat_part = distribution.filter(instruction.cond)
@@ -120,15 +124,23 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            captured_probability_threshold: Optional[float] = None,
+            max_iter: Optional[int] = None
     ) -> tuple[Distribution, Distribution]:
-        captured_probability_threshold = float(
-            input("Enter the probability threshold: "))
+        if captured_probability_threshold is None:
+            captured_probability_threshold = float(
+                input("Enter the probability threshold: "))
+        iterations = 0
         sat_part = distribution.filter(instruction.cond)
         non_sat_part = distribution - sat_part
         captured_part = non_sat_part + error_prob
         while Fraction(captured_part.get_probability_mass()
                        ) < captured_probability_threshold:
+            if max_iter is not None and iterations >= max_iter:
+                logger.info("Iteration budget of %i exhausted before capturing the desired mass", max_iter)
+                break
+            iterations += 1
             logger.info("Collected %f of the desired mass", (float(
                 (Fraction(captured_part.get_probability_mass()) /
                  captured_probability_threshold)) * 100))
@@ -155,10 +167,12 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            max_iter: Optional[int] = None
     ) -> tuple[Distribution, Distribution]:
         assert error_prob.is_zero_dist(), "Currently EVT reasoning does not support conditioning."
-        max_iter = int(input("Enter the number of iterations: "))
+        if max_iter is None:
+            max_iter = int(input("Enter the number of iterations: "))
         logger.debug("Compute %i iterations of EVT operator", max_iter)
 
         evt = distribution * 0
@@ -180,10 +194,13 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            evt_inv_expr: Optional[str] = None
     ) -> tuple[Distribution, Distribution]:
         assert error_prob.is_zero_dist(), "Currently EVT reasoning does not support conditioning."
-        evt_inv = config.factory.from_expr(input("Enter EVT invariant: "), *prog_info.program.variables.keys())
+        if evt_inv_expr is None:
+            evt_inv_expr = input("Enter EVT invariant: ")
+        evt_inv = config.factory.from_expr(evt_inv_expr, *prog_info.program.variables.keys())
         phi = distribution + \
               analyzer(instruction.body, prog_info, evt_inv.filter(instruction.cond), error_prob, config)[0]
         logger.debug("Trying to validate user specified invariant: %s", evt_inv)
@@ -222,7 +239,9 @@ class WhileHandler(InstructionHandler):
             analyzer: Callable[
                 [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
                 tuple[Distribution, Distribution]
-            ]
+            ],
+            max_candidates: Optional[int] = None,
+            verbose: bool = True
     ) -> tuple[Distribution, Distribution]:
 
         logger.debug("Using invariant synthesis.")
@@ -232,23 +251,91 @@ class WhileHandler(InstructionHandler):
                                                                config.factory)
 
         # generate the invariants using the strategy
-        invariants = evt_invariant_synthesis(instruction, prog_info, distribution, config, strategy, analyzer)
+        invariants = evt_invariant_synthesis(instruction, prog_info, distribution, config, strategy, analyzer,
+                                             max_candidates, verbose)
 
         def _sorting_key(elem):
             return 1 if elem[1] else 0
 
         invariants = sorted(invariants, key=_sorting_key)
+        if len(invariants) == 0:
+            raise VerificationError("Could not synthesize an EVT invariant.")
 
         # give associated distributions:
         distributions = [inv - inv.filter(instruction.cond) for inv, inv_type in invariants]
-        print("Continuing with the following distributions is possible:")
-        for i, d in enumerate(distributions):
-            print(f"{i + 1}.\t{d}")
+        logger.info("Continuing with the following distributions is possible: %s", distributions)
+        if verbose:
+            print("Continuing with the following distributions is possible:")
+            for i, d in enumerate(distributions):
+                print(f"{i + 1}.\t{d}")
 
         # Choose one solution
-        print(f"Continue with distribution: {Style.CYAN}{distributions[0]}{Style.RESET}")
+        logger.info("Continue with distribution: %s", distributions[0])
+        if verbose:
+            print(f"Continue with distribution: {Style.CYAN}{distributions[0]}{Style.RESET}")
         return distributions[0], error_prob
 
+    @staticmethod
+    def _compute_with_policy(
+            instruction: Instr,
+            prog_info: ProgramInfo,
+            distribution: Distribution,
+            error_prob: Distribution,
+            config: ForwardAnalysisConfig,
+            analyzer: Callable[
+                [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
+                tuple[Distribution, Distribution]
+            ],
+            policy: LoopPolicy
+    ) -> tuple[Distribution, Distribution]:
+        def _require(value, name: str):
+            if value is None:
+                raise ConfigurationError(f"The loop strategy {policy.strategy.name} requires {name} to be set.")
+            return value
+
+        strategy = policy.strategy
+        if strategy == LoopPolicy.Strategy.INVARIANT:
+            return WhileHandler._analyze_with_invariant(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                _require(policy.invariant_file, "an invariant file"))
+        if strategy == LoopPolicy.Strategy.ITERATIONS:
+            return WhileHandler._compute_iterations(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                _require(policy.max_iterations, "an iteration limit"))
+        if strategy == LoopPolicy.Strategy.THRESHOLD:
+            return WhileHandler._compute_until_threshold(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                _require(policy.probability_threshold, "a probability threshold"), policy.max_iterations)
+        if strategy == LoopPolicy.Strategy.EVT:
+            return WhileHandler._approx_expected_visiting_times(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                _require(policy.max_iterations, "an iteration limit"))
+        if strategy == LoopPolicy.Strategy.EVT_INVARIANT:
+            return WhileHandler._evt_invariant(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                _require(policy.evt_invariant, "an EVT invariant"))
+        if strategy == LoopPolicy.Strategy.SYNTHESIS:
+            return WhileHandler._evt_invariant_synthesis(
+                instruction, prog_info, distribution, error_prob, config, analyzer)
+
+        assert strategy == LoopPolicy.Strategy.AUTO
+        if policy.max_iterations is None and policy.probability_threshold is None:
+            raise ConfigurationError(
+                "The loop strategy AUTO requires an iteration limit or a probability threshold as fallback.")
+        if error_prob.is_zero_dist():
+            try:
+                return WhileHandler._evt_invariant_synthesis(
+                    instruction, prog_info, distribution, error_prob, config, analyzer, policy.max_candidates,
+                    verbose=False)
+            except (VerificationError, HeuristicsError, NotImplementedError) as err:
+                logger.info("Invariant synthesis failed (%s), falling back to bounded unrolling.", err)
+        if policy.probability_threshold is not None:
+            return WhileHandler._compute_until_threshold(
+                instruction, prog_info, distribution, error_prob, config, analyzer,
+                policy.probability_threshold, policy.max_iterations)
+        return WhileHandler._compute_iterations(
+            instruction, prog_info, distribution, error_prob, config, analyzer, policy.max_iterations)
+
     @staticmethod
     def compute(
             instruction: Instr,
@@ -264,6 +351,12 @@ class WhileHandler(InstructionHandler):
 
         _assume(instruction, WhileInstr, 'WhileHandler')
 
+        policy = config.loop_policy_for(instruction)
+        if policy.strategy != LoopPolicy.Strategy.INTERACTIVE:
+            logger.info("Handling loop according to %s", policy)
+            return WhileHandler._compute_with_policy(instruction, prog_info, distribution, error_prob, config,
+                                                     analyzer, policy)
+
         while True:
             user_choice = input(
                 "While Instruction has only limited support. Choose an option:\n"
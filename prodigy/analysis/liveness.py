@@ -0,0 +1,103 @@
+"""
+-----------------
+Liveness Analysis
+-----------------
+
+A static backwards analysis computing which variables are *live*, i.e., might still be read by the remaining program
+(including its queries). Variables which are not live can be marginalized out of the distribution without changing the
+outcome of the remaining program, which keeps the number of indeterminates in the distribution small.
+"""
+from __future__ import annotations
+
+from typing import Collection, FrozenSet, List, Sequence
+
+from probably.pgcl import (AbortInstr, AsgnInstr, ChoiceInstr, ExpectationInstr, Expr, FunctionCallExpr, IfInstr,
+                           Instr, LoopInstr, ObserveInstr, ProbabilityQueryInstr, SkipInstr, Var, VarExpr,
+                           WhileInstr, mut_expr_children)
+
+from probably.util.ref import Mut
+
+
+def _read_vars(expr: Expr) -> FrozenSet[Var]:
+    """
+    The variables read by an expression, including the arguments of function calls. In contrast to
+    `prodigy.analysis.independence.utils._vars_of_expr`, variables inside of Iverson brackets are read as well.
+    """
+    if isinstance(expr, VarExpr):
+        return frozenset({expr.var})
+    if isinstance(expr, FunctionCallExpr):
+        positional, named = expr.params
+        return frozenset().union(*(_read_vars(param) for param in (*positional, *named.values())))
+    return frozenset().union(*(_read_vars(child_ref.val) for child_ref in mut_expr_children(Mut.alloc(expr))))
+
+
+def _live_before_block(instrs: Sequence[Instr], live_after: FrozenSet[Var],
+                       variables: FrozenSet[Var]) -> FrozenSet[Var]:
+    live = live_after
+    for instr in reversed(instrs):
+        live = live_before(instr, live, variables)
+    return live
+
+
+def live_before(instr: Instr, live_after: FrozenSet[Var], variables: FrozenSet[Var]) -> FrozenSet[Var]:
+    """
+    Computes the variables live before `instr`, given the variables `live_after` it. For instructions which are not
+    understood by the analysis, all `variables` are considered live.
+    """
+    if isinstance(instr, (SkipInstr, AbortInstr)):
+        return live_after
+
+    if isinstance(instr, AsgnInstr):
+        if instr.lhs not in live_after:
+            return live_after
+        return (live_after - {instr.lhs}) | _read_vars(instr.rhs)
+
+    if isinstance(instr, ObserveInstr):
+        return live_after | _read_vars(instr.cond)
+
+    if isinstance(instr, IfInstr):
+        return _read_vars(instr.cond) \
+            | _live_before_block(instr.true, live_after, variables) \
+            | _live_before_block(instr.false, live_after, variables)
+
+    if isinstance(instr, ChoiceInstr):
+        return _read_vars(instr.prob) \
+            | _live_before_block(instr.lhs, live_after, variables) \
+            | _live_before_block(instr.rhs, live_after, variables)
+
+    if isinstance(instr, (WhileInstr, LoopInstr)):
+        # The body might be executed arbitrarily often, thus we compute the least fixed point.
+        live = live_after | (_read_vars(instr.cond) if isinstance(instr, WhileInstr) else frozenset())
+        while True:
+            new_live = live | _live_before_block(instr.body, live, variables)
+            if new_live == live:
+                return live
+            live = new_live
+
+    if isinstance(instr, ExpectationInstr):
+        return live_after | _read_vars(instr.expr)
+
+    if isinstance(instr, ProbabilityQueryInstr):
+        return live_after | _read_vars(instr.expr)
+
+    # Printing, plotting, optimization and query blocks, as well as unknown instructions.
+    return variables
+
+
+def live_variables(instrs: Sequence[Instr], variables: Collection[Var],
+                   live_out: Collection[Var] | None = None) -> List[FrozenSet[Var]]:
+    """
+    Computes for each instruction in `instrs` the set of variables which are live *after* executing it.
+
+    :param instrs: The instructions to analyze.
+    :param variables: All variables of the program.
+    :param live_out: The variables which are live after the last instruction. Defaults to all variables.
+    """
+    all_vars = frozenset(variables)
+    live = all_vars if live_out is None else frozenset(live_out)
+    result: List[FrozenSet[Var]] = []
+    for instr in reversed(instrs):
+        result.append(live)
+        live = live_before(instr, live, all_vars)
+    result.reverse()
+    return result
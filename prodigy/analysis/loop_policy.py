@@ -0,0 +1,49 @@
+"""
+-----------
+Loop Policy
+-----------
+
+While-loops can in general not be analyzed exactly. A `LoopPolicy` determines which technique is applied to a loop,
+so that the analysis can run without user interaction.
+"""
+from enum import Enum, auto
+from typing import Optional
+
+import attr
+
+
+@attr.s(frozen=True)
+class LoopPolicy:
+    """Describes how a while-loop is handled during the forward analysis."""
+
+    class Strategy(Enum):
+        """
+        The available strategies for handling while-loops. `INTERACTIVE` asks the user, `AUTO` first tries to synthesize
+        an invariant and falls back to bounded unrolling if this fails.
+        """
+        INTERACTIVE = auto()
+        INVARIANT = auto()
+        ITERATIONS = auto()
+        THRESHOLD = auto()
+        EVT = auto()
+        EVT_INVARIANT = auto()
+        SYNTHESIS = auto()
+        AUTO = auto()
+
+    strategy: Strategy = attr.ib(default=Strategy.INTERACTIVE)
+    """The strategy to use."""
+
+    max_iterations: Optional[int] = attr.ib(default=None)
+    """Budget of loop iterations for unrolling, capturing probability mass and computing expected visiting times."""
+
+    probability_threshold: Optional[float] = attr.ib(default=None)
+    """The probability mass which has to be captured by the `THRESHOLD` strategy."""
+
+    invariant_file: Optional[str] = attr.ib(default=None)
+    """Path to the invariant used by the `INVARIANT` strategy."""
+
+    evt_invariant: Optional[str] = attr.ib(default=None)
+    """The expected visiting time invariant used by the `EVT_INVARIANT` strategy."""
+
+    max_candidates: int = attr.ib(default=50)
+    """The number of invariant candidates the `AUTO` strategy checks before falling back to bounded unrolling."""
@@ -0,0 +1,135 @@
+"""
+------------------
+Parallel Branching
+------------------
+
+Independent branches of a program (e.g., both branches of an if-statement or a probabilistic choice) only interact
+once their results are combined. This module evaluates such branches concurrently on a shared executor, as configured
+in `ForwardAnalysisConfig.branch_parallelism`.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+import attr
+from probably.pgcl import Instr
+
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.instructionhandler.program_info import ProgramInfo
+from prodigy.distribution import Distribution
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+Analyzer = Callable[
+    [Union[Instr, Sequence[Instr]], ProgramInfo, Distribution, Distribution, ForwardAnalysisConfig],
+    tuple[Distribution, Distribution]
+]
+
+Branch = Tuple[Union[Instr, Sequence[Instr]], Distribution, Distribution]
+"""A branch to analyze, given by its instructions, its input distribution and its input error probability."""
+
+_lock = threading.Lock()
+_executors: Dict[Tuple[ForwardAnalysisConfig.Parallelism, int], Tuple[Executor, threading.Semaphore]] = {}
+
+
+class _WorkerState:
+    """State of the current process."""
+
+    in_worker_process = False
+    """Whether this process is a worker of a process pool, whose branches are analyzed sequentially."""
+
+
+def _mark_worker_process():
+    _WorkerState.in_worker_process = True
+
+
+def _executor(config: ForwardAnalysisConfig) -> Tuple[Executor, threading.Semaphore]:
+    """Returns the (lazily created) executor for the configuration together with a semaphore counting free workers."""
+    key = (config.branch_parallelism, config.max_workers)
+    with _lock:
+        if key not in _executors:
+            if config.branch_parallelism == ForwardAnalysisConfig.Parallelism.THREADS:
+                executor: Executor = ThreadPoolExecutor(max_workers=config.max_workers,
+                                                        thread_name_prefix="prodigy-branch")
+            else:
+                executor = ProcessPoolExecutor(max_workers=config.max_workers, initializer=_mark_worker_process)
+            _executors[key] = (executor, threading.Semaphore(config.max_workers))
+        return _executors[key]
+
+
+def shutdown():
+    """Shuts down all executors created for branch evaluation."""
+    with _lock:
+        for executor, _ in _executors.values():
+            executor.shutdown(wait=True)
+        _executors.clear()
+
+
+def traced_branch(analyzer: Analyzer, config: ForwardAnalysisConfig, index: int) -> Analyzer:
+    """Wraps `analyzer` such that the trace (if any) records the analyzed instructions as part of branch `index`."""
+    if config.trace is None:
+        return analyzer
+    trace = config.trace
+    position = trace.position() + (index,)
+
+    def analyze_branch(instrs, prog_info, dist, error_prob, branch_config):
+        with trace.scope(position):
+            return analyzer(instrs, prog_info, dist, error_prob, branch_config)
+
+    return analyze_branch
+
+
+def _run_and_release(slots: threading.Semaphore, analyzer: Analyzer, branch: Branch, prog_info: ProgramInfo,
+                     config: ForwardAnalysisConfig) -> Tuple[Distribution, Distribution]:
+    try:
+        return analyzer(branch[0], prog_info, branch[1], branch[2], config)
+    finally:
+        slots.release()
+
+
+def analyze_branches(branches: Sequence[Branch], prog_info: ProgramInfo, config: ForwardAnalysisConfig,
+                     analyzer: Analyzer) -> List[Tuple[Distribution, Distribution]]:
+    """
+    Analyzes all branches and returns their results in the same order.
+
+    Branches are handed to the executor as long as it has idle workers; the remaining branches (at least the first
+    one) are analyzed in the calling thread. Thus, nested branches fan out up to the configured number of workers
+    without ever waiting for a task that has not been started.
+    """
+    sequential = config.branch_parallelism == ForwardAnalysisConfig.Parallelism.NONE \
+        or config.show_intermediate_steps or config.step_wise or _WorkerState.in_worker_process or len(branches) < 2
+    analyzers = [traced_branch(analyzer, config, index) for index in range(len(branches))]
+    if sequential:
+        return [analyzers[index](instrs, prog_info, dist, error_prob, config)
+                for index, (instrs, dist, error_prob) in enumerate(branches)]
+
+    executor, slots = _executor(config)
+    worker_config = config
+    if config.branch_parallelism == ForwardAnalysisConfig.Parallelism.PROCESSES:
+        # Worker processes operate on copies anyway, so we do not ship the cache or the trace to them.
+        worker_config = attr.evolve(config, semantics_cache=None, trace=None)
+
+    futures: Dict[int, Future] = {}
+    for index, branch in enumerate(branches[1:], start=1):
+        if not slots.acquire(blocking=False):
+            break
+        if config.branch_parallelism == ForwardAnalysisConfig.Parallelism.THREADS:
+            futures[index] = executor.submit(_run_and_release, slots, analyzers[index], branch, prog_info,
+                                             worker_config)
+        else:
+            future = executor.submit(analyzer, branch[0], prog_info, branch[1], branch[2], worker_config)
+            future.add_done_callback(lambda _: slots.release())
+            futures[index] = future
+    logger.debug("Analyzing %i of %i branches concurrently.", len(futures), len(branches))
+
+    results: List[Tuple[Distribution, Distribution]] = []
+    for index, (instrs, dist, error_prob) in enumerate(branches):
+        if index in futures:
+            results.append(futures[index].result())
+        else:
+            results.append(analyzers[index](instrs, prog_info, dist, error_prob, config))
+    return results
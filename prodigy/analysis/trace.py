@@ -0,0 +1,152 @@
+"""
+----------------
+Profiling Traces
+----------------
+
+Records one event per analyzed instruction, holding the semantics used, the position of the instruction, the wall time
+and the size of the distribution before and after the instruction. Traces can be written as JSON Lines or in the Chrome
+trace event format (viewable in `chrome://tracing` or Perfetto), which makes it easy to spot the instruction at which
+the symbolic representation blows up.
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from enum import Enum, auto
+from typing import Callable, Iterator, List, Tuple
+
+from prodigy.distribution import Distribution
+
+
+@dataclass(frozen=True)
+class ExpressionSize:
+    """Size metrics of a distribution."""
+
+    nodes: int
+    """The number of nodes in the expression tree."""
+    variables: int
+    """The number of program variables."""
+    finite: bool
+    """Whether the distribution has finite support."""
+
+    @staticmethod
+    def of(dist: Distribution) -> ExpressionSize:
+        return ExpressionSize(dist.expression_size(), len(dist.get_variables()), dist.is_finite())
+
+
+@dataclass(frozen=True)
+class TraceEvent:
+    """The record of analyzing a single instruction."""
+
+    handler: str
+    """The name of the semantics that handled the instruction."""
+    instruction: str
+    position: Tuple[int, ...]
+    """
+    The index of the instruction in its block, prefixed by the positions of all enclosing instructions. Instructions in
+    branches are additionally prefixed by the index of their branch.
+    """
+    start: float
+    """Start time in seconds, relative to the creation of the trace."""
+    duration: float
+    """Wall time in seconds, including all nested instructions."""
+    thread: int
+    input: ExpressionSize
+    output: ExpressionSize
+
+
+class Trace:
+    """Collects trace events. Events may be recorded concurrently from several threads."""
+
+    class Format(Enum):
+        JSONL = auto()
+        CHROME = auto()
+
+    def __init__(self):
+        self.events: List[TraceEvent] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Traces are not shared with worker processes; events recorded there are lost.
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def position(self) -> Tuple[int, ...]:
+        """The position of the instruction currently analyzed in this thread."""
+        return getattr(self._local, "position", ())
+
+    @contextmanager
+    def scope(self, position: Tuple[int, ...], offset: int = 0) -> Iterator[None]:
+        """
+        Records the instructions analyzed in the context below `position`, e.g., the position of a branch. Blocks
+        analyzed directly in the context are treated as if they started at index `offset` of their enclosing block.
+        Positions are tracked per thread, so branches analyzed by other threads have to be entered this way.
+        """
+        parent, parent_offset = self.position(), getattr(self._local, "offset", 0)
+        self._local.position, self._local.offset = position, offset
+        try:
+            yield
+        finally:
+            self._local.position, self._local.offset = parent, parent_offset
+
+    @contextmanager
+    def record(self, handler: str, instruction: object, index: int,
+               distribution: Distribution) -> Iterator[Callable[[Distribution], None]]:
+        """
+        Records the analysis of `instruction`, which is the `index`-th instruction of the currently analyzed block.
+        The context yields a function that has to be called with the resulting distribution.
+        """
+        parent = self.position()
+        offset = getattr(self._local, "offset", 0)
+        position = parent + (index + offset,)
+        input_size = ExpressionSize.of(distribution)
+        result: List[Distribution] = []
+        self._local.position, self._local.offset = position, 0
+        start = time.perf_counter()
+        try:
+            yield result.append
+        finally:
+            duration = time.perf_counter() - start
+            self._local.position, self._local.offset = parent, offset
+        if result:
+            event = TraceEvent(handler, str(instruction), position, start - self._origin, duration,
+                               threading.get_ident(), input_size, ExpressionSize.of(result[0]))
+            with self._lock:
+                self.events.append(event)
+
+    def write(self, path: str | os.PathLike, fmt: Trace.Format = Format.JSONL):
+        """Writes all recorded events to the file at `path`."""
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w", encoding="utf-8") as file:
+            if fmt == Trace.Format.JSONL:
+                for event in events:
+                    file.write(json.dumps(asdict(event)) + "\n")
+            else:
+                json.dump({"traceEvents": [_chrome_event(event) for event in events]}, file)
+
+
+def _chrome_event(event: TraceEvent) -> dict:
+    return {
+        "name": event.handler,
+        "cat": "instruction",
+        "ph": "X",
+        "ts": event.start * 1e6,
+        "dur": event.duration * 1e6,
+        "pid": os.getpid(),
+        "tid": event.thread,
+        "args": {
+            "instruction": event.instruction,
+            "position": list(event.position),
+            "input": asdict(event.input),
+            "output": asdict(event.output),
+        }
+    }
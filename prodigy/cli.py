@@ -9,6 +9,7 @@ If you use `poetry` and do not have prodigy installed globally, you can use `poe
 """
 
 import logging
+import os
 import time
 from itertools import combinations
 from typing import IO, Set
@@ -18,15 +19,17 @@ from probably.pgcl import Var, compiler, WhileInstr
 from probably.pgcl.check import CheckFail
 
 from prodigy.analysis.analyzer import compute_discrete_distribution, compute_semantics
-from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.config import ForwardAnalysisConfig, LoopPolicy
 from prodigy.analysis.equivalence.equivalence_check import check_equivalence
 from prodigy.analysis.evtinvariants.heuristics.positivity.heuristics_factory import PositivityHeuristics
 from prodigy.analysis.evtinvariants.heuristics.strategies import SynthesisStrategies
 from prodigy.analysis.evtinvariants.heuristics.templates.templates_factory import TemplateHeuristics
 from prodigy.analysis.evtinvariants.invariant_synthesis import evt_invariant_synthesis
 from prodigy.analysis.exceptions import VerificationError
+from prodigy.analysis.incremental import AnalysisSession, DiskStore
 from prodigy.analysis.instructionhandler.program_info import ProgramInfo
 from prodigy.analysis.solver.solver_type import SolverType
+from prodigy.analysis.trace import Trace
 from prodigy.distribution.distribution import State
 from prodigy.util.color import Style
 from prodigy.util.logger import log_setup
@@ -45,31 +48,71 @@ logger = log_setup("CLI", logging.DEBUG)
 @click.option('--intermediate-results', is_flag=True, required=False, default=False)
 @click.option("--stepwise", is_flag=True, required=False, default=False)
 @click.option('--no-simplification', is_flag=True, required=False, default=False)
+@click.option('--use-rings', is_flag=True, required=False, default=False)
 @click.option('--use-latex', is_flag=True, required=False, default=False)
 @click.option("--no-normalize", is_flag=True, required=False, default=False)
 @click.option("--show-all-invs", is_flag=True, required=False, default=False)
+@click.option("--parallel", type=str, required=False, default='none')
+@click.option("--workers", type=int, required=False, default=os.cpu_count() or 1)
+@click.option("--loop-strategy", type=str, required=False, default='interactive')
+@click.option("--max-iterations", type=int, required=False, default=None)
+@click.option("--threshold", type=float, required=False, default=None)
+@click.option("--invariant", type=click.Path(exists=True, dir_okay=False), required=False, default=None)
+@click.option("--profile", type=click.Path(dir_okay=False, writable=True), required=False, default=None)
+@click.option("--profile-format", type=str, required=False, default='jsonl')
+@click.option("--checkpoint-dir", type=click.Path(file_okay=False), required=False, default=None,
+              help="Directory for checkpoints. Checkpoints are unpickled, so only use directories you trust.")
+@click.option("--long-double", is_flag=True, required=False, default=False)
+@click.option("--truncation-degree", type=int, required=False, default=100)
 def cli(ctx,
         engine: str, strategy: str, solver: str, template_heuristic: str, pos_heuristic: str,
-        intermediate_results: bool, stepwise: bool, no_simplification: bool, use_latex: bool, no_normalize: bool,
-        show_all_invs: bool):
+        intermediate_results: bool, stepwise: bool, no_simplification: bool, use_rings: bool, use_latex: bool,
+        no_normalize: bool, show_all_invs: bool, parallel: str, workers: int, loop_strategy: str,
+        max_iterations: int | None,
+        threshold: float | None, invariant: str | None, profile: str | None, profile_format: str,
+        checkpoint_dir: str | None, long_double: bool, truncation_degree: int):
     ctx.ensure_object(dict)
     if solver.upper() not in SolverType.__members__:
         raise ValueError(f"Solver {solver} is not known.")
+    if parallel.upper() not in ForwardAnalysisConfig.Parallelism.__members__:
+        raise ValueError(f"Parallelism {parallel} is not known.")
+    if loop_strategy.upper() not in LoopPolicy.Strategy.__members__:
+        raise ValueError(f"Loop strategy {loop_strategy} is not known.")
+    if profile_format.upper() not in Trace.Format.__members__:
+        raise ValueError(f"Profile format {profile_format} is not known.")
+    trace = None
+    if profile is not None:
+        trace = Trace()
+        ctx.call_on_close(lambda: trace.write(profile, Trace.Format.__members__[profile_format.upper()]))
     ctx.obj['CONFIG'] = \
         ForwardAnalysisConfig(
             engine=ForwardAnalysisConfig.Engine.GINAC if engine == 'ginac'
-            else ForwardAnalysisConfig.Engine.SYMENGINE if engine == 'symengine' else
+            else ForwardAnalysisConfig.Engine.SYMENGINE if engine == 'symengine'
+            else ForwardAnalysisConfig.Engine.SPARSE if engine == 'sparse'
+            else ForwardAnalysisConfig.Engine.NUMPY if engine == 'numpy'
+            else ForwardAnalysisConfig.Engine.TRUNCATED if engine == 'truncated' else
             ForwardAnalysisConfig.Engine.SYMPY,
             show_intermediate_steps=intermediate_results,
             step_wise=stepwise,
             use_simplification=not no_simplification,
+            use_rings=use_rings,
             use_latex=use_latex,
+            use_long_double=long_double,
+            truncation_degree=truncation_degree,
             normalize=not no_normalize,
             strategy=SynthesisStrategies.__members__[strategy.upper()],
             templ_heuristic=TemplateHeuristics.__members__[template_heuristic.upper()],
             positivity_heuristic=PositivityHeuristics.__members__[pos_heuristic.upper()],
             show_all_invs=show_all_invs,
-            solver_type=SolverType.__members__[solver.upper()]
+            solver_type=SolverType.__members__[solver.upper()],
+            branch_parallelism=ForwardAnalysisConfig.Parallelism.__members__[parallel.upper()],
+            max_workers=workers,
+            loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.__members__[loop_strategy.upper()],
+                                   max_iterations=max_iterations,
+                                   probability_threshold=threshold,
+                                   invariant_file=invariant),
+            trace=trace,
+            checkpoints=None if checkpoint_dir is None else AnalysisSession(DiskStore(checkpoint_dir))
         )
 
 
@@ -14,7 +14,23 @@ GiNaC Implementation
 ####################
 
 .. automodule:: prodigy.distribution.fast_generating_function
+
+Sparse Implementation
+#####################
+
+.. automodule:: prodigy.distribution.sparse_distribution
+
+Dense Implementation
+####################
+
+.. automodule:: prodigy.distribution.dense_distribution
+
+Truncated Implementation
+########################
+
+.. automodule:: prodigy.distribution.truncated_distribution
 """
 
-from .distribution import (CommonDistributionsFactory, Distribution,
-                           DistributionParam, MarginalType, State)
+from .distribution import (AffineUpdate, CommonDistributionsFactory,
+                           Distribution, DistributionParam, MarginalType,
+                           State)
@@ -0,0 +1,638 @@
+# pylint: disable=protected-access
+"""
+A numeric backend for distributions over bounded variable ranges. The joint distribution is stored as an
+N-dimensional NumPy array, where the entry at index `(v_1, ..., v_n)` is the probability of the state `x_1 = v_1, ...,
+x_n = v_n`. Filters, updates and marginals are vectorized array operations, so this backend answers numeric questions
+on programs with small domains much faster than the symbolic backends. Parameters are not supported.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from fractions import Fraction
+from typing import (Callable, Dict, FrozenSet, Generator, Iterator, List, NoReturn, Sequence, Set, Tuple,
+                    Type, TypeVar, Union)
+
+import numpy as np
+import sympy
+from probably.pgcl import (Binop, BinopExpr, BoolLitExpr, Expr, FunctionCallExpr, NatLitExpr, RealLitExpr, Unop,
+                           UnopExpr, VarExpr)
+from probably.pgcl.parser import parse_expr
+
+from prodigy.distribution.distribution import (AffineUpdate, CommonDistributionsFactory, Distribution,
+                                               DistributionParam, MarginalType, State)
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+_FFT_THRESHOLD = 64
+"""Convolutions where both operands have more entries than this are computed using the FFT."""
+
+_COMPARISONS: Dict[Binop, Callable] = {
+    Binop.EQ: np.equal,
+    Binop.LEQ: np.less_equal,
+    Binop.LT: np.less,
+    Binop.GT: np.greater,
+    Binop.GEQ: np.greater_equal,
+    Binop.AND: np.logical_and,
+    Binop.OR: np.logical_or,
+}
+
+_ARITHMETIC: Dict[Binop, Callable] = {
+    Binop.PLUS: np.add,
+    Binop.MINUS: np.subtract,
+    Binop.TIMES: np.multiply,
+    Binop.DIVIDE: np.true_divide,
+    Binop.MODULO: np.mod,
+    Binop.POWER: np.power,
+}
+
+
+_CONFIGURED: Dict[Tuple[type, Tuple[Tuple[str, object], ...]], type] = {}
+"""Factories with non-default settings, see `DensePGF.configured`."""
+
+_Factory = TypeVar("_Factory", bound="DensePGF")
+
+
+def _evaluate(expression: Expr, grids: Dict[str, np.ndarray]):
+    """Evaluates `expression` for all states at once, where `grids` contain the values of each variable."""
+    if isinstance(expression, NatLitExpr):
+        return expression.value
+    if isinstance(expression, RealLitExpr):
+        return float(expression.to_fraction())
+    if isinstance(expression, BoolLitExpr):
+        return expression.value
+    if isinstance(expression, VarExpr):
+        if expression.var not in grids:
+            raise ValueError(f"Unknown variable {expression.var}; parameters are not supported by the dense engine.")
+        return grids[expression.var]
+    if isinstance(expression, UnopExpr):
+        if expression.operator == Unop.NEG:
+            return np.logical_not(_evaluate(expression.expr, grids))
+        if expression.operator == Unop.IVERSON:
+            return np.asarray(_evaluate(expression.expr, grids)).astype(np.int64)
+    if isinstance(expression, BinopExpr):
+        lhs, rhs = _evaluate(expression.lhs, grids), _evaluate(expression.rhs, grids)
+        if expression.operator in _COMPARISONS:
+            return _COMPARISONS[expression.operator](lhs, rhs)
+        if expression.operator in _ARITHMETIC:
+            # States outside the support may divide by zero, their results are never used.
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return _ARITHMETIC[expression.operator](lhs, rhs)
+    raise NotImplementedError(f"Cannot evaluate the expression {expression}.")
+
+
+def _trimmed(array: np.ndarray) -> np.ndarray:
+    """Removes trailing zeros along every axis."""
+    nonzero = np.nonzero(array)
+    if len(nonzero) == 0 or nonzero[0].size == 0:
+        return np.zeros((1,) * array.ndim, dtype=array.dtype)
+    return array[tuple(slice(0, int(indices.max()) + 1) for indices in nonzero)]
+
+
+def _convolve(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Computes the multidimensional convolution of two arrays, using the FFT for large inputs."""
+    if first.ndim == 0:
+        return first * second
+    shape = tuple(a + b - 1 for a, b in zip(first.shape, second.shape))
+    # The FFT only works in double precision, and does not pay off for small operands.
+    if min(first.size, second.size) <= _FFT_THRESHOLD or np.longdouble in (first.dtype, second.dtype):
+        if first.ndim == 1:
+            return np.convolve(first, second)
+        result = np.zeros(shape, dtype=np.result_type(first, second))
+        for index in zip(*np.nonzero(second)):
+            window = tuple(slice(offset, offset + extent) for offset, extent in zip(index, first.shape))
+            result[window] += second[index] * first
+        return result
+    axes = tuple(range(first.ndim))
+    result = np.fft.irfftn(np.fft.rfftn(first, shape, axes) * np.fft.rfftn(second, shape, axes), shape, axes)
+    # Rounding errors of the transform may produce tiny negative probabilities.
+    return np.clip(result, 0, None) if np.all(first >= 0) and np.all(second >= 0) else result
+
+
+def _scalar(value) -> float:
+    """Converts a numeric operand into a float."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(Fraction(str(value)))
+    except ValueError:
+        pass
+    expr = sympy.sympify(str(value))
+    if expr.free_symbols:
+        raise ValueError(f"The dense engine does not support symbolic values, got {value}.")
+    return float(expr)
+
+
+class DenseDist(Distribution):
+    """A distribution stored as a dense array of probabilities, with one axis per variable."""
+
+    tolerance: float = 1e-12
+    """Absolute tolerance used when comparing distributions."""
+
+    def __init__(self, array: np.ndarray, variables: Sequence[str]):
+        variables = tuple(variables)
+        if array.ndim != len(variables):
+            raise ValueError(f"Expected an array with {len(variables)} dimensions, got {array.ndim}.")
+        self._array = array
+        self._variables: Tuple[str, ...] = variables
+
+    def factory(self) -> Type[DensePGF]:  # type: ignore[override]
+        # pylint: disable=arguments-differ
+        return DensePGF.configured(dtype=self._array.dtype.type)
+
+    # ================================ helpers ================================
+
+    def _new(self, array: np.ndarray, variables: Sequence[str]) -> DenseDist:
+        """Creates a distribution of the same kind as this one, with trailing zeros removed."""
+        return DenseDist(_trimmed(array), variables)
+
+    def _with_array(self, array: np.ndarray) -> DenseDist:
+        return self._new(array, self._variables)
+
+    def _index(self, variable: str) -> int:
+        try:
+            return self._variables.index(variable)
+        except ValueError as err:
+            raise ValueError(f"Unknown variable {variable}") from err
+
+    def _grids(self) -> Dict[str, np.ndarray]:
+        return dict(zip(self._variables, np.indices(self._array.shape, sparse=True)))
+
+    def _aligned(self, variables: Sequence[str], shape: Sequence[int] | None = None) -> np.ndarray:
+        """
+        Returns the array with axes ordered according to `variables` (which contain all own variables), padded with
+        zeros to `shape` if given.
+        """
+        missing = [var for var in variables if var not in self._variables]
+        array = self._array.reshape(self._array.shape + (1,) * len(missing))
+        order = self._variables + tuple(missing)
+        array = np.transpose(array, [order.index(var) for var in variables])
+        if shape is not None:
+            array = np.pad(array, [(0, extent - array.shape[axis]) for axis, extent in enumerate(shape)])
+        return array
+
+    def _common(self, other: DenseDist) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+        variables = self._variables + tuple(var for var in other._variables if var not in self._variables)
+        shape = tuple(map(max, self._aligned(variables).shape, other._aligned(variables).shape))
+        return variables, self._aligned(variables, shape), other._aligned(variables, shape)
+
+    def _operand(self, other) -> DenseDist | float:
+        if isinstance(other, DenseDist):
+            return other
+        if isinstance(other, str) and sympy.sympify(other).free_symbols & set(map(sympy.Symbol, self._variables)):
+            return self.factory().from_expr(other, *self._variables)
+        if isinstance(other, (str, int, float)):
+            return _scalar(other)
+        if isinstance(other, Distribution):
+            return NotImplemented
+        raise SyntaxError(f"You cannot combine {type(self)} with {type(other)}.")
+
+    def _assigned(self, variable: str, values) -> DenseDist:
+        """Assigns `values` (an array broadcastable to the shape of the distribution) to `variable`."""
+        axis = self._index(variable)
+        support = self._array != 0
+        new_values = np.broadcast_to(np.asarray(values), self._array.shape)[support]
+        if np.any(new_values < 0) or np.any(new_values != np.floor(new_values)):
+            raise ValueError(f"Cannot assign non-natural values to {variable}.")
+        new_values = new_values.astype(np.int64)
+        indices = list(np.nonzero(support))
+        indices[axis] = new_values
+        shape = list(self._array.shape)
+        shape[axis] = int(new_values.max()) + 1 if new_values.size > 0 else 1
+        result = np.zeros(shape, dtype=self._array.dtype)
+        np.add.at(result, tuple(indices), self._array[support])
+        return self._with_array(result)
+
+    def _values_of(self, operand: str | int):
+        if isinstance(operand, str) and operand in self._variables:
+            return self._grids()[operand]
+        value = _scalar(operand)
+        if value != int(value):
+            raise ValueError(f"Cannot use the non-natural value {operand} in an update.")
+        return int(value)
+
+    # ================================ arithmetic ================================
+
+    def __add__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if not isinstance(other, DenseDist):
+            other = self.factory().one(*self._variables) * other
+        variables, own, others = self._common(other)
+        return self._new(own + others, variables)
+
+    def __sub__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if not isinstance(other, DenseDist):
+            other = self.factory().one(*self._variables) * other
+        variables, own, others = self._common(other)
+        return self._new(own - others, variables)
+
+    def __mul__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if not isinstance(other, DenseDist):
+            return self._with_array(self._array * other)
+        variables = self._variables + tuple(var for var in other._variables if var not in self._variables)
+        own, others = self._aligned(variables), other._aligned(variables)
+        if not set(self._variables) & set(other._variables):
+            # Independent variables: the product is an outer product, which broadcasting computes directly.
+            return self._new(own * others, variables)
+        # Otherwise, the product of generating functions is a multidimensional convolution.
+        return self._new(_convolve(own, others), variables)
+
+    def __truediv__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if isinstance(other, DenseDist):
+            if other._array.size != 1:
+                raise NotImplementedError("Dense distributions can only be divided by constants.")
+            other = float(other._array.sum())
+        return self._with_array(self._array / other)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, str):
+            other = self.factory().from_expr(other, *self._variables)
+        elif isinstance(other, Distribution) and not isinstance(other, DenseDist):
+            if not other.is_finite() or other.get_parameters():
+                return False
+            other = self.factory().from_expr(str(other), *other.get_variables())
+        if not isinstance(other, DenseDist) or set(self._variables) != set(other._variables):
+            return False
+        _, own, others = self._common(other)
+        return bool(np.allclose(own, others, rtol=0, atol=self.tolerance))
+
+    def __hash__(self) -> int:
+        # Equality is up to `tolerance`, which no hash of the probabilities respects. The canonical key requires
+        # bitwise equal probabilities and is thus only used as a cache key.
+        return hash((type(self).__name__, tuple(sorted(self._variables))))
+
+    def __le__(self, other) -> bool:
+        if not isinstance(other, DenseDist):
+            raise TypeError(f"Incomparable types {type(self)} and {type(other)}.")
+        _, own, others = self._common(other)
+        return bool(np.all(own <= others + self.tolerance))
+
+    def __str__(self) -> str:
+        summands = []
+        for prob, state in self:
+            monomial = [f"{var}^{value}" if value > 1 else var for var, value in state.items() if value > 0]
+            summands.append("*".join([prob] + monomial))
+        return " + ".join(summands) if summands else "0"
+
+    def __repr__(self) -> str:
+        return f"DenseDist({self}, variables={self._variables})"
+
+    def __iter__(self) -> Iterator[Tuple[str, State]]:
+        indices = sorted(zip(*np.nonzero(self._array)), key=lambda index: (sum(index), index))
+        for index in indices:
+            yield repr(float(self._array[index])), State(dict(zip(self._variables, map(int, index))))
+
+    def copy(self, deep: bool = True) -> DenseDist:
+        return DenseDist(self._array.copy() if deep else self._array, self._variables)
+
+    # ================================ queries ================================
+
+    def get_probability_mass(self) -> str:
+        return repr(float(self._array.sum()))
+
+    def get_expected_value_of(self, expression: Union[Expr, str]) -> str:
+        expr = parse_expr(expression) if isinstance(expression, str) else expression
+        return repr(float(np.sum(self._array * _evaluate(expr, self._grids()))))
+
+    def normalize(self) -> DenseDist:
+        mass = self._array.sum()
+        if mass == 0:
+            raise ZeroDivisionError("Cannot normalize a distribution with probability mass 0.")
+        return self._with_array(self._array / mass)
+
+    def get_variables(self) -> Set[str]:
+        return set(self._variables)
+
+    def get_parameters(self) -> Set[str]:
+        return set()
+
+    def is_zero_dist(self) -> bool:
+        return not np.any(self._array)
+
+    def is_finite(self) -> bool:
+        return True
+
+    def expression_size(self) -> int:
+        return int(np.count_nonzero(self._array))
+
+    def canonical_key(self) -> Tuple:
+        variables = tuple(sorted(self._variables))
+        array = np.ascontiguousarray(self._aligned(variables))
+        return type(self).__name__, variables, array.shape, str(array.dtype), array.tobytes()
+
+    def get_fresh_variable(self, exclude: Set[str] | FrozenSet[str] = frozenset()) -> str:
+        i = 0
+        while f'_{i}' in self._variables or f'_{i}' in exclude:
+            i += 1
+        return f'_{i}'
+
+    def _find_symbols(self, expr: str) -> Set[str]:
+        return {str(symbol) for symbol in sympy.sympify(expr).free_symbols}
+
+    @staticmethod
+    def evaluate(expression: str, state: State):
+        grids = {var: np.asarray(value) for var, value in state.items()}
+        result = _evaluate(parse_expr(expression), grids)
+        return np.asarray(result).item()
+
+    # ================================ filtering ================================
+
+    def filter(self, condition: Expr) -> DenseDist:
+        if isinstance(condition, BoolLitExpr):
+            return self if condition.value else self._with_array(np.zeros_like(self._array))
+        mask = np.broadcast_to(_evaluate(condition, self._grids()), self._array.shape)
+        return self._with_array(np.where(mask, self._array, 0))
+
+    def _exhaustive_search(self, condition: Expr) -> DenseDist:
+        return self.filter(condition)
+
+    def _filter_constant_condition(self, condition: Expr) -> DenseDist:
+        return self.filter(condition)
+
+    def _arithmetic_progression(self, variable: str, modulus: str) -> Sequence[DenseDist]:
+        values = self._grids()[variable] % int(modulus)
+        return [self._with_array(np.where(np.broadcast_to(values == remainder, self._array.shape), self._array, 0))
+                for remainder in range(int(modulus))]
+
+    def hadamard_product(self, other: Distribution) -> DenseDist:
+        if not isinstance(other, DenseDist):
+            raise NotImplementedError("The Hadamard product is only supported for two dense distributions.")
+        variables, own, others = self._common(other)
+        return self._new(own * others, variables)
+
+    # ================================ updates ================================
+
+    def update(self, expression: Expr, approximate: str | float | None = None) -> DenseDist:
+        assert isinstance(expression, BinopExpr) and isinstance(expression.lhs, VarExpr), \
+            f"Expression must be an assignment, was {expression}."
+        return self._assigned(expression.lhs.var, _evaluate(expression.rhs, self._grids()))
+
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> DenseDist:
+        grids = self._grids()
+        support = self._array != 0
+        indices = list(np.nonzero(support))
+        shape = list(self._array.shape)
+        for var, (constant, coefficients) in updates.items():
+            values = constant + sum(coefficient * grids[read] for read, coefficient in coefficients.items())
+            values = np.broadcast_to(np.asarray(values), self._array.shape)[support].astype(np.int64)
+            axis = self._index(var)
+            indices[axis] = values
+            shape[axis] = int(values.max()) + 1 if values.size > 0 else 1
+        result = np.zeros(shape, dtype=self._array.dtype)
+        np.add.at(result, tuple(indices), self._array[support])
+        return self._with_array(result)
+
+    def _update_var(self, updated_var: str, assign_var: str | int) -> DenseDist:
+        return self._assigned(updated_var, self._values_of(assign_var))
+
+    def _update_binop(self, temp_var: str, left: str | int, right: str | int, op: Binop) -> DenseDist:
+        return self._assigned(temp_var, _ARITHMETIC[op](self._values_of(left), self._values_of(right)))
+
+    def _update_sum(self, temp_var: str, first_summand: str | int, second_summand: str | int) -> DenseDist:
+        return self._update_binop(temp_var, first_summand, second_summand, Binop.PLUS)
+
+    def _update_product(self, temp_var: str, first_factor: str, second_factor: str,
+                        approximate: str | float | None) -> DenseDist:
+        return self._update_binop(temp_var, first_factor, second_factor, Binop.TIMES)
+
+    def _update_subtraction(self, temp_var: str, sub_from: str | int, sub: str | int) -> DenseDist:
+        return self._update_binop(temp_var, sub_from, sub, Binop.MINUS)
+
+    def _update_modulo(self, temp_var: str, left: str | int, right: str | int,
+                       approximate: str | float | None) -> DenseDist:
+        return self._update_binop(temp_var, left, right, Binop.MODULO)
+
+    def _update_division(self, temp_var: str, numerator: str | int, denominator: str | int,
+                         approximate: str | float | None) -> DenseDist:
+        return self._update_binop(temp_var, numerator, denominator, Binop.DIVIDE)
+
+    def _update_power(self, temp_var: str, base: str | int, exp: str | int,
+                      approximate: str | float | None) -> DenseDist:
+        return self._update_binop(temp_var, base, exp, Binop.POWER)
+
+    def _sample(self, sampling_dist: Expr, variable: str) -> DenseDist:
+        """Returns the distribution of a single sample of `sampling_dist` in `variable`."""
+        if isinstance(sampling_dist, FunctionCallExpr):
+            return self.factory().from_function_call(sampling_dist, variable)
+        return self.factory().from_expr(str(sampling_dist), variable)
+
+    def update_iid(self, sampling_dist: Expr, count: VarExpr, variable: Union[str, VarExpr]) -> DenseDist:
+        variable = str(variable)
+        sample = self._sample(sampling_dist, variable)._array
+        count_axis, var_axis = self._index(count.var), self._index(variable)
+
+        # powers[k] is the distribution of the sum of k samples
+        powers: List[np.ndarray] = [np.ones(1, dtype=self._array.dtype)]
+        for _ in range(1, self._array.shape[count_axis]):
+            powers.append(_convolve(powers[-1], sample))
+        extent = len(powers[-1])
+
+        # The sampled variable is overwritten, so we first sum out its old values (unless it is the counter itself).
+        marginal = self._array if count_axis == var_axis else self._array.sum(axis=var_axis, keepdims=True)
+        shape = list(marginal.shape)
+        shape[var_axis] = extent
+        result = np.zeros(shape, dtype=self._array.dtype)
+        for count_value, power in enumerate(powers):
+            source = np.take(marginal, [count_value], axis=count_axis)
+            if count_axis == var_axis:
+                source = source.sum(axis=var_axis, keepdims=True)
+            padded = np.zeros(extent, dtype=self._array.dtype)
+            padded[:len(power)] = power
+            contribution = source * padded.reshape([-1 if axis == var_axis else 1 for axis in range(marginal.ndim)])
+            if count_axis == var_axis:
+                result += contribution
+            else:
+                target = [slice(None)] * marginal.ndim
+                target[count_axis] = slice(count_value, count_value + 1)
+                result[tuple(target)] += contribution
+        return self._with_array(result)
+
+    # ================================ variables ================================
+
+    def marginal(self, *variables: Union[str, VarExpr], method: MarginalType = MarginalType.INCLUDE) -> DenseDist:
+        if len(variables) == 0:
+            raise ValueError("No variables were provided")
+        selected = {str(var) for var in variables}
+        if not selected <= self.get_variables():
+            raise ValueError(f"Unknown variable(s): {selected - self.get_variables()}")
+        kept = tuple(var for var in self._variables if (var in selected) == (method == MarginalType.INCLUDE))
+        axes = tuple(i for i, var in enumerate(self._variables) if var not in kept)
+        return self._new(self._array.sum(axis=axes), kept)
+
+    def set_variables(self, *variables: str) -> DenseDist:
+        if not variables:
+            raise ValueError("The free-variables of a distribution cannot be empty!")
+        new_vars = tuple(dict.fromkeys(variables))
+        removed = [var for var in self._variables if var not in new_vars]
+        array = _trimmed(self._array)
+        for var in removed:
+            if array.shape[self._index(var)] > 1:
+                raise ValueError(f"Cannot remove the variable {var}, as it is not constantly 0.")
+        if removed:
+            array = array.reshape(tuple(extent for var, extent in zip(self._variables, array.shape)
+                                        if var not in removed))
+        kept = tuple(var for var in self._variables if var not in removed)
+        return self._new(array, kept)._with_variables(new_vars)
+
+    def _with_variables(self, variables: Tuple[str, ...]) -> DenseDist:
+        return self._new(self._aligned(variables), variables)
+
+    def set_parameters(self, *parameters: str) -> DenseDist:
+        if parameters:
+            raise NotImplementedError("The dense engine does not support parameters.")
+        return self
+
+    def set_variables_and_parameters(self, variables, parameters):
+        return self.set_variables(*variables).set_parameters(*parameters)
+
+    # ================================ approximation ================================
+
+    def approximate(self, threshold: Union[str, int]) -> Generator[DenseDist, None, None]:
+        result = np.zeros_like(self._array)
+        limit = int(threshold) if isinstance(threshold, int) else None
+        target = None if limit is not None else _scalar(threshold)
+        count = 0
+        for index in sorted(zip(*np.nonzero(self._array)), key=lambda index: (sum(index), index)):
+            result[index] = self._array[index]
+            count += 1
+            yield self._with_array(result.copy())
+            if limit is not None and count >= limit:
+                return
+            if target is not None and result.sum() >= target:
+                return
+
+    def approximate_unilaterally(self, variable: str, probability_mass: str | float) -> DenseDist:
+        # Finite distributions are represented exactly.
+        return self
+
+
+class DensePGF(CommonDistributionsFactory):
+    """Implements common distributions with finite support as dense distributions."""
+
+    dtype: Type[np.floating] = np.float64
+    """The floating point type of created distributions, see `ForwardAnalysisConfig.use_long_double`."""
+
+    @classmethod
+    def configured(cls: Type[_Factory], **settings) -> Type[_Factory]:
+        """
+        Returns a factory of the same kind whose class attributes (e.g., `dtype`) are overridden by `settings`.
+        Configured factories are created once per combination of settings, and the factory itself is returned if the
+        settings agree with its own.
+        """
+        if all(getattr(cls, name) == value for name, value in settings.items()):
+            return cls
+        key = (cls, tuple(sorted(settings.items())))
+        if key not in _CONFIGURED:
+            _CONFIGURED[key] = type(cls.__name__, (cls,), dict(settings))
+        configured: Type[_Factory] = _CONFIGURED[key]
+        return configured
+
+    @staticmethod
+    def _infinite(name: str) -> NoReturn:
+        raise NotImplementedError(f"The {name} distribution has infinite support and cannot be represented densely.")
+
+    @staticmethod
+    def _natural_param(param: DistributionParam) -> int:
+        value = _scalar(param)
+        if value < 0 or value != int(value):
+            raise ValueError(f"Dense distributions require natural parameters, but got {param}.")
+        return int(value)
+
+    @staticmethod
+    def _probability_param(param: DistributionParam) -> float:
+        value = _scalar(param)
+        if not 0 <= value <= 1:
+            raise ValueError(f"Parameter must be in [0,1], but was {param}")
+        return value
+
+    @classmethod
+    def _univariate(cls, var: Union[str, VarExpr], probabilities: Sequence[float]) -> DenseDist:
+        return DenseDist(_trimmed(np.asarray(probabilities, dtype=cls.dtype)), (str(var),))
+
+    @staticmethod
+    def geometric(var: Union[str, VarExpr], p: DistributionParam) -> DenseDist:
+        return DensePGF._infinite("geometric")
+
+    @classmethod
+    def uniform(cls, var: Union[str, VarExpr], lower: DistributionParam, upper: DistributionParam) -> DenseDist:
+        low, high = DensePGF._natural_param(lower), DensePGF._natural_param(upper)
+        if low > high:
+            raise ValueError("Distribution parameters must satisfy 0 <= a < b < oo")
+        return cls._univariate(var, [0.0] * low + [1 / (high - low + 1)] * (high - low + 1))
+
+    @classmethod
+    def bernoulli(cls, var: Union[str, VarExpr], p: DistributionParam) -> DenseDist:
+        prob = DensePGF._probability_param(p)
+        return cls._univariate(var, [1 - prob, prob])
+
+    @staticmethod
+    def poisson(var: Union[str, VarExpr], lam: DistributionParam) -> DenseDist:
+        return DensePGF._infinite("poisson")
+
+    @staticmethod
+    def log(var: Union[str, VarExpr], p: DistributionParam) -> DenseDist:
+        return DensePGF._infinite("logarithmic")
+
+    @classmethod
+    def binomial(cls, var: Union[str, VarExpr], n: DistributionParam, p: DistributionParam) -> DenseDist:
+        trials, prob = DensePGF._natural_param(n), DensePGF._probability_param(p)
+        return cls._univariate(var, [math.comb(trials, k) * prob ** k * (1 - prob) ** (trials - k)
+                                     for k in range(trials + 1)])
+
+    @classmethod
+    def zero(cls, *variables: Union[str, VarExpr]) -> DenseDist:
+        return DenseDist(np.zeros((1,) * len(variables), dtype=cls.dtype), tuple(map(str, variables)))
+
+    @classmethod
+    def undefined(cls, *variables: Union[str, VarExpr]) -> DenseDist:
+        return cls.zero(*variables)
+
+    @classmethod
+    def one(cls, *variables: Union[str, VarExpr]) -> DenseDist:
+        return DenseDist(np.ones((1,) * len(variables), dtype=cls.dtype), tuple(map(str, variables)))
+
+    @classmethod
+    def from_expr(cls, expression: Union[str, Expr], *variables, **kwargs) -> DenseDist:
+        names = tuple(dict.fromkeys(map(str, variables)))
+        expr = sympy.expand(sympy.sympify(str(expression)))
+        if len(names) == 0:
+            names = tuple(sorted(str(symbol) for symbol in expr.free_symbols))
+        if {str(symbol) for symbol in expr.free_symbols} - set(names):
+            raise ValueError(f"The dense engine does not support parameters, got {expression}.")
+        if len(names) == 0:
+            return DenseDist(np.asarray(float(expr), dtype=cls.dtype), ())
+        try:
+            terms = sympy.Poly(expr, *(sympy.Symbol(name) for name in names)).terms()
+        except sympy.PolynomialError as err:
+            raise ValueError(f"{expression} does not describe a distribution with finite support.") from err
+        shape = tuple(max(int(exps[i]) for exps, _ in terms) + 1 for i in range(len(names)))
+        array = np.zeros(shape, dtype=cls.dtype)
+        for exps, coefficient in terms:
+            array[tuple(map(int, exps))] += float(coefficient)
+        return DenseDist(_trimmed(array), names)
+
+    @classmethod
+    def from_function_call(cls, call: FunctionCallExpr, variable: str) -> DenseDist:
+        """Creates the distribution of a sampling function call like `binomial(n, p)` in `variable`."""
+        params = call.params[0]
+        if call.function == "binomial":
+            return cls.binomial(variable, *params)
+        if call.function in {"unif", "unif_d"}:
+            return cls.uniform(variable, *params)
+        if call.function == "bernoulli":
+            return cls.bernoulli(variable, *params)
+        if call.function in {"geometric", "poisson", "logdist"}:
+            DensePGF._infinite(call.function)
+        raise NotImplementedError(f"Unsupported distribution: {call}")
@@ -4,15 +4,18 @@ import functools
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import (Dict, FrozenSet, Generator, Iterator, List, Sequence, Set,
-                    Tuple, Type, Union)
+from typing import (Dict, FrozenSet, Generator, Hashable, Iterator, List,
+                    Optional, Sequence, Set, Tuple, Type, Union)
 
+import numpy as np
+import sympy
 from probably.pgcl import (Binop, BinopExpr, BoolLitExpr, Expr, NatLitExpr,
                            RealLitExpr, Unop, UnopExpr, VarExpr)
 from probably.pgcl.parser import parse_expr
 
 from prodigy.pgcl.pgcl_checks import (check_is_constant_constraint,
                                       check_is_modulus_condition, has_variable)
+from prodigy.pgcl.pgcl_compile import compile_condition
 from prodigy.pgcl.pgcl_operations import state_to_equality_expression
 
 
@@ -24,6 +27,74 @@ class MarginalType(Enum):
 
 DistributionParam = Union[str, Expr]
 
+AffineUpdate = Tuple[int, Dict[str, int]]
+"""An affine expression `c + a_1 * x_1 + ... + a_n * x_n` with natural coefficients, given as `(c, {x_i: a_i})`."""
+
+
+def _affine_expression(update: AffineUpdate) -> Expr:
+    """Converts an affine update into the corresponding pGCL expression."""
+    constant, coefficients = update
+    expr: Expr = NatLitExpr(constant)
+    for var, coefficient in coefficients.items():
+        summand: Expr = VarExpr(var) if coefficient == 1 else BinopExpr(Binop.TIMES, NatLitExpr(coefficient),
+                                                                      VarExpr(var))
+        expr = summand if expr == NatLitExpr(0) else BinopExpr(Binop.PLUS, expr, summand)
+    return expr
+
+
+_COMPLEMENTS: Dict[Binop, Binop] = {
+    Binop.LT: Binop.GEQ,
+    Binop.GEQ: Binop.LT,
+    Binop.LEQ: Binop.GT,
+    Binop.GT: Binop.LEQ,
+}
+"""Comparisons whose negation is again a comparison, such that the complement of a filter needs no subtraction."""
+
+
+def _is_connective(condition: Expr) -> bool:
+    return isinstance(condition, BinopExpr) and condition.operator in (Binop.AND, Binop.OR) \
+        or isinstance(condition, UnopExpr) and condition.operator == Unop.NEG
+
+
+def _first_atom(condition: Expr) -> Optional[Expr]:
+    """Returns the leftmost atomic constraint of a boolean combination, or `None` if it is a literal."""
+    if isinstance(condition, BoolLitExpr):
+        return None
+    if isinstance(condition, BinopExpr) and condition.operator in (Binop.AND, Binop.OR):
+        atom = _first_atom(condition.lhs)
+        return atom if atom is not None else _first_atom(condition.rhs)
+    if isinstance(condition, UnopExpr) and condition.operator == Unop.NEG:
+        return _first_atom(condition.expr)
+    return condition
+
+
+def _restrict(condition: Expr, atom: Optional[Expr], value: bool) -> Expr:
+    """
+    Replaces every occurrence of `atom` in a boolean combination by `value` and simplifies the result. Combinations
+    of literals only are always simplified to a single literal.
+    """
+    if isinstance(condition, BinopExpr) and condition.operator in (Binop.AND, Binop.OR):
+        lhs, rhs = _restrict(condition.lhs, atom, value), _restrict(condition.rhs, atom, value)
+        # True absorbs disjunctions and is neutral for conjunctions, and vice versa for False.
+        absorbing = condition.operator == Binop.OR
+        for side, other in ((lhs, rhs), (rhs, lhs)):
+            if isinstance(side, BoolLitExpr):
+                return side if side.value == absorbing else other
+        return BinopExpr(condition.operator, lhs, rhs)
+    if isinstance(condition, UnopExpr) and condition.operator == Unop.NEG:
+        operand = _restrict(condition.expr, atom, value)
+        if isinstance(operand, BoolLitExpr):
+            return BoolLitExpr(not operand.value)
+        return UnopExpr(Unop.NEG, operand)
+    return BoolLitExpr(value) if condition == atom else condition
+
+
+def _disjuncts(condition: Expr) -> List[Expr]:
+    """Flattens nested disjunctions into the list of their operands."""
+    if isinstance(condition, BinopExpr) and condition.operator == Binop.OR:
+        return _disjuncts(condition.lhs) + _disjuncts(condition.rhs)
+    return [condition]
+
 
 @dataclass
 class State:
@@ -117,6 +188,9 @@ class Distribution(ABC):
     def __eq__(self, other) -> bool:
         """ Checks whether two distributions are equal. """
 
+    def __hash__(self) -> int:
+        return hash(self.canonical_key())
+
     @abstractmethod
     def __le__(self, other) -> bool:
         """ Checks whether `self` is less or equal than `other`."""
@@ -201,14 +275,12 @@ class Distribution(ABC):
             if condition.operator == Binop.AND:
                 return self.filter(condition.lhs).filter(condition.rhs)
             if condition.operator == Binop.OR:
-                filtered_left = self.filter(condition.lhs)
-                return filtered_left + self.filter(
-                    condition.rhs) - filtered_left.filter(condition.rhs)
+                return self._filter_disjoint(condition)
 
         if isinstance(condition, UnopExpr):
             # unary relation
             if condition.operator == Unop.NEG:
-                return self - self.filter(condition.expr)
+                return self._filter_disjoint(condition)
             raise SyntaxError(
                 f"We do not support filtering for {type(Unop.IVERSON)} expressions."
             )
@@ -243,8 +315,49 @@ class Distribution(ABC):
         # Worst case: infinite Generating function and  non-standard condition.
         # Here we try marginalization and hope that the marginal is finite so we can do
         # exhaustive search again. If this is not possible, we raise an NotComputableException
+        # The explicit states are pairwise disjoint, so the filtered parts can simply be added up.
         expression = self._explicit_state_unfolding(condition)
-        return self.filter(expression)
+        return functools.reduce(lambda left, right: left + right,
+                                (self.filter(disjunct) for disjunct in _disjuncts(expression)))
+
+    def _filter_disjoint(self, condition: Expr) -> Distribution:
+        """
+        Filters by a boolean combination of constraints using a Shannon expansion: the distribution is split into the
+        disjoint parts which satisfy and violate the leftmost atomic constraint, each part is filtered by the
+        condition simplified under that assumption, and the results are added up. Unlike inclusion-exclusion, every
+        atomic constraint is filtered at most once along each branch, and branches without probability mass are
+        pruned.
+        """
+        if self.is_zero_dist():
+            return self
+        atom = _first_atom(condition)
+        if atom is None:
+            return self.filter(_restrict(condition, None, True))
+        complement: Optional[Expr] = None
+        if isinstance(atom, BinopExpr) and atom.operator in _COMPLEMENTS:
+            complement = BinopExpr(_COMPLEMENTS[atom.operator], atom.lhs, atom.rhs)
+        unsatisfiable = BoolLitExpr(False)
+        restricted = {value: _restrict(condition, atom, value) for value in (True, False)}
+
+        # Only compute the parts of the distribution whose restricted condition can still be satisfied.
+        parts: Dict[bool, Distribution] = {}
+        if restricted[True] != unsatisfiable or complement is None:
+            parts[True] = self.filter(atom)
+        if restricted[False] != unsatisfiable:
+            parts[False] = self.filter(complement) if complement is not None else self - parts[True]
+
+        results = []
+        for value, part in parts.items():
+            if restricted[value] == unsatisfiable:
+                continue
+            if _is_connective(restricted[value]):
+                # pylint: disable=protected-access
+                results.append(part._filter_disjoint(restricted[value]))
+            else:
+                results.append(part.filter(restricted[value]))
+        if len(results) == 0:
+            return self.filter(unsatisfiable)
+        return functools.reduce(lambda left, right: left + right, results)
 
     @abstractmethod
     def _exhaustive_search(self, condition: Expr) -> Distribution:
@@ -390,6 +503,23 @@ class Distribution(ABC):
                 condition.rhs, state)
         raise AssertionError(f"Unexpected condition type. {condition}")
 
+    @classmethod
+    def _evaluate_condition_in(cls, condition: Expr, states: Sequence[State]) -> np.ndarray:
+        """
+        Evaluates whether the condition holds in each of the given states. The condition is compiled once and evaluated
+        for all states at once. Conditions which the compiled version cannot evaluate, e.g., because they contain
+        parameters, are evaluated state by state using `evaluate_condition`.
+        """
+        if len(states) == 0:
+            return np.zeros(0, dtype=bool)
+        variables = set.intersection(*(set(state.valuations) for state in states))
+        grids = {var: np.array([state.valuations[var] for state in states], dtype=np.int64) for var in variables}
+        try:
+            with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+                return np.broadcast_to(compile_condition(condition)(grids), (len(states),))
+        except (ValueError, TypeError, ArithmeticError, NotImplementedError):
+            return np.array([cls.evaluate_condition(condition, state) for state in states], dtype=bool)
+
     def evaluate_expression(self,
                             expression: Expr,
                             new_var: str | None = None) -> Distribution:
@@ -412,6 +542,32 @@ class Distribution(ABC):
     def is_finite(self) -> bool:
         """ Returns whether the distribution has finite support."""
 
+    def expression_size(self) -> int:
+        """ Returns the number of nodes in the expression tree representing the distribution."""
+        return sum(1 for _ in sympy.preorder_traversal(sympy.S(str(self))))
+
+    def coefficients(self, up_to: Dict[str, int]) -> Dict[State, str]:
+        """
+        Returns the probabilities of all states in which every variable `var` has a value of at most `up_to[var]`.
+        States with probability zero are omitted. All variables of the distribution have to be bounded.
+        """
+        if set(up_to) != self.get_variables():
+            raise ValueError(f"Bounds have to be given for exactly the variables {self.get_variables()}.")
+        condition: Expr = BoolLitExpr(True)
+        for var, bound in up_to.items():
+            condition = BinopExpr(Binop.AND, condition, BinopExpr(Binop.LEQ, VarExpr(var), NatLitExpr(bound)))
+        return {state: prob for prob, state in self.filter(condition) if sympy.S(prob) != 0}
+
+    def canonical_key(self) -> Hashable:
+        """
+        Returns a hashable key computed from a normal form of the distribution. Distributions of the same backend
+        with equal keys are equal, and backends normalize their representation such that equal distributions share
+        their key in most cases (always for rational generating functions). The key has a stable `repr`, such that
+        it can be used to identify distributions across processes.
+        """
+        return (type(self).__name__, str(sympy.cancel(sympy.S(str(self)))), tuple(sorted(self.get_variables())),
+                tuple(sorted(self.get_parameters())))
+
     def update(self,
                expression: Expr,
                approximate: str | float | None = None) -> Distribution:
@@ -511,6 +667,29 @@ class Distribution(ABC):
             result, _ = evaluate(self, expression.rhs, variable)
         return result
 
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> Distribution:
+        """
+        Simultaneously applies the affine assignments `updates`, mapping each updated variable to its new value in terms
+        of the current variable values. Variables that are not mentioned in `updates` keep their values.
+
+        The default implementation stores the new values in fresh variables first, and then assigns them.
+        """
+        if len(updates) == 1:
+            [(var, update)] = updates.items()
+            return self.update(BinopExpr(Binop.EQ, VarExpr(var), _affine_expression(update)))
+
+        temps: Dict[str, str] = {}
+        result = self
+        for var, update in updates.items():
+            temp = result.get_fresh_variable(set(temps.values()))
+            temps[var] = temp
+            result = result.set_variables(*result.get_variables(), temp).update(
+                BinopExpr(Binop.EQ, VarExpr(temp), _affine_expression(update)))
+        for var, temp in temps.items():
+            # pylint: disable=protected-access
+            result = result._update_var(var, temp)
+        return result.marginal(*temps.values(), method=MarginalType.EXCLUDE)
+
     @abstractmethod
     def get_fresh_variable(
             self, exclude: Set[str] | FrozenSet[str] = frozenset()) -> str:
@@ -0,0 +1,354 @@
+# pylint: disable=protected-access
+"""
+A product-form representation of distributions. Groups of independent variables are kept in separate factors (which
+are distributions of any backend), such that operations only involving variables of one group only touch the
+corresponding factor. Factors are multiplied out lazily, whenever an operation couples them.
+"""
+from __future__ import annotations
+
+import functools
+import operator
+from fractions import Fraction
+from typing import (Callable, Dict, Generator, Hashable, Iterable, Iterator, List, Sequence, Set, Tuple, Type, Union)
+
+from probably.pgcl import BinopExpr, Expr, VarExpr
+from probably.pgcl.ast.walk import Walk, walk_expr
+from probably.util.ref import Mut
+
+from prodigy.distribution.distribution import (AffineUpdate, CommonDistributionsFactory, Distribution,
+                                               MarginalType, State)
+from prodigy.distribution.generating_function import GeneratingFunction
+
+
+def _vars_of(expr: Expr) -> Set[str]:
+    return {ref.val.var for ref in walk_expr(Walk.DOWN, Mut.alloc(expr)) if isinstance(ref.val, VarExpr)}
+
+
+def _scale_op(left: str, right: str, op: Callable, symbol: str) -> str:
+    """Combines two scalar factors, evaluating them if they are rational numbers."""
+    try:
+        return str(op(Fraction(left), Fraction(right)))
+    except (ValueError, ZeroDivisionError):
+        return f"({left}){symbol}({right})"
+
+
+class FactoredDistribution(Distribution):
+    """
+    A distribution given as the product `scale * f_1 * ... * f_n` of factors `f_i` over pairwise disjoint sets of
+    variables.
+    """
+
+    def __init__(self, factors: Sequence[Distribution], scale: str = "1"):
+        if len(factors) == 0:
+            raise ValueError("A factored distribution needs at least one factor.")
+        self._factors: Tuple[Distribution, ...] = tuple(factors)
+        self._scale = scale
+
+    @classmethod
+    def factorize(cls, dist: Distribution, groups: Iterable[Iterable[str]]) -> FactoredDistribution:
+        """
+        Splits `dist` into factors over the given groups of variables. If `dist` is not the product of its marginals
+        for these groups, a single factor is used.
+        """
+        restricted: List[Set[str]] = [set(group) & dist.get_variables() for group in groups]
+        restricted = [group for group in restricted if len(group) > 0]
+        covered = set().union(*restricted)
+        if covered != dist.get_variables():
+            restricted.append(dist.get_variables() - covered)
+        if len(restricted) < 2:
+            return cls([dist])
+        candidate = cls([dist.marginal(*group) for group in restricted])
+        if candidate.joint() == dist:
+            return candidate
+        return cls([dist])
+
+    @property
+    def factors(self) -> Tuple[Distribution, ...]:
+        return self._factors
+
+    def joint(self) -> Distribution:
+        """Multiplies out all factors."""
+        result = functools.reduce(operator.mul, self._factors)
+        return result if self._scale == "1" else result * self._scale
+
+    def _constant(self, *values: str) -> str:
+        """Computes the product of the scale and `values` using the backend of the factors."""
+        first = self._factors[0]
+        result = first.factory().one(*first.get_variables()) * self._scale
+        for value in values:
+            result = result * value
+        return result.get_probability_mass()
+
+    def _merged(self, variables: Set[str]) -> Tuple[FactoredDistribution, int]:
+        """
+        Multiplies all factors containing any of `variables` into one factor. Returns the resulting distribution and
+        the index of the merged factor.
+        """
+        indices = [i for i, factor in enumerate(self._factors) if factor.get_variables() & variables]
+        if len(indices) == 0:
+            return self, 0
+        if len(indices) == 1:
+            return self, indices[0]
+        merged = functools.reduce(operator.mul, (self._factors[i] for i in indices))
+        factors = [factor for i, factor in enumerate(self._factors) if i not in indices[1:]]
+        factors[indices[0]] = merged
+        return FactoredDistribution(factors, self._scale), indices[0]
+
+    def _replace(self, index: int, factor: Distribution, scale: str | None = None) -> FactoredDistribution:
+        factors = list(self._factors)
+        factors[index] = factor
+        return FactoredDistribution(factors, self._scale if scale is None else scale)
+
+    def _apply(self, variables: Set[str], function: Callable[[Distribution], Distribution]) -> FactoredDistribution:
+        """Applies `function` to the factor containing `variables` (merging factors if necessary)."""
+        merged, index = self._merged(variables)
+        return merged._replace(index, function(merged._factors[index]))
+
+    # ================================ arithmetic ================================
+
+    @staticmethod
+    def _lift(other: Distribution) -> FactoredDistribution:
+        return other if isinstance(other, FactoredDistribution) else FactoredDistribution([other])
+
+    def _blocks(self, other: FactoredDistribution) -> List[Set[str]]:
+        """The finest partition of the variables which is coarser than the factorizations of `self` and `other`."""
+        blocks: List[Set[str]] = []
+        for group in [f.get_variables() for f in self._factors] + [f.get_variables() for f in other._factors]:
+            overlapping = [block for block in blocks if block & group]
+            merged = set(group).union(*overlapping)
+            blocks = [block for block in blocks if not block & group] + [merged]
+        return blocks
+
+    def _add_or_subtract(self, other, op: Callable, symbol: str) -> Distribution:
+        if not isinstance(other, Distribution):
+            return FactoredDistribution([op(self.joint(), other)])
+        other = self._lift(other)
+        if self.get_variables() != other.get_variables():
+            return FactoredDistribution([op(self.joint(), other.joint())])
+
+        # Factors that are identical in both summands can be factored out.
+        left, right = self, other
+        for block in self._blocks(other):
+            left, _ = left._merged(block)
+            right, _ = right._merged(block)
+        shared = [factor for factor in left._factors if any(factor is f for f in right._factors)]
+        left_rest = [factor for factor in left._factors if not any(factor is f for f in shared)]
+        right_rest = [factor for factor in right._factors if not any(factor is f for f in shared)]
+        if len(left_rest) == 0:
+            return FactoredDistribution(shared, _scale_op(self._scale, other._scale, op, symbol))
+        combined = op(FactoredDistribution(left_rest, left._scale).joint(),
+                      FactoredDistribution(right_rest, right._scale).joint())
+        return FactoredDistribution(shared + [combined])
+
+    def __add__(self, other) -> Distribution:
+        return self._add_or_subtract(other, operator.add, "+")
+
+    def __radd__(self, other) -> Distribution:
+        return self._lift(other) + self if isinstance(other, Distribution) else self + other
+
+    def __sub__(self, other) -> Distribution:
+        return self._add_or_subtract(other, operator.sub, "-")
+
+    def __rsub__(self, other) -> Distribution:
+        if isinstance(other, Distribution):
+            return self._lift(other) - self
+        return FactoredDistribution([other - self.joint()])
+
+    def __mul__(self, other) -> Distribution:
+        if isinstance(other, (str, int, float)):
+            return FactoredDistribution(self._factors, _scale_op(self._scale, str(other), operator.mul, "*"))
+        if isinstance(other, Distribution):
+            other = self._lift(other)
+            if self.get_variables() & other.get_variables():
+                return FactoredDistribution([self.joint() * other.joint()])
+            return FactoredDistribution(self._factors + other._factors,
+                                        _scale_op(self._scale, other._scale, operator.mul, "*"))
+        return NotImplemented
+
+    def __rmul__(self, other) -> Distribution:
+        return self * other
+
+    def __truediv__(self, other) -> Distribution:
+        if isinstance(other, (str, int, float)):
+            return FactoredDistribution(self._factors, _scale_op(self._scale, str(other), operator.truediv, "/"))
+        if isinstance(other, Distribution):
+            if not other.get_symbols() & self.get_variables():
+                # Dividing by a constant only affects the scale.
+                return self / other.get_probability_mass()
+            return FactoredDistribution([self.joint() / self._lift(other).joint()])
+        return NotImplemented
+
+    def __rtruediv__(self, other) -> Distribution:
+        return FactoredDistribution([self._lift(other).joint() / self.joint()])
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Distribution):
+            return False
+        return self.joint() == self._lift(other).joint()
+
+    __hash__ = Distribution.__hash__
+
+    def __le__(self, other) -> bool:
+        return self.joint() <= self._lift(other).joint()
+
+    def __str__(self) -> str:
+        factors = "*".join(f"({factor})" for factor in self._factors)
+        return factors if self._scale == "1" else f"({self._scale})*{factors}"
+
+    def __iter__(self) -> Iterator[Tuple[str, State]]:
+        return iter(self.joint())
+
+    def copy(self, deep: bool = True) -> FactoredDistribution:
+        return FactoredDistribution([factor.copy(deep) for factor in self._factors], self._scale)
+
+    # ================================ queries ================================
+
+    def factory(self) -> Type[CommonDistributionsFactory]:  # type: ignore[override]
+        # pylint: disable=arguments-differ
+        return self._factors[0].factory()
+
+    def get_probability_mass(self) -> str:
+        return self._constant(*(factor.get_probability_mass() for factor in self._factors))
+
+    def get_expected_value_of(self, expression: Union[Expr, str]) -> str:
+        if isinstance(expression, str):
+            return self.joint().get_expected_value_of(expression)
+        merged, index = self._merged(_vars_of(expression))
+        others = [factor.get_probability_mass() for i, factor in enumerate(merged._factors) if i != index]
+        return merged._constant(merged._factors[index].get_expected_value_of(expression), *others)
+
+    def normalize(self) -> FactoredDistribution:
+        return FactoredDistribution([factor.normalize() for factor in self._factors])
+
+    def get_variables(self) -> Set[str]:
+        return set().union(*(factor.get_variables() for factor in self._factors))
+
+    def get_parameters(self) -> Set[str]:
+        return set().union(*(factor.get_parameters() for factor in self._factors))
+
+    def is_zero_dist(self) -> bool:
+        return self._scale == "0" or any(factor.is_zero_dist() for factor in self._factors)
+
+    def is_finite(self) -> bool:
+        return all(factor.is_finite() for factor in self._factors)
+
+    def expression_size(self) -> int:
+        return sum(factor.expression_size() for factor in self._factors)
+
+    def canonical_key(self) -> Hashable:
+        # Equality compares the joint distributions, so the key has to be independent of the factorization.
+        return self.joint().canonical_key()
+
+    def get_fresh_variable(self, exclude: Set[str] | frozenset[str] = frozenset()) -> str:
+        return self._factors[0].get_fresh_variable(set(exclude) | self.get_variables() | self.get_parameters())
+
+    def _find_symbols(self, expr: str) -> Set[str]:
+        return self._factors[0]._find_symbols(expr)
+
+    @staticmethod
+    def evaluate(expression: str, state: State):
+        return GeneratingFunction.evaluate(expression, state)
+
+    # ================================ transformations ================================
+
+    def filter(self, condition: Expr) -> Distribution:
+        return self._apply(_vars_of(condition) & self.get_variables(), lambda factor: factor.filter(condition))
+
+    def update(self, expression: Expr, approximate: str | float | None = None) -> Distribution:
+        assert isinstance(expression, BinopExpr) and isinstance(expression.lhs, VarExpr), \
+            f"Expression must be an assignment, was {expression}."
+        return self._apply({expression.lhs.var} | _vars_of(expression.rhs),
+                           lambda factor: factor.update(expression, approximate))
+
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> Distribution:
+        variables = set(updates).union(*(coefficients for _, coefficients in updates.values()))
+        return self._apply(variables, lambda factor: factor.update_affine(updates))
+
+    def update_iid(self, sampling_dist: Expr, count: VarExpr, variable: Union[str, VarExpr]) -> Distribution:
+        return self._apply({count.var, str(variable)} | _vars_of(sampling_dist),
+                           lambda factor: factor.update_iid(sampling_dist, count, variable))
+
+    def marginal(self, *variables: Union[str, VarExpr],
+                 method: MarginalType = MarginalType.INCLUDE) -> Distribution:
+        if len(variables) == 0:
+            raise ValueError("No variables were provided")
+        selected = {str(var) for var in variables}
+        if not selected <= self.get_variables():
+            raise ValueError(f"Unknown variable(s): {selected - self.get_variables()}")
+        kept = selected if method == MarginalType.INCLUDE else self.get_variables() - selected
+
+        factors: List[Distribution] = []
+        masses: List[str] = []
+        for factor in self._factors:
+            factor_kept = factor.get_variables() & kept
+            if factor_kept == factor.get_variables():
+                factors.append(factor)
+            elif len(factor_kept) == 0:
+                masses.append(factor.get_probability_mass())
+            else:
+                factors.append(factor.marginal(*factor_kept))
+        if len(factors) == 0:
+            raise ValueError("A marginal needs at least one variable.")
+        return FactoredDistribution(factors, FactoredDistribution(factors, self._scale)._constant(*masses))
+
+    def set_variables(self, *variables: str) -> Distribution:
+        new_vars = set(variables)
+        if not self.get_variables() <= new_vars:
+            return FactoredDistribution([self.joint().set_variables(*variables)])
+        added = new_vars - self.get_variables()
+        if len(added) == 0:
+            return self
+        one = self._factors[0].factory().one(*added).set_parameters(*self.get_parameters())
+        return FactoredDistribution(self._factors + (one,), self._scale)
+
+    def set_parameters(self, *parameters: str) -> Distribution:
+        return FactoredDistribution([factor.set_parameters(*parameters) for factor in self._factors], self._scale)
+
+    def set_variables_and_parameters(self, variables, parameters):
+        return FactoredDistribution([self.joint().set_variables_and_parameters(variables, parameters)])
+
+    def approximate(self, threshold: Union[str, int]) -> Generator[Distribution, None, None]:
+        return self.joint().approximate(threshold)
+
+    def approximate_unilaterally(self, variable: str, probability_mass: str | float) -> Distribution:
+        return self._apply({variable}, lambda factor: factor.approximate_unilaterally(variable, probability_mass))
+
+    def hadamard_product(self, other: Distribution) -> Distribution:
+        return self.joint().hadamard_product(self._lift(other).joint())
+
+    # The following operations are never reached, as `filter` and `update` are delegated to the factors. They are
+    # implemented on the joint distribution for completeness.
+
+    def _exhaustive_search(self, condition: Expr) -> Distribution:
+        return self.joint()._exhaustive_search(condition)
+
+    def _filter_constant_condition(self, condition: Expr) -> Distribution:
+        return self.joint()._filter_constant_condition(condition)
+
+    def _arithmetic_progression(self, variable: str, modulus: str) -> Sequence[Distribution]:
+        return self.joint()._arithmetic_progression(variable, modulus)
+
+    def _update_var(self, updated_var: str, assign_var: str | int) -> Distribution:
+        return self.joint()._update_var(updated_var, assign_var)
+
+    def _update_sum(self, temp_var: str, first_summand: str | int, second_summand: str | int) -> Distribution:
+        return self.joint()._update_sum(temp_var, first_summand, second_summand)
+
+    def _update_product(self, temp_var: str, first_factor: str, second_factor: str,
+                        approximate: str | float | None) -> Distribution:
+        return self.joint()._update_product(temp_var, first_factor, second_factor, approximate)
+
+    def _update_subtraction(self, temp_var: str, sub_from: str | int, sub: str | int) -> Distribution:
+        return self.joint()._update_subtraction(temp_var, sub_from, sub)
+
+    def _update_modulo(self, temp_var: str, left: str | int, right: str | int,
+                       approximate: str | float | None) -> Distribution:
+        return self.joint()._update_modulo(temp_var, left, right, approximate)
+
+    def _update_division(self, temp_var: str, numerator: str | int, denominator: str | int,
+                         approximate: str | float | None) -> Distribution:
+        return self.joint()._update_division(temp_var, numerator, denominator, approximate)
+
+    def _update_power(self, temp_var: str, base: str | int, exp: str | int,
+                      approximate: str | float | None) -> Distribution:
+        return self.joint()._update_power(temp_var, base, exp, approximate)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
-from typing import (Dict, FrozenSet, Generator, Iterator, List, Set, Tuple, Type,
-                    Union)
+from typing import (Dict, FrozenSet, Generator, Hashable, Iterator, List, Set,
+                    Tuple, Type, Union)
 
 import pygin  # type: ignore
 from probably.pgcl import Binop, BinopExpr, Expr, FunctionCallExpr, VarExpr
@@ -11,8 +11,6 @@ from prodigy.distribution.distribution import (CommonDistributionsFactory,
                                                Distribution, DistributionParam,
                                                MarginalType, State)
 
-from prodigy.util.order import default_monomial_iterator
-
 
 class FPS(Distribution):
     """
@@ -66,6 +64,8 @@ class FPS(Distribution):
             return FPS.from_dist(self._dist + other._dist,
                                  self._variables | other._variables,
                                  self._parameters | other._parameters)
+        elif isinstance(other, Distribution):
+            return NotImplemented
         else:
             raise NotImplementedError(
                 f"Addition of {self._dist} (type {type(self._dist)}) and {other} (type {type(other)} not supported.")
@@ -82,6 +82,8 @@ class FPS(Distribution):
             return FPS.from_dist(self._dist - other._dist,
                                  self._variables | other._variables,
                                  self._parameters | other._parameters)
+        elif isinstance(other, Distribution):
+            return NotImplemented
         else:
             raise NotImplementedError(
                 f"Subtraction of {self._dist} and {other} not supported.")
@@ -98,6 +100,8 @@ class FPS(Distribution):
             return FPS.from_dist(self._dist * other._dist,
                                  self._variables | other._variables,
                                  self._parameters | other._parameters)
+        elif isinstance(other, Distribution):
+            return NotImplemented
         else:
             raise NotImplementedError(
                 f"Multiplication of {type(self._dist)} and {type(other)} not supported."
@@ -110,6 +114,8 @@ class FPS(Distribution):
             return FPS.from_dist(self._dist * pygin.Dist(f"1/({str(other)})"),
                                  self._variables | other._variables,
                                  self._parameters | other._parameters)
+        if isinstance(other, Distribution):
+            return NotImplemented
         raise NotImplementedError(
             f"Division of {type(self._dist)} and {type(other)} not supported.")
 
@@ -125,6 +131,12 @@ class FPS(Distribution):
         else:
             return False
 
+    __hash__ = Distribution.__hash__
+
+    def canonical_key(self) -> Hashable:
+        # GiNaC keeps expressions in its canonical (automatically evaluated) form.
+        return "FPS", str(self._dist), tuple(sorted(self._variables)), tuple(sorted(self._parameters))
+
     def __le__(self, other) -> bool:
         raise NotImplementedError(__name__)
 
@@ -144,20 +156,34 @@ class FPS(Distribution):
                     yield str(it.next()), State({variable: i})
                     i += 1
             else:
-                # TODO this is just a placeholder until we have proper multivariate iteration
-                variables = list(self.get_variables())
-                for vals in default_monomial_iterator(len(variables)):
-                    s = f'{variables[0]}={vals[0]}'
-                    for i in range(1, len(variables)):
-                        s += f' & {variables[i]}={vals[i]}'
-                    mass = str(self.get_probability_of(s))
-                    if mass != '0':
-                        yield mass, State(dict(zip(variables, vals)))
+                yield from self._iter_shells()
         else:
             terms: List[Tuple[str, Dict[str, int]]] = self._dist.get_terms(self._variables)
             for prob, vals in terms:        # type: ignore
                 yield prob, State(vals)     # type: ignore
 
+    def _iter_shells(self) -> Iterator[Tuple[str, State]]:
+        """
+        Iterates over the non-zero terms of an infinite multivariate distribution by increasing total degree. The
+        series is expanded shell by shell: for doubling bounds, GiNaC truncates the distribution to all states whose
+        values are at most the bound, and all terms of the resulting polynomial whose total degree lies between the
+        previous and the current bound are yielded at once, ordered by total degree and then lexicographically.
+        """
+        variables = sorted(self._variables)
+        previous, bound = -1, 4
+        while True:
+            box = self._dist
+            for var in variables:
+                box = box.filterLeq(var, str(bound))
+            terms: List[Tuple[str, Dict[str, int]]] = [
+                (prob, vals) for prob, vals in box.get_terms(self._variables)  # type: ignore
+                if previous < sum(vals.values()) <= bound
+            ]
+            terms.sort(key=lambda term: (sum(term[1].values()), [term[1].get(var, 0) for var in variables]))
+            for prob, vals in terms:
+                yield prob, State(vals)
+            previous, bound = bound, 2 * bound
+
     def copy(self, deep: bool = True) -> Distribution:
         return FPS.from_dist(self._dist, self._variables, self._parameters,
                              self._finite)
@@ -189,8 +215,10 @@ class FPS(Distribution):
 
     def _exhaustive_search(self, condition: Expr) -> Distribution:
         res = pygin.Dist('0')
-        for prob, state in self:
-            if self.evaluate_condition(condition, state):
+        terms = list(self)
+        holds = self._evaluate_condition_in(condition, [state for _, state in terms])
+        for (prob, state), keep in zip(terms, holds):
+            if keep:
                 res += pygin.Dist(f"{prob} * {state.to_monomial()}")
         return FPS.from_dist(res,
                              self._variables,
@@ -413,8 +441,9 @@ class FPS(Distribution):
         }
         for var in remove_vars[method]:
             result = result.update_var(str(var), "0")
+        # Marginals of polynomials are polynomials, only otherwise finiteness has to be checked again.
         return FPS.from_dist(result, self._variables - remove_vars[method],
-                             self._parameters)
+                             self._parameters, True if self._finite else None)
 
     def set_variables(self, *variables: str) -> FPS:
         new_variables = set(variables)
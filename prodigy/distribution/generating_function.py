@@ -1,21 +1,28 @@
 # pylint: disable=protected-access
 from __future__ import annotations
 
+import itertools
 import operator
+import random
+from collections import deque
 from fractions import Fraction
-from typing import (Any, Callable, FrozenSet, Generator, Iterator, List, Set,
-                    Tuple, Type, Union, get_args)
+from typing import (Any, Callable, ContextManager, Deque, Dict, FrozenSet, Generator, Hashable, Iterable,
+                    Iterator, List, Optional, Set, Tuple, Type, Union, get_args)
 
 import sympy
 from probably.pgcl import (Binop, BinopExpr, Expr, FunctionCallExpr,
                            NatLitExpr, RealLitExpr, Unop, UnopExpr, VarExpr)
 from probably.pgcl.parser import parse_expr
 from probably.util.ref import Mut
-from sympy.assumptions.assume import global_assumptions
+from sympy.polys.constructor import construct_domain
+from sympy.polys.domains import QQ
+from sympy.polys.fields import FracElement, FracField
+from sympy.polys.polyerrors import CoercionFailed
 
 # TODO Implement these checks in probably
-from prodigy.distribution import (CommonDistributionsFactory, Distribution,
-                                  DistributionParam, MarginalType, State)
+from prodigy.distribution import (AffineUpdate, CommonDistributionsFactory,
+                                  Distribution, DistributionParam,
+                                  MarginalType, State)
 from prodigy.pgcl.pgcl_checks import has_variable
 from prodigy.util.logger import log_setup, logging
 
@@ -112,6 +119,170 @@ def _parse_to_sympy(expr: Any, real=True, **kwargs) -> sympy.Expr:
     return s
 
 
+_fields: Dict[Tuple[sympy.Symbol, ...], FracField] = {}
+
+
+def _field(symbols: Iterable[sympy.Symbol]) -> FracField:
+    """Returns the field of rational functions over QQ in `symbols`, which is shared by all fractions over them."""
+    key = tuple(sorted(set(symbols), key=str))
+    if key not in _fields:
+        _fields[key] = FracField(key, QQ)
+    return _fields[key]
+
+
+def _to_fraction(function: sympy.Expr) -> Optional[FracElement]:
+    """
+    Converts a rational function with rational coefficients into an element of the field over its symbols. Returns
+    `None` for other functions, e.g., ones with floats or exponentials.
+    """
+    if function.has(sympy.Float):
+        return None
+    try:
+        return _field(function.free_symbols).from_expr(function)
+    except (ValueError, CoercionFailed):
+        return None
+
+
+def _unify(first: FracElement, second: FracElement) -> Tuple[FracElement, FracElement]:
+    """Maps two fractions into the field over the union of their symbols."""
+    if first.field is second.field:
+        return first, second
+    field = _field(first.field.symbols + second.field.symbols)
+    return first.set_field(field), second.set_field(field)
+
+
+def _fraction_symbols(fraction: FracElement) -> Set[sympy.Symbol]:
+    """Returns the symbols which occur in a fraction, its field may contain further symbols."""
+    degrees = zip(fraction.numer.degrees(), fraction.denom.degrees())
+    return {symbol for symbol, (numer, denom) in zip(fraction.field.symbols, degrees) if numer > 0 or denom > 0}
+
+
+def _substitute_one(fraction: FracElement, symbols: Iterable[sympy.Symbol]) -> Optional[FracElement]:
+    """
+    Substitutes 1 for `symbols` in a fraction. As fractions are in lowest terms, this does not need limits unless the
+    denominator vanishes, in which case `None` is returned.
+    """
+    gens = dict(zip(fraction.field.symbols, fraction.field.gens))
+    substitution = [(gens[symbol], 1) for symbol in symbols if symbol in gens]
+    if not substitution:
+        return fraction
+    try:
+        return fraction.subs(substitution)
+    except ZeroDivisionError:
+        return None
+
+
+def _evaluate_at_one(function: sympy.Expr, symbols: Set[sympy.Symbol]) -> sympy.Expr:
+    """
+    Substitutes 1 for all `symbols` at once. If this hits a singularity, it is removed by cancelling the function first.
+    Only if cancellation does not remove it, the (left) limits are taken one symbol after another.
+    """
+    if not symbols:
+        return function
+    point = {symbol: sympy.S.One for symbol in symbols}
+    value = function.xreplace(point)
+    if not value.has(sympy.nan, sympy.zoo):
+        return value
+    if function.is_rational_function(*symbols):
+        value = sympy.cancel(sympy.together(function)).xreplace(point)
+        if not value.has(sympy.nan, sympy.zoo):
+            return value
+    for symbol in symbols:
+        function = function.limit(symbol, 1, "-")
+    return function
+
+
+def _rational_coefficients(function: sympy.Expr | FracElement, variable: sympy.Symbol,
+                           numeric: bool = False) -> Optional[Iterator[sympy.Expr]]:
+    """
+    Streams the coefficients of the power series of `function` in `variable`, if `function` is a rational function
+    `p / q` in `variable` (its coefficients may depend on further symbols). Otherwise, returns `None`. Fractions of the
+    ring engine are already in lowest terms and need not be cancelled.
+
+    The coefficients satisfy the linear recurrence `c_k = (p_k - q_1 * c_(k-1) - ... - q_d * c_(k-d)) / q_0`, so each
+    coefficient takes O(d) operations in the domain of the coefficients of `p` and `q`. If `numeric` is set and the
+    coefficients do not depend on further symbols, they are computed as floats instead of exact rationals.
+    """
+    if isinstance(function, FracElement):
+        numerator, denominator = function.numer.as_expr(), function.denom.as_expr()
+    elif not function.is_rational_function(variable):
+        return None
+    else:
+        numerator, denominator = sympy.fraction(sympy.cancel(sympy.together(function)))
+    p_coeffs = sympy.Poly(numerator, variable).all_coeffs()[::-1]
+    q_coeffs = sympy.Poly(denominator, variable).all_coeffs()[::-1]
+    if numeric and not any(coeff.free_symbols for coeff in p_coeffs + q_coeffs):
+        domain = sympy.RR
+        elements = [domain.from_sympy(sympy.N(coeff)) for coeff in p_coeffs + q_coeffs]
+    else:
+        domain, elements = construct_domain(p_coeffs + q_coeffs, field=True)
+    numerator_elements, denominator_elements = elements[:len(p_coeffs)], elements[len(p_coeffs):]
+    if not denominator_elements[0]:
+        # The function has a pole at 0 and thus no power series.
+        return None
+
+    def stream() -> Iterator[sympy.Expr]:
+        # The last d coefficients, the most recent first.
+        previous: Deque = deque(maxlen=len(denominator_elements) - 1)
+        for k in itertools.count():
+            value = numerator_elements[k] if k < len(numerator_elements) else domain.zero
+            for q_j, c_k_j in zip(denominator_elements[1:], previous):
+                value -= q_j * c_k_j
+            value = domain.quo(value, denominator_elements[0])
+            previous.appendleft(value)
+            yield domain.to_sympy(value)
+
+    return stream()
+
+
+def _series_coefficients(function: sympy.Expr, variable: sympy.Symbol, degree: int) -> List[sympy.Expr]:
+    """
+    Returns the coefficients of `variable^0, ..., variable^degree` in the power series of `function`, which may depend
+    on further symbols. All coefficients are computed from a single series expansion, or for rational functions, by
+    their linear recurrence.
+    """
+    if function.is_polynomial(variable):
+        expansion = sympy.expand(function)
+    else:
+        coefficients = _rational_coefficients(function, variable)
+        if coefficients is not None:
+            return list(itertools.islice(coefficients, degree + 1))
+        expansion = sympy.expand(function.series(variable, 0, degree + 1).removeO())
+    terms = sympy.collect(expansion, variable, evaluate=False)
+    return [terms.get(variable ** k, sympy.S.Zero) for k in range(degree + 1)]
+
+
+_SAMPLE_DENOMINATOR = 1009
+"""Random points for equality checks are chosen from the multiples of 1 / _SAMPLE_DENOMINATOR in (0, 1)."""
+
+
+def _differs_at_random_point(first: sympy.Expr, second: sympy.Expr, samples: int) -> bool:
+    """
+    Evaluates both expressions at `samples` random rational points in the open unit box, where probability generating
+    functions converge. Returns whether some point witnesses that the expressions differ. Points at which one of the
+    expressions is undefined are skipped. If the expressions differ, a random point is a witness with high probability
+    (Schwartz-Zippel), while `False` is no proof of equality.
+
+    The points only depend on the compared expressions (in either order), so the result is reproducible.
+    """
+    symbols = sorted(first.free_symbols | second.free_symbols, key=str)
+    sample_random = random.Random("|".join(sorted((str(first), str(second)))))
+    for _ in range(samples):
+        point = {symbol: sympy.Rational(sample_random.randint(1, _SAMPLE_DENOMINATOR - 1), _SAMPLE_DENOMINATOR)
+                 for symbol in symbols}
+        lhs, rhs = first.xreplace(point), second.xreplace(point)
+        if lhs.is_Rational and rhs.is_Rational:
+            if lhs != rhs:
+                return True
+            continue
+        # Non-rational values (e.g., of exponentials) are compared numerically with generous precision.
+        lhs, rhs = sympy.N(lhs, 30), sympy.N(rhs, 30)
+        if lhs.is_Number and rhs.is_Number and lhs.is_finite and rhs.is_finite:
+            if abs(lhs - rhs) > 1e-20 * (1 + abs(lhs)):
+                return True
+    return False
+
+
 def _sympy_symbol(name: Any, real=True, **kwargs) -> sympy.Symbol:
     """
     Creates a real sympy Symbol.
@@ -130,22 +301,33 @@ class GeneratingFunction(Distribution):
     """
 
     use_simplification = False
+    use_rings = False
     use_latex_output = False
+    equality_samples = 3
 
     # ==================================== CONSTRUCTORS ====================================
 
     def __init__(self,
-                 function: Union[str, sympy.Expr, Expr],
+                 function: Union[str, sympy.Expr, Expr, FracElement],
                  *variables: Union[str, sympy.Symbol],
                  closed: bool | None = None,
                  finite: bool | None = None):
 
-        # Set the basic information.
-        self._function: sympy.Expr = _parse_to_sympy(function)
+        # Set the basic information. The function is either stored as a sympy expression or, if the ring engine is
+        # used (see `use_rings`), as a fraction of polynomials. The other representation is computed on demand.
+        self._expr: sympy.Expr | None = None
+        self._fraction: FracElement | None = None
+        self._rational: bool | None = None
+        if isinstance(function, FracElement):
+            self._fraction, self._rational = function, True
+            free_symbols = _fraction_symbols(function)
+        else:
+            self._function = _parse_to_sympy(function)
+            free_symbols = self._function.free_symbols
 
         # Set variables and parameters
         self._variables: Set[
-            sympy.Symbol] = self._function.free_symbols  # type: ignore
+            sympy.Symbol] = free_symbols  # type: ignore
         self._parameters: Set[sympy.Symbol] = set()
         if variables:
             self._variables = self._variables.union(
@@ -156,18 +338,87 @@ class GeneratingFunction(Distribution):
                     filter(lambda v: v != "", variables)))
             self._variables -= self._parameters
 
+        # Closed form and finiteness heuristics are computed on demand, see `_is_closed_form` and `_is_finite`.
+        # Flags that are passed as True are trusted.
+        self._closed: bool | None = closed or None
+        self._finite: bool | None = finite or None
+
+        # Computed on demand, see `canonical_key`.
+        self._canonical_key: Hashable | None = None
+
+    def assumptions(self) -> ContextManager[None]:
+        """
+        Returns a context in which sympy's `ask` and `refine` know that all variables are nonnegative and all parameters
+        are positive. The facts only hold within the context, such that `global_assumptions` does not grow with every
+        generating function that is constructed.
+        """
         # pylint: disable = too-many-function-args
-        for var in self._variables:
-            global_assumptions.add(sympy.Q.nonnegative(var))
-        for param in self._parameters:
-            global_assumptions.add(sympy.Q.positive(param))
+        return sympy.assuming(*(sympy.Q.nonnegative(var) for var in self._variables),
+                              *(sympy.Q.positive(param) for param in self._parameters))
         # pylint: enable = too-many-function-args
 
-        # Do closed form and finiteness heuristics
-        self._is_closed_form = closed if closed else not self._function.is_polynomial(
-            *self._variables)
-        self._is_finite = finite if finite else self._function.ratsimp(
-        ).is_polynomial(*self._variables)
+    @property
+    def _function(self) -> sympy.Expr:
+        """The function as a sympy expression, converted from its fraction on first access."""
+        if self._expr is None:
+            assert self._fraction is not None
+            self._expr = self._fraction.as_expr()
+        return self._expr
+
+    @_function.setter
+    def _function(self, function: sympy.Expr):
+        self._expr, self._fraction, self._rational = function, None, None
+
+    @property
+    def _stored_function(self) -> sympy.Expr | FracElement:
+        """The function in the representation it is stored in, which can be passed on without conversion."""
+        return self._fraction if self._expr is None else self._expr
+
+    def _as_fraction(self) -> Optional[FracElement]:
+        """The function as a fraction of polynomials over QQ, or `None` if it is not a rational function over QQ."""
+        if self._rational is None:
+            self._fraction = _to_fraction(self._function)
+            self._rational = self._fraction is not None
+        return self._fraction
+
+    def _ring_operation(self, other: GeneratingFunction, op: Callable) -> Optional[FracElement]:
+        """Applies `op` to the fractions of both functions, if the ring engine is used and both are rational."""
+        if not GeneratingFunction.use_rings or self._as_fraction() is None or other._as_fraction() is None:
+            return None
+        first, second = _unify(self._fraction, other._fraction)  # type: ignore
+        return op(first, second)
+
+    def _ring_function(self) -> sympy.Expr | FracElement:
+        """The fraction of the function if the ring engine is used and it is rational, its expression otherwise."""
+        if GeneratingFunction.use_rings and self._as_fraction() is not None:
+            return self._fraction  # type: ignore
+        return self._function
+
+    def _fraction_is_polynomial(self) -> bool:
+        """Whether the stored fraction is a polynomial in the variables, i.e., its denominator does not contain them."""
+        assert self._fraction is not None
+        degrees = dict(zip(self._fraction.field.symbols, self._fraction.denom.degrees()))
+        return all(degrees.get(var, 0) <= 0 for var in self._variables)
+
+    @property
+    def _is_closed_form(self) -> bool:
+        """Whether the function is not a polynomial (in its variables), computed on first access."""
+        if self._closed is None:
+            if self._expr is None:
+                self._closed = not self._fraction_is_polynomial()
+            else:
+                self._closed = not self._function.is_polynomial(*self._variables)
+        return self._closed
+
+    @property
+    def _is_finite(self) -> bool:
+        """Whether the function is a polynomial (in its variables) after simplification, computed on first access."""
+        if self._finite is None:
+            if self._expr is None:
+                self._finite = self._fraction_is_polynomial()
+            else:
+                self._finite = self._function.ratsimp().is_polynomial(*self._variables)
+        return self._finite
 
     @staticmethod
     def factory() -> Type[CommonDistributionsFactory]:
@@ -227,29 +478,54 @@ class GeneratingFunction(Distribution):
         # Now we have an expression of the form _var_ (< | <=, =) _const_.
         variable = _sympy_symbol(str(condition.lhs))
         constant = condition.rhs.value
-        result = 0
         ranges = {
             Binop.LT: range(constant),
             Binop.LEQ: range(constant + 1),
             Binop.EQ: [constant]
         }
 
-        # Compute the probabilities of the states _var_ = i where i ranges depending on the operator (< , <=, =).
-        for i in ranges[condition.operator]:
-            result += (self._function.diff(variable, i) / sympy.factorial(i)
-                       ).limit(variable, 0, '-') * variable ** i
+        # Collect the terms for the states _var_ = i where i ranges depending on the operator (< , <=, =).
+        coefficients = _series_coefficients(self._function, variable, constant)
+        result = sum((coefficients[i] * variable ** i for i in ranges[condition.operator]), sympy.S.Zero)
 
         return GeneratingFunction(result,
                                   *self._variables,
-                                  closed=self._is_closed_form,
-                                  finite=self._is_finite)
+                                  closed=self._closed,
+                                  finite=self._finite)
+
+    def _coefficient_box(self, up_to: Dict[str, int]) -> Dict[Tuple[int, ...], sympy.Expr]:
+        """
+        Computes the non-zero coefficients of all monomials in which every variable `var` has an exponent of at most
+        `up_to[var]`, keyed by the exponents of the variables in sorted order. Each variable is expanded only once per
+        coefficient of the previously expanded variables.
+        """
+        box: Dict[Tuple[int, ...], sympy.Expr] = {(): self._function}
+        for var in sorted(up_to):
+            box = {exponents + (k,): coefficient
+                   for exponents, function in box.items()
+                   for k, coefficient in enumerate(_series_coefficients(function, _sympy_symbol(var), up_to[var]))
+                   if coefficient != 0}
+        return box
+
+    def coefficients(self, up_to: Dict[str, int]) -> Dict[State, str]:
+        if set(up_to) != self.get_variables():
+            raise ValueError(f"Bounds have to be given for exactly the variables {self.get_variables()}.")
+        variables = sorted(up_to)
+        return {State(dict(zip(variables, exponents))): str(coefficient)
+                for exponents, coefficient in self._coefficient_box(up_to).items()}
 
     def _mult_term_generator(self):
         """
             Generates terms of multivariate generating function in `grlex` order.
         """
+        variables = sorted(map(str, self._variables))
+        bound, box = -1, {}
         i = 1
         while True:
+            if i > bound:
+                # Expand ahead, such that the coefficients of several total degrees are computed at once.
+                bound = 2 * i
+                box = self._coefficient_box({var: bound for var in variables})
             # The easiest method is to create all monomials of until total degree `i` and sort them.
             logger.debug("Generating and sorting of new monomials")
             new_monomials = sorted(
@@ -275,7 +551,7 @@ class GeneratingFunction(Distribution):
                         for var, val in
                         monomial.as_expr().as_powers_dict().items()
                     }
-                yield self._probability_of_state(state), monomial.as_expr()
+                yield box.get(tuple(state.get(var, 0) for var in variables), sympy.S.Zero), monomial.as_expr()
             logger.debug("\t>Terms generated until total degree of %d", i)
             i += 1
 
@@ -307,8 +583,8 @@ class GeneratingFunction(Distribution):
             result.append(
                 GeneratingFunction(f"(1/{a}) * ({psum})",
                                    *self._variables,
-                                   closed=self._is_closed_form,
-                                   finite=self._is_finite))
+                                   closed=self._closed,
+                                   finite=self._finite))
         return result
 
     def hadamard_product(self, other: Distribution) -> GeneratingFunction:
@@ -430,9 +706,7 @@ class GeneratingFunction(Distribution):
         if self._is_closed_form or not self._is_finite:
             result = self._function
             for variable, value in complete_state.items():
-                result = result.diff(_sympy_symbol(variable), value)
-                result /= sympy.factorial(value)
-                result = result.limit(_sympy_symbol(variable), 0, "-")
+                result = _series_coefficients(result, _sympy_symbol(variable), value)[value]
             return result
         # Otherwise use poly module and simply extract the correct coefficient from it
         else:
@@ -569,8 +843,8 @@ class GeneratingFunction(Distribution):
         return GeneratingFunction(
             result,
             *self._variables,
-            closed=self._is_closed_form,
-            finite=self._is_finite).set_parameters(*self.get_parameters())
+            closed=self._closed,
+            finite=self._finite).set_parameters(*self.get_parameters())
 
     def _update_modulo(self, temp_var: str, left: str | int, right: str | int,
                        approximate: str | float | None) -> GeneratingFunction:
@@ -637,8 +911,8 @@ class GeneratingFunction(Distribution):
         return GeneratingFunction(
             result,
             *self._variables,
-            closed=self._is_closed_form,
-            finite=self._is_finite).set_parameters(*self.get_parameters())
+            closed=self._closed,
+            finite=self._finite).set_parameters(*self.get_parameters())
 
     def _update_subtraction(self, temp_var: str, sub_from: str | int,
                             sub: str | int) -> GeneratingFunction:
@@ -771,8 +1045,8 @@ class GeneratingFunction(Distribution):
             result.replace(lambda expr: expr.is_Symbol,
                            lambda expr: _sympy_symbol(expr.name)),
             *self._variables,
-            closed=self._is_closed_form,
-            finite=self._is_finite).set_parameters(*self.get_parameters())
+            closed=self._closed,
+            finite=self._finite).set_parameters(*self.get_parameters())
 
     def _update_var(self, updated_var: str,
                     assign_var: str | int) -> GeneratingFunction:
@@ -796,11 +1070,42 @@ class GeneratingFunction(Distribution):
             return GeneratingFunction(
                 result,
                 *self._variables,
-                closed=self._is_closed_form,
-                finite=self._is_finite).set_parameters(*self.get_parameters())
+                closed=self._closed,
+                finite=self._finite).set_parameters(*self.get_parameters())
         else:
             return self.copy()
 
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> GeneratingFunction:
+        # E[prod_v x_v^(c_v + sum_u a_vu * u)] = prod_v x_v^(c_v) * G(u -> prod_v x_v^(a_vu)), where a_uu = 1 for
+        # variables u that are not updated.
+        variables = {str(var) for var in self._variables}
+        for var, (_, coefficients) in updates.items():
+            if not {var, *coefficients} <= variables:
+                raise ValueError(f"Unknown variable(s) in affine update of {var}: {updates[var]}")
+
+        def exponent(assigned: str, read: str) -> int:
+            if assigned in updates:
+                return updates[assigned][1].get(read, 0)
+            return 1 if assigned == read else 0
+
+        substitution = {}
+        unread = []
+        for read in variables:
+            monomial = sympy.Mul(*(_sympy_symbol(assigned) ** exponent(assigned, read) for assigned in variables))
+            if monomial == 1:
+                unread.append(read)
+            elif monomial != _sympy_symbol(read):
+                substitution[_sympy_symbol(read)] = monomial
+
+        result = self.marginal(*unread, method=MarginalType.EXCLUDE)._function if unread else self._function
+        result = result.subs(substitution, simultaneous=True) * sympy.Mul(
+            *(_sympy_symbol(var) ** constant for var, (constant, _) in updates.items()))
+        return GeneratingFunction(
+            result,
+            *self._variables,
+            closed=self._closed,
+            finite=self._finite).set_parameters(*self.get_parameters())
+
     def _update_sum(self, temp_var: str, first_summand: str | int,
                     second_summand: str | int) -> GeneratingFunction:
         update_var = _sympy_symbol(temp_var)
@@ -842,8 +1147,8 @@ class GeneratingFunction(Distribution):
         return GeneratingFunction(
             result,
             *self._variables,
-            closed=self._is_closed_form,
-            finite=self._is_finite).set_parameters(*self.get_parameters())
+            closed=self._closed,
+            finite=self._finite).set_parameters(*self.get_parameters())
 
     def _update_power(self, temp_var: str, base: str | int, exp: str | int,
                       approximate: str | float | None) -> Distribution:
@@ -921,8 +1226,8 @@ class GeneratingFunction(Distribution):
         return GeneratingFunction(
             res,
             *self._variables,
-            finite=self._is_finite,
-            closed=self._is_closed_form).set_parameters(*self.get_parameters())
+            finite=self._finite,
+            closed=self._closed).set_parameters(*self.get_parameters())
 
     def update_iid(self, sampling_dist: Expr, count: VarExpr,
                    variable: Union[str, VarExpr]) -> Distribution:
@@ -1020,11 +1325,12 @@ class GeneratingFunction(Distribution):
             return str(expected_value)
 
     def copy(self, deep: bool = True) -> GeneratingFunction:
-        res = GeneratingFunction(self._function,
+        res = GeneratingFunction(self._stored_function,
                                  *self._variables,
-                                 closed=self._is_closed_form,
-                                 finite=self._is_finite)
+                                 closed=self._closed,
+                                 finite=self._finite)
         res._parameters = self._parameters.copy()
+        res._closed, res._finite = self._closed, self._finite
         return res
 
     def set_variables(self, *variables: str) -> GeneratingFunction:
@@ -1032,10 +1338,10 @@ class GeneratingFunction(Distribution):
             raise ValueError(
                 "The free-variables of a distribution cannot be empty!")
         remove_dups = set(variables)
-        return GeneratingFunction(self._function,
+        return GeneratingFunction(self._stored_function,
                                   *remove_dups,
-                                  closed=self._is_closed_form,
-                                  finite=self._is_finite).set_parameters(
+                                  closed=self._closed,
+                                  finite=self._finite).set_parameters(
             *(self.get_parameters() - remove_dups))
 
     def set_parameters(self, *parameters: str) -> GeneratingFunction:
@@ -1066,19 +1372,23 @@ class GeneratingFunction(Distribution):
                 )
 
             # collect the meta information.
-            is_closed_form = self._is_closed_form and other._is_closed_form
-            is_finite = self._is_finite and other._is_finite
+            # Constants are polynomials, and the quotient of polynomials only is a polynomial for constant divisors.
+            is_constant = not other._function.free_symbols
+            is_closed_form = self._closed and other._closed
+            is_finite = self._finite and (other._finite or is_constant) and (op is not operator.truediv or is_constant)
 
-            # do the actual operation
-            function = op(self._function, other._function)
+            # do the actual operation, fractions of the ring engine are always in lowest terms.
+            function = self._ring_operation(other, op)
+            if function is None:
+                function = op(self._function, other._function)
 
             # simplify the result if demanded.
-            if GeneratingFunction.use_simplification:
+            if GeneratingFunction.use_simplification and not isinstance(function, FracElement):
                 nominator, denominator = sympy.fraction(function)
                 nominator = nominator.factor()
                 denominator = denominator.factor()
                 function = nominator / denominator
-                if not is_closed_form:
+                if not (self._is_closed_form and other._is_closed_form):
                     function = function.expand()
 
             # update the occuring variables and parameters
@@ -1096,6 +1406,9 @@ class GeneratingFunction(Distribution):
             # we try to convert this into a Generatingfunction and compute the arithmetic from there on.
             return self._arithmetic(
                 GeneratingFunction(str(other), *self._variables), op)
+        # other distribution types may know how to do arithmetic with generating functions.
+        elif isinstance(other, Distribution):
+            return NotImplemented
         # We don't know how to do arithmetic on other types.
         else:
             raise SyntaxError(
@@ -1158,11 +1471,27 @@ class GeneratingFunction(Distribution):
     def __eq__(self, other) -> bool:
         if not isinstance(other, GeneratingFunction):
             return False
+        if self._variables != other._variables or self._parameters != other._parameters:
+            return False
+        # Fractions are in lowest terms, thus comparing them is exact.
+        same = self._ring_operation(other, operator.eq)
+        if same is not None:
+            return same
+        if self._function == other._function:
+            return True
+        # Most compared functions differ, which evaluating them at a few random points detects cheaply.
+        if _differs_at_random_point(self._function, other._function, self.equality_samples):
+            return False
+        # Functions with the same normal form do not need to be simplified.
+        if self.canonical_key() == other.canonical_key():
+            return True
         # We rely on simplification of __sympy__ here. Thus, we cannot guarantee to detect equality when
         # simplification fails.
-        return bool(self._function.equals(other._function)) \
-            and self._variables == other._variables \
-            and self._parameters == other._parameters
+        return bool(self._function.equals(other._function))
+
+    # The hash is consistent with equality for rational functions, whose canonical key is unique. Other functions
+    # may be equal despite different keys, i.e., their key is only a sound cache key: equal keys imply equality.
+    __hash__ = Distribution.__hash__
 
     def __iter__(self) -> Iterator[Tuple[str, State]]:
         """ Iterates over the generating function yielding (coefficient, state) pairs.
@@ -1199,9 +1528,35 @@ class GeneratingFunction(Distribution):
                     func = self._function.as_poly(*self._variables)
             return _term_generator(func)
         else:
+            if len(self._variables) == 1:
+                variable = next(iter(self._variables))
+                coefficients = _rational_coefficients(self._ring_function(), variable)
+                if coefficients is not None:
+                    return ((coefficient, variable ** k) for k, coefficient in enumerate(coefficients))
             logger.debug("Multivariate Taylor expansion might take a while...")
             return self._mult_term_generator()
 
+    def coefficient_iterator(self, variable: str, numeric: bool = False) -> Iterator[str]:
+        """
+        Iterates over the coefficients of `variable^0, variable^1, ...`, which may depend on the remaining variables
+        and parameters. For rational functions, the coefficients are streamed by their linear recurrence, as floats if
+        `numeric` is set. Otherwise, the function is expanded in series of doubling length.
+        """
+        var = _sympy_symbol(variable)
+        if var not in self._variables:
+            raise ValueError(f'Not a variable: {variable}')
+        coefficients = _rational_coefficients(self._ring_function(), var, numeric)
+        if coefficients is not None:
+            return map(str, coefficients)
+
+        def blocks() -> Iterator[sympy.Expr]:
+            start, degree = 0, 8
+            while True:
+                yield from _series_coefficients(self._function, var, degree)[start:]
+                start, degree = degree + 1, 2 * degree + 1
+
+        return map(str, blocks())
+
     # FIXME: It's not nice to have different behaviour depending on the variable type of `threshold`.
     def approximate(
             self,
@@ -1252,13 +1607,13 @@ class GeneratingFunction(Distribution):
 
     def coefficient_sum(self) -> sympy.Expr:
         logger.debug("coefficient_sum() call")
+        if GeneratingFunction.use_rings and self._as_fraction() is not None:
+            fraction = _substitute_one(self._fraction, self._variables)  # type: ignore
+            if fraction is not None:
+                return fraction.as_expr()
         coefficient_sum = self._function.simplify(
         ) if GeneratingFunction.use_simplification else self._function
-        for var in self._variables:
-            coefficient_sum = coefficient_sum.limit(
-                var, 1, "-") if self._is_closed_form else coefficient_sum.subs(
-                var, 1)
-        return coefficient_sum
+        return _evaluate_at_one(coefficient_sum, self._variables)
 
     def get_probability_mass(self):
         return str(self.coefficient_sum())
@@ -1270,6 +1625,8 @@ class GeneratingFunction(Distribution):
         return set(map(str, self._variables))
 
     def is_zero_dist(self) -> bool:
+        if self._expr is None:
+            return not self._fraction
         return self._function == 0
 
     def normalize(self) -> GeneratingFunction:
@@ -1277,10 +1634,11 @@ class GeneratingFunction(Distribution):
         mass = self.coefficient_sum()
         if mass == 0:
             raise ZeroDivisionError
-        return GeneratingFunction(self._function / mass,
+        function = self._ring_operation(GeneratingFunction(mass), operator.truediv)
+        return GeneratingFunction(self._function / mass if function is None else function,
                                   *self._variables,
-                                  closed=self._is_closed_form,
-                                  finite=self._is_finite)
+                                  closed=self._closed,
+                                  finite=self._finite)
 
     def is_finite(self):
         """
@@ -1290,6 +1648,23 @@ class GeneratingFunction(Distribution):
         """
         return self._is_finite
 
+    def expression_size(self) -> int:
+        return sum(1 for _ in sympy.preorder_traversal(self._function))
+
+    def canonical_key(self) -> Hashable:
+        if self._canonical_key is None and GeneratingFunction.use_rings and self._as_fraction() is not None:
+            # Fractions are in lowest terms, their field only depends on the occurring symbols.
+            fraction = self._fraction.set_field(_field(_fraction_symbols(self._fraction)))  # type: ignore
+            self._canonical_key = ("GeneratingFunction", str(fraction),
+                                   tuple(sorted(map(str, self._variables))),
+                                   tuple(sorted(map(str, self._parameters))))
+        if self._canonical_key is None:
+            # For rational functions, cancel yields the unique quotient of coprime expanded polynomials.
+            self._canonical_key = ("GeneratingFunction", str(sympy.cancel(self._function)),
+                                   tuple(sorted(map(str, self._variables))),
+                                   tuple(sorted(map(str, self._parameters))))
+        return self._canonical_key
+
     @staticmethod
     def evaluate(expression: str, state: State) -> sympy.Expr:
         """ Evaluates the expression in a given state. """
@@ -1329,27 +1704,22 @@ class GeneratingFunction(Distribution):
 
         marginal_vars = set(
             map(_sympy_symbol, filter(lambda v: v != '', map(str, variables))))
+        removed = self._variables - marginal_vars if method == MarginalType.INCLUDE else marginal_vars
+        if not removed:
+            return self.copy()
+        if GeneratingFunction.use_rings and self._as_fraction() is not None:
+            fraction = _substitute_one(self._fraction, removed)  # type: ignore
+            if fraction is not None:
+                marginal = GeneratingFunction(fraction)
+                marginal._variables, marginal._parameters = self._variables - removed, self._parameters.copy()
+                return marginal
         marginal = self.copy()
-        s_var: str | VarExpr | sympy.Symbol
-        if method == MarginalType.INCLUDE:
-            for s_var in marginal._variables.difference(marginal_vars):
-                if marginal._is_closed_form:
-                    marginal._function = marginal._function.limit(
-                        s_var, 1, "-")
-                else:
-                    marginal._function = marginal._function.subs(s_var, 1)
-            marginal._variables = marginal_vars
-        else:
-            for s_var in marginal_vars:
-                if marginal._is_closed_form:
-                    marginal._function = marginal._function.limit(
-                        s_var, 1, "-")
-                else:
-                    marginal._function = marginal._function.subs(s_var, 1)
-            marginal._variables = marginal._variables.difference(marginal_vars)
+        marginal._function = _evaluate_at_one(self._function, removed)
+        marginal._variables = self._variables - removed
 
-        marginal._is_closed_form = not marginal._function.is_polynomial()
-        marginal._is_finite = marginal._function.ratsimp().is_polynomial()
+        # Substituting 1 for some variables preserves polynomials, otherwise the flags are recomputed on demand.
+        marginal._closed = False if self._closed is False else None
+        marginal._finite = True if self._finite else None
 
         return marginal
 
@@ -1360,11 +1730,9 @@ class GeneratingFunction(Distribution):
         return res
 
     def _exhaustive_search(self, condition: Expr) -> GeneratingFunction:
-        res = sympy.Integer(0)
-        for prob, state in self._iter_expr_expr():
-            if self.evaluate_condition(condition,
-                                       self._monomial_to_state(state)):
-                res += prob * state
+        terms = list(self._iter_expr_expr())
+        holds = self._evaluate_condition_in(condition, [self._monomial_to_state(state) for _, state in terms])
+        res = sympy.Add(*(prob * state for (prob, state), keep in zip(terms, holds) if keep))
         return GeneratingFunction(res,
                                   *self._variables,
                                   closed=False,
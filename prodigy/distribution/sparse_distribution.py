@@ -0,0 +1,663 @@
+# pylint: disable=protected-access
+"""
+A backend for distributions with finite support. The distribution is stored as a dictionary mapping exponent tuples
+(i.e., states) to their probabilities. Probabilities are exact rationals (`fractions.Fraction`) and only fall back to
+sympy expressions if they depend on parameters. All operations work directly on the coefficients, so no symbolic
+simplification is involved.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import operator
+from collections import defaultdict
+from fractions import Fraction
+from typing import (Callable, Dict, FrozenSet, Generator, Hashable, Iterator, List, NoReturn, Sequence, Set, Tuple,
+                    Type, Union)
+
+import sympy
+from probably.pgcl import (Binop, BinopExpr, BoolLitExpr, Expr, FunctionCallExpr, NatLitExpr, RealLitExpr, Unop,
+                           UnopExpr, VarExpr)
+from probably.pgcl.ast.walk import Walk, walk_expr
+from probably.pgcl.parser import parse_expr
+from probably.util.ref import Mut
+
+from prodigy.distribution.distribution import (AffineUpdate, CommonDistributionsFactory, Distribution,
+                                               DistributionParam, MarginalType, State)
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+Coefficient = Union[Fraction, sympy.Expr]
+Exponents = Tuple[int, ...]
+Terms = Dict[Exponents, Coefficient]
+
+
+def _coefficient(value) -> Coefficient:
+    """Converts `value` into a coefficient, preferring exact rationals over sympy expressions."""
+    if isinstance(value, Fraction):
+        return value
+    if isinstance(value, int):
+        return Fraction(value)
+    if isinstance(value, float):
+        return Fraction(str(value))
+    if isinstance(value, str):
+        try:
+            return Fraction(value)
+        except ValueError:
+            pass
+    value = sympy.sympify(value, rational=True) if isinstance(value, str) else sympy.sympify(value)
+    if value.is_Float:
+        return Fraction(str(value))
+    if value.is_Rational:
+        return Fraction(int(value.p), int(value.q))
+    return value
+
+
+def _is_zero(coefficient: Coefficient) -> bool:
+    if isinstance(coefficient, Fraction):
+        return coefficient == 0
+    return sympy.expand(coefficient) == 0
+
+
+def _add_term(terms: Terms, exponents: Exponents, coefficient: Coefficient):
+    """Adds `coefficient` to the term with the given exponents, dropping the term if it vanishes."""
+    coefficient = _coefficient(terms[exponents] + coefficient if exponents in terms else coefficient)
+    if _is_zero(coefficient):
+        terms.pop(exponents, None)
+    else:
+        terms[exponents] = coefficient
+
+
+def _symbols(coefficient: Coefficient) -> Set[str]:
+    return set() if isinstance(coefficient, Fraction) else {str(symbol) for symbol in coefficient.free_symbols}
+
+
+def _divide(numerator, denominator):
+    if isinstance(numerator, sympy.Expr) or isinstance(denominator, sympy.Expr):
+        return numerator / denominator
+    return Fraction(numerator) / Fraction(denominator)
+
+
+def _natural(value, expression) -> int:
+    """Checks that `value` is a natural number and converts it to an `int`."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, Fraction)) and value >= 0 and Fraction(value).denominator == 1:
+        return int(value)
+    raise ValueError(f"The expression {expression} does not evaluate to a natural number, but to {value}.")
+
+
+def _evaluate(expression: Expr, valuation: Dict[str, int]):
+    """
+    Evaluates the expression in the given valuation. Numbers are exact, symbols that are not part of the valuation
+    are treated as parameters.
+    """
+    if isinstance(expression, NatLitExpr):
+        return expression.value
+    if isinstance(expression, RealLitExpr):
+        return expression.to_fraction()
+    if isinstance(expression, BoolLitExpr):
+        return expression.value
+    if isinstance(expression, VarExpr):
+        if expression.var in valuation:
+            return valuation[expression.var]
+        return sympy.Symbol(expression.var)
+    if isinstance(expression, UnopExpr):
+        if expression.operator == Unop.NEG:
+            return not _evaluate(expression.expr, valuation)
+        if expression.operator == Unop.IVERSON:
+            return 1 if _evaluate(expression.expr, valuation) else 0
+    if isinstance(expression, BinopExpr):
+        if expression.operator == Binop.AND:
+            return _evaluate(expression.lhs, valuation) and _evaluate(expression.rhs, valuation)
+        if expression.operator == Binop.OR:
+            return _evaluate(expression.lhs, valuation) or _evaluate(expression.rhs, valuation)
+        lhs, rhs = _evaluate(expression.lhs, valuation), _evaluate(expression.rhs, valuation)
+        if expression.operator in _COMPARISONS:
+            if isinstance(lhs, sympy.Expr) or isinstance(rhs, sympy.Expr):
+                raise NotImplementedError(f"Cannot decide {expression} as it depends on parameters.")
+            return _COMPARISONS[expression.operator](lhs, rhs)
+        if expression.operator in _ARITHMETIC:
+            return _ARITHMETIC[expression.operator](lhs, rhs)
+    raise NotImplementedError(f"Cannot evaluate the expression {expression}.")
+
+
+_COMPARISONS: Dict[Binop, Callable] = {
+    Binop.EQ: operator.eq,
+    Binop.LEQ: operator.le,
+    Binop.LT: operator.lt,
+    Binop.GT: operator.gt,
+    Binop.GEQ: operator.ge,
+}
+
+_ARITHMETIC: Dict[Binop, Callable] = {
+    Binop.PLUS: operator.add,
+    Binop.MINUS: operator.sub,
+    Binop.TIMES: operator.mul,
+    Binop.DIVIDE: _divide,
+    Binop.MODULO: operator.mod,
+    Binop.POWER: operator.pow,
+}
+
+
+class SparseDist(Distribution):
+    """A distribution with finite support, stored as a dictionary from states to probabilities."""
+
+    def __init__(self, terms: Terms, variables: Sequence[str], parameters: Set[str] | FrozenSet[str] = frozenset()):
+        self._terms: Terms = terms
+        self._variables: Tuple[str, ...] = tuple(variables)
+        self._parameters: FrozenSet[str] = frozenset(parameters)
+
+    @staticmethod
+    def factory() -> Type[SparsePGF]:
+        return SparsePGF
+
+    # ================================ helpers ================================
+
+    def _with_terms(self, terms: Terms, variables: Sequence[str] | None = None) -> SparseDist:
+        return SparseDist(terms, self._variables if variables is None else variables, self._parameters)
+
+    def _aligned(self, variables: Sequence[str]) -> Terms:
+        """Returns the terms with exponents ordered according to `variables`, which contain all own variables."""
+        if tuple(variables) == self._variables:
+            return self._terms
+        positions = {var: i for i, var in enumerate(self._variables)}
+        indices = [positions.get(var) for var in variables]
+        return {tuple(0 if i is None else exps[i] for i in indices): coefficient
+                for exps, coefficient in self._terms.items()}
+
+    def _valuation(self, exponents: Exponents) -> Dict[str, int]:
+        return dict(zip(self._variables, exponents))
+
+    def _index(self, variable: str) -> int:
+        try:
+            return self._variables.index(variable)
+        except ValueError as err:
+            raise ValueError(f"Unknown variable {variable}") from err
+
+    def _operand(self, other) -> SparseDist | Coefficient:
+        """Converts the operand of an arithmetic operation into either a coefficient or a distribution."""
+        if isinstance(other, SparseDist):
+            return other
+        if isinstance(other, (int, float, Fraction)):
+            return _coefficient(other)
+        if isinstance(other, str):
+            coefficient = _coefficient(other)
+            if isinstance(coefficient, sympy.Expr) and {str(s) for s in coefficient.free_symbols} & set(
+                    self._variables):
+                return SparsePGF.from_expr(other, *self._variables)
+            return coefficient
+        if isinstance(other, Distribution):
+            return NotImplemented
+        raise SyntaxError(f"You cannot combine {type(self)} with {type(other)}.")
+
+    def _combined_variables(self, other: SparseDist) -> Tuple[Tuple[str, ...], FrozenSet[str]]:
+        variables = self._variables + tuple(var for var in other._variables if var not in self._variables)
+        parameters = self._parameters | other._parameters
+        if set(variables) & parameters:
+            raise ArithmeticError(
+                f"Name clash for parameters and variables in {self._variables=} {other._variables=} "
+                f"\t {self._parameters=} {other._parameters=}")
+        return variables, parameters
+
+    def _pointwise(self, other, op: Callable) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if not isinstance(other, SparseDist):
+            other = SparseDist({(0,) * len(self._variables): other} if not _is_zero(other) else {},
+                               self._variables, self._parameters | _symbols(other))
+        variables, parameters = self._combined_variables(other)
+        terms = dict(self._aligned(variables))
+        for exps, coefficient in other._aligned(variables).items():
+            _add_term(terms, exps, op(0, coefficient))
+        return SparseDist(terms, variables, parameters)
+
+    # ================================ arithmetic ================================
+
+    def __add__(self, other) -> Distribution:
+        return self._pointwise(other, operator.add)
+
+    def __sub__(self, other) -> Distribution:
+        return self._pointwise(other, operator.sub)
+
+    def __mul__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if not isinstance(other, SparseDist):
+            if _is_zero(other):
+                return self._with_terms({})
+            return SparseDist({exps: _coefficient(coefficient * other) for exps, coefficient in self._terms.items()},
+                              self._variables, self._parameters | _symbols(other))
+        variables, parameters = self._combined_variables(other)
+        terms: Terms = {}
+        other_terms = other._aligned(variables)
+        for exps, coefficient in self._aligned(variables).items():
+            for other_exps, other_coefficient in other_terms.items():
+                _add_term(terms, tuple(map(operator.add, exps, other_exps)), coefficient * other_coefficient)
+        return SparseDist(terms, variables, parameters)
+
+    def __truediv__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        if isinstance(other, SparseDist):
+            if any(any(exps) for exps in other._terms):
+                raise NotImplementedError("Sparse distributions can only be divided by constants.")
+            other = _coefficient(other.get_probability_mass())
+        return self._with_terms({exps: _coefficient(coefficient / other) for exps, coefficient in self._terms.items()})
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, str):
+            other = SparsePGF.from_expr(other, *self._variables)
+        elif isinstance(other, Distribution) and not isinstance(other, SparseDist):
+            if not other.is_finite():
+                return False
+            other = SparsePGF.from_expr(str(other), *other.get_variables()).set_parameters(*other.get_parameters())
+        if not isinstance(other, SparseDist):
+            return False
+        if set(self._variables) != set(other._variables) or self._parameters != other._parameters:
+            return False
+        return (self - other).is_zero_dist()
+
+    __hash__ = Distribution.__hash__
+
+    def __le__(self, other) -> bool:
+        if not isinstance(other, SparseDist):
+            raise TypeError(f"Incomparable types {type(self)} and {type(other)}.")
+        variables, _ = self._combined_variables(other)
+        own, others = self._aligned(variables), other._aligned(variables)
+        for exps in own.keys() | others.keys():
+            difference = others.get(exps, Fraction(0)) - own.get(exps, Fraction(0))
+            if isinstance(difference, sympy.Expr):
+                if not difference.is_nonnegative:
+                    return False
+            elif difference < 0:
+                return False
+        return True
+
+    def __str__(self) -> str:
+        if len(self._terms) == 0:
+            return "0"
+        summands = []
+        for exps in sorted(self._terms):
+            coefficient = self._terms[exps]
+            monomial = [f"{var}^{exp}" if exp > 1 else var for var, exp in zip(self._variables, exps) if exp > 0]
+            factors = [] if coefficient == 1 and monomial else [
+                str(coefficient) if isinstance(coefficient, Fraction) else f"({coefficient})"]
+            summands.append("*".join(factors + monomial))
+        return " + ".join(summands)
+
+    def __repr__(self) -> str:
+        return f"SparseDist({self}, variables={self._variables}, parameters={set(self._parameters)})"
+
+    def __iter__(self) -> Iterator[Tuple[str, State]]:
+        for exps in sorted(self._terms, key=lambda exps: (sum(exps), exps)):
+            yield str(self._terms[exps]), State(self._valuation(exps))
+
+    def copy(self, deep: bool = True) -> SparseDist:
+        return self._with_terms(dict(self._terms))
+
+    # ================================ queries ================================
+
+    def get_probability_mass(self) -> str:
+        return str(_coefficient(sum(self._terms.values(), Fraction(0))))
+
+    def get_expected_value_of(self, expression: Union[Expr, str]) -> str:
+        expr = parse_expr(expression) if isinstance(expression, str) else expression
+        result = Fraction(0)
+        for exps, coefficient in self._terms.items():
+            result += coefficient * _evaluate(expr, self._valuation(exps))
+        return str(_coefficient(result))
+
+    def normalize(self) -> SparseDist:
+        mass = _coefficient(sum(self._terms.values(), Fraction(0)))
+        if _is_zero(mass):
+            raise ZeroDivisionError("Cannot normalize a distribution with probability mass 0.")
+        if isinstance(mass, sympy.Expr):
+            result = self / str(mass)
+            assert isinstance(result, SparseDist)
+            return result
+        return self._with_terms({exps: coefficient / mass for exps, coefficient in self._terms.items()})
+
+    def get_variables(self) -> Set[str]:
+        return set(self._variables)
+
+    def get_parameters(self) -> Set[str]:
+        return set(self._parameters)
+
+    def is_zero_dist(self) -> bool:
+        return len(self._terms) == 0
+
+    def is_finite(self) -> bool:
+        return True
+
+    def expression_size(self) -> int:
+        return sum(1 + sum(1 for exp in exps if exp > 0) for exps in self._terms)
+
+    def canonical_key(self) -> Hashable:
+        variables = tuple(sorted(self._variables))
+        order = [self._variables.index(var) for var in variables]
+        terms = sorted((tuple(exps[i] for i in order), str(prob if isinstance(prob, Fraction) else sympy.cancel(prob)))
+                       for exps, prob in self._terms.items() if prob != 0)
+        return "SparseDist", variables, tuple(sorted(self._parameters)), tuple(terms)
+
+    def get_fresh_variable(self, exclude: Set[str] | FrozenSet[str] = frozenset()) -> str:
+        i = 0
+        while f'_{i}' in self._variables or f'_{i}' in self._parameters or f'_{i}' in exclude:
+            i += 1
+        return f'_{i}'
+
+    def _find_symbols(self, expr: str) -> Set[str]:
+        return {str(symbol) for symbol in sympy.sympify(expr).free_symbols}
+
+    @staticmethod
+    def evaluate(expression: str, state: State):
+        return _evaluate(parse_expr(expression), state.valuations)
+
+    # ================================ filtering ================================
+
+    def filter(self, condition: Expr) -> SparseDist:
+        if isinstance(condition, BoolLitExpr):
+            return self if condition.value else self._with_terms({})
+        unknown = {ref.val.var for ref in walk_expr(Walk.DOWN, Mut.alloc(condition)) if isinstance(ref.val, VarExpr)} \
+            - self.get_variables() - self.get_parameters()
+        if unknown:
+            raise ValueError(
+                f"Cannot filter based on the expression {str(condition)} because it contains unknown variables")
+        return self._exhaustive_search(condition)
+
+    def _exhaustive_search(self, condition: Expr) -> SparseDist:
+        return self._with_terms({exps: coefficient for exps, coefficient in self._terms.items()
+                                 if _evaluate(condition, self._valuation(exps))})
+
+    def _filter_constant_condition(self, condition: Expr) -> SparseDist:
+        return self._exhaustive_search(condition)
+
+    def _arithmetic_progression(self, variable: str, modulus: str) -> Sequence[SparseDist]:
+        index, modulus_value = self._index(variable), int(modulus)
+        progressions: List[Terms] = [{} for _ in range(modulus_value)]
+        for exps, coefficient in self._terms.items():
+            progressions[exps[index] % modulus_value][exps] = coefficient
+        return [self._with_terms(terms) for terms in progressions]
+
+    def hadamard_product(self, other: Distribution) -> SparseDist:
+        if not isinstance(other, SparseDist):
+            raise NotImplementedError("The Hadamard product is only supported for two sparse distributions.")
+        variables, parameters = self._combined_variables(other)
+        other_terms = other._aligned(variables)
+        terms: Terms = {}
+        for exps, coefficient in self._aligned(variables).items():
+            if exps in other_terms:
+                _add_term(terms, exps, coefficient * other_terms[exps])
+        return SparseDist(terms, variables, parameters)
+
+    # ================================ updates ================================
+
+    def _mapped(self, transform: Callable[[Exponents], Exponents]) -> SparseDist:
+        """Applies `transform` to every state."""
+        terms: Terms = {}
+        for exps, coefficient in self._terms.items():
+            _add_term(terms, transform(exps), coefficient)
+        return self._with_terms(terms)
+
+    def _assigned(self, variable: str, value: Callable[[Exponents], int]) -> SparseDist:
+        index = self._index(variable)
+        return self._mapped(lambda exps: exps[:index] + (value(exps),) + exps[index + 1:])
+
+    def update(self, expression: Expr, approximate: str | float | None = None) -> SparseDist:
+        assert isinstance(expression, BinopExpr) and isinstance(expression.lhs, VarExpr), \
+            f"Expression must be an assignment, was {expression}."
+        rhs = expression.rhs
+        return self._assigned(expression.lhs.var,
+                              lambda exps: _natural(_evaluate(rhs, self._valuation(exps)), rhs))
+
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> SparseDist:
+        indices = {var: self._index(var) for var in updates}
+        coefficients = [(indices[var], constant, [(self._index(read), factor) for read, factor in reads.items()])
+                        for var, (constant, reads) in updates.items()]
+
+        def transform(exps: Exponents) -> Exponents:
+            result = list(exps)
+            for index, constant, reads in coefficients:
+                result[index] = constant + sum(factor * exps[read] for read, factor in reads)
+            return tuple(result)
+
+        return self._mapped(transform)
+
+    def _value(self, operand: str | int) -> Callable[[Exponents], int]:
+        if isinstance(operand, str) and operand in self._variables:
+            index = self._index(operand)
+            return lambda exps: exps[index]
+        value = _natural(_coefficient(operand), operand)
+        return lambda _: value
+
+    def _update_binop(self, temp_var: str, left: str | int, right: str | int, op: Binop) -> SparseDist:
+        left_value, right_value = self._value(left), self._value(right)
+        function = _ARITHMETIC[op]
+        return self._assigned(temp_var, lambda exps: _natural(function(left_value(exps), right_value(exps)),
+                                                              f"{left} {op} {right}"))
+
+    def _update_var(self, updated_var: str, assign_var: str | int) -> SparseDist:
+        return self._assigned(updated_var, self._value(assign_var))
+
+    def _update_sum(self, temp_var: str, first_summand: str | int, second_summand: str | int) -> SparseDist:
+        return self._update_binop(temp_var, first_summand, second_summand, Binop.PLUS)
+
+    def _update_product(self, temp_var: str, first_factor: str, second_factor: str,
+                        approximate: str | float | None) -> SparseDist:
+        return self._update_binop(temp_var, first_factor, second_factor, Binop.TIMES)
+
+    def _update_subtraction(self, temp_var: str, sub_from: str | int, sub: str | int) -> SparseDist:
+        return self._update_binop(temp_var, sub_from, sub, Binop.MINUS)
+
+    def _update_modulo(self, temp_var: str, left: str | int, right: str | int,
+                       approximate: str | float | None) -> SparseDist:
+        return self._update_binop(temp_var, left, right, Binop.MODULO)
+
+    def _update_division(self, temp_var: str, numerator: str | int, denominator: str | int,
+                         approximate: str | float | None) -> SparseDist:
+        return self._update_binop(temp_var, numerator, denominator, Binop.DIVIDE)
+
+    def _update_power(self, temp_var: str, base: str | int, exp: str | int,
+                      approximate: str | float | None) -> SparseDist:
+        return self._update_binop(temp_var, base, exp, Binop.POWER)
+
+    def update_iid(self, sampling_dist: Expr, count: VarExpr, variable: Union[str, VarExpr]) -> SparseDist:
+        variable = str(variable)
+        if isinstance(sampling_dist, FunctionCallExpr):
+            sample = SparsePGF.from_function_call(sampling_dist, variable)
+        else:
+            sample = SparsePGF.from_expr(str(sampling_dist), variable)
+        sample_terms = [(exps[0], coefficient) for exps, coefficient in sample._terms.items()]
+        count_index, var_index = self._index(count.var), self._index(variable)
+
+        # powers[k] is the distribution of the sum of k samples
+        powers: List[Dict[int, Coefficient]] = [{0: Fraction(1)}]
+        terms: Terms = {}
+        for exps, coefficient in self._terms.items():
+            while len(powers) <= exps[count_index]:
+                power: Dict[int, Coefficient] = defaultdict(Fraction)
+                for value, probability in powers[-1].items():
+                    for sample_value, sample_probability in sample_terms:
+                        power[value + sample_value] = power[value + sample_value] + probability * sample_probability
+                powers.append(power)
+            for value, probability in powers[exps[count_index]].items():
+                new_exps = exps[:var_index] + (value,) + exps[var_index + 1:]
+                _add_term(terms, new_exps, coefficient * probability)
+        return SparseDist(terms, self._variables, self._parameters | sample._parameters)
+
+    # ================================ variables ================================
+
+    def marginal(self, *variables: Union[str, VarExpr], method: MarginalType = MarginalType.INCLUDE) -> SparseDist:
+        if len(variables) == 0:
+            raise ValueError("No variables were provided")
+        selected = {str(var) for var in variables}
+        if not selected <= self.get_variables():
+            raise ValueError(f"Unknown variable(s): {selected - self.get_variables()}")
+        kept = tuple(var for var in self._variables
+                     if (var in selected) == (method == MarginalType.INCLUDE))
+        indices = [self._index(var) for var in kept]
+        terms: Terms = {}
+        for exps, coefficient in self._terms.items():
+            _add_term(terms, tuple(exps[i] for i in indices), coefficient)
+        return SparseDist(terms, kept, self._parameters)
+
+    def set_variables(self, *variables: str) -> SparseDist:
+        if not variables:
+            raise ValueError("The free-variables of a distribution cannot be empty!")
+        new_vars = tuple(dict.fromkeys(variables))
+        removed = [var for var in self._variables if var not in new_vars]
+        if not removed:
+            return SparseDist(self._aligned(new_vars), new_vars, self._parameters - set(new_vars))
+
+        # Removed variables become parameters, i.e., their exponents move into the coefficients.
+        positions = {var: i for i, var in enumerate(self._variables)}
+        indices = [positions.get(var) for var in new_vars]
+        removed_indices = [positions[var] for var in removed]
+        terms: Terms = {}
+        for exps, coefficient in self._terms.items():
+            factor = sympy.Mul(*(sympy.Symbol(self._variables[i]) ** exps[i] for i in removed_indices))
+            _add_term(terms, tuple(0 if i is None else exps[i] for i in indices), coefficient * factor)
+        parameters = self._parameters | {self._variables[i] for i in removed_indices
+                                         if any(exps[i] for exps in self._terms)}
+        return SparseDist(terms, new_vars, parameters - set(new_vars))
+
+    def set_parameters(self, *parameters: str) -> SparseDist:
+        if set(parameters) & set(self._variables):
+            raise ValueError("A indeterminate cannot be variable and parameter at the same time.")
+        return SparseDist(self._terms, self._variables, frozenset(parameters))
+
+    def set_variables_and_parameters(self, variables, parameters):
+        return self.set_variables(*variables).set_parameters(*parameters)
+
+    # ================================ approximation ================================
+
+    def approximate(self, threshold: Union[str, int]) -> Generator[SparseDist, None, None]:
+        terms: Terms = {}
+        mass: Coefficient = Fraction(0)
+        limit = int(threshold) if isinstance(threshold, int) else None
+        target = None if limit is not None else _coefficient(str(threshold))
+        for exps in sorted(self._terms, key=lambda exps: (sum(exps), exps)):
+            terms[exps] = self._terms[exps]
+            mass += self._terms[exps]
+            yield self._with_terms(dict(terms))
+            if limit is not None and len(terms) >= limit:
+                return
+            if target is not None and not isinstance(mass, sympy.Expr) and mass >= target:
+                return
+
+    def approximate_unilaterally(self, variable: str, probability_mass: str | float) -> SparseDist:
+        # Finite distributions are represented exactly.
+        return self
+
+
+class SparsePGF(CommonDistributionsFactory):
+    """Implements common distributions with finite support as sparse distributions."""
+
+    @staticmethod
+    def _infinite(name: str) -> NoReturn:
+        raise NotImplementedError(f"The {name} distribution has infinite support and cannot be represented sparsely.")
+
+    @staticmethod
+    def _natural_param(param: DistributionParam) -> int:
+        value = _coefficient(str(param))
+        if isinstance(value, sympy.Expr) or value.denominator != 1 or value < 0:
+            raise ValueError(f"Sparse distributions require natural parameters, but got {param}.")
+        return int(value)
+
+    @staticmethod
+    def _probability_param(param: DistributionParam) -> Coefficient:
+        value = _coefficient(str(param))
+        if not isinstance(value, sympy.Expr) and not 0 <= value <= 1:
+            raise ValueError(f"Parameter must be in [0,1], but was {param}")
+        return value
+
+    @staticmethod
+    def _univariate(var: Union[str, VarExpr], probabilities: Dict[int, Coefficient]) -> SparseDist:
+        terms: Terms = {}
+        for value, probability in probabilities.items():
+            _add_term(terms, (value,), probability)
+        parameters = set().union(*(_symbols(probability) for probability in probabilities.values()))
+        return SparseDist(terms, (str(var),), parameters)
+
+    @staticmethod
+    def geometric(var: Union[str, VarExpr], p: DistributionParam) -> SparseDist:
+        return SparsePGF._infinite("geometric")
+
+    @staticmethod
+    def uniform(var: Union[str, VarExpr], lower: DistributionParam, upper: DistributionParam) -> SparseDist:
+        low, high = SparsePGF._natural_param(lower), SparsePGF._natural_param(upper)
+        if low > high:
+            raise ValueError("Distribution parameters must satisfy 0 <= a < b < oo")
+        return SparsePGF._univariate(var, {value: Fraction(1, high - low + 1) for value in range(low, high + 1)})
+
+    @staticmethod
+    def bernoulli(var: Union[str, VarExpr], p: DistributionParam) -> SparseDist:
+        prob = SparsePGF._probability_param(p)
+        return SparsePGF._univariate(var, {0: _coefficient(1 - prob), 1: prob})
+
+    @staticmethod
+    def poisson(var: Union[str, VarExpr], lam: DistributionParam) -> SparseDist:
+        return SparsePGF._infinite("poisson")
+
+    @staticmethod
+    def log(var: Union[str, VarExpr], p: DistributionParam) -> SparseDist:
+        return SparsePGF._infinite("logarithmic")
+
+    @staticmethod
+    def binomial(var: Union[str, VarExpr], n: DistributionParam, p: DistributionParam) -> SparseDist:
+        trials, prob = SparsePGF._natural_param(n), SparsePGF._probability_param(p)
+        return SparsePGF._univariate(var, {
+            k: _coefficient(math.comb(trials, k) * prob ** k * (1 - prob) ** (trials - k))
+            for k in range(trials + 1)})
+
+    @staticmethod
+    def zero(*variables: Union[str, VarExpr]) -> SparseDist:
+        return SparseDist({}, tuple(map(str, variables)))
+
+    @staticmethod
+    def undefined(*variables: Union[str, VarExpr]) -> SparseDist:
+        return SparseDist({}, tuple(map(str, variables)))
+
+    @staticmethod
+    def one(*variables: Union[str, VarExpr]) -> SparseDist:
+        names = tuple(map(str, variables))
+        return SparseDist({(0,) * len(names): Fraction(1)}, names)
+
+    @staticmethod
+    def from_expr(expression: Union[str, Expr], *variables, **kwargs) -> SparseDist:
+        names = tuple(dict.fromkeys(map(str, variables)))
+        expr = sympy.expand(sympy.sympify(str(expression), rational=True))
+        parameters = {str(symbol) for symbol in expr.free_symbols} - set(names)
+        if len(names) == 0:
+            names = tuple(sorted(str(symbol) for symbol in expr.free_symbols))
+            parameters = set()
+        if expr == 0:
+            return SparseDist({}, names, parameters)
+        try:
+            poly = sympy.Poly(expr, *(sympy.Symbol(name) for name in names)) if names else None
+        except sympy.PolynomialError as err:
+            raise ValueError(f"{expression} does not describe a distribution with finite support.") from err
+        if poly is None:
+            return SparseDist({(): _coefficient(expr)}, names, parameters)
+        terms: Terms = {}
+        for exps, coefficient in poly.terms():
+            _add_term(terms, tuple(int(exp) for exp in exps), _coefficient(coefficient))
+        return SparseDist(terms, names, parameters)
+
+    @staticmethod
+    def from_function_call(call: FunctionCallExpr, variable: str) -> SparseDist:
+        """Creates the distribution of a sampling function call like `binomial(n, p)` in `variable`."""
+        params = call.params[0]
+        if call.function == "binomial":
+            return SparsePGF.binomial(variable, *params)
+        if call.function in {"unif", "unif_d"}:
+            return SparsePGF.uniform(variable, *params)
+        if call.function == "bernoulli":
+            return SparsePGF.bernoulli(variable, *params)
+        if call.function in {"geometric", "poisson", "logdist"}:
+            SparsePGF._infinite(call.function)
+        raise NotImplementedError(f"Unsupported distribution: {call}")
@@ -1,10 +1,11 @@
 # pylint: disable=protected-access
 from __future__ import annotations
 
+import itertools
 import logging
 import operator
 import re
-from typing import Union, Generator, Sequence, Iterator, Tuple, Type, List, get_args, Callable
+from typing import Union, Generator, Sequence, Iterator, Tuple, Type, List, get_args, Callable, Dict, Hashable, Optional
 
 import symengine as se
 # pylint: disable-msg=no-name-in-module
@@ -19,12 +20,60 @@ from probably.util.ref import Mut
 from probably.pgcl.parser import parse_expr
 
 from prodigy.distribution import Distribution
-from prodigy.distribution import MarginalType, State, CommonDistributionsFactory, DistributionParam
+from prodigy.distribution import MarginalType, State, CommonDistributionsFactory, DistributionParam, AffineUpdate
 from prodigy.util.logger import log_setup
 from prodigy.util.order import default_monomial_iterator
 
 logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG, file="GF_operations.log")
 
+_MAX_CANCELLATIONS = 32
+"""The largest multiplicity of a common root of numerator and denominator cancelled by `_evaluate_quotient`."""
+
+
+def _monomial_terms(function: se.Basic, variables: Sequence[se.Symbol]) -> Optional[Dict[Tuple[int, ...], se.Basic]]:
+    """
+    Expands `function` and maps the exponents of `variables` in each monomial to its coefficient, which may contain
+    further symbols. Returns None if the expanded function is not a polynomial in `variables`.
+    """
+    expanded = se.expand(function)
+    index = {var: i for i, var in enumerate(variables)}
+    terms: Dict[Tuple[int, ...], se.Basic] = {}
+    for term in (expanded.args if expanded.is_Add else (expanded,)):
+        exponents, coefficient = [0] * len(variables), se.Integer(1)
+        for factor in (term.args if term.is_Mul else (term,)):
+            if factor in index:
+                exponents[index[factor]] += 1
+            elif factor.is_Pow and factor.args[0] in index:
+                exponent = factor.args[1]
+                if not (exponent.is_Integer and exponent >= 0):
+                    return None
+                exponents[index[factor.args[0]]] += int(exponent)
+            elif any(symbol in index for symbol in factor.free_symbols):
+                return None
+            else:
+                coefficient *= factor
+        key = tuple(exponents)
+        terms[key] = terms.get(key, se.Integer(0)) + coefficient
+    return {exponents: coefficient for exponents, coefficient in terms.items() if coefficient != 0}
+
+
+def _evaluate_quotient(function: se.Basic, variable: se.Symbol, value: se.Basic) -> Optional[se.Basic]:
+    """
+    Evaluates `function` at `variable = value` where direct substitution is indeterminate, without computing limits.
+    The function is written as a quotient and common roots of numerator and denominator at `value` are cancelled by
+    differentiating both (l'Hôpital's rule). Returns None if the singularity cannot be removed this way.
+    """
+    numerator, denominator = function.as_numer_denom()
+    for _ in range(_MAX_CANCELLATIONS):
+        numerator_value, denominator_value = numerator.subs(variable, value), denominator.subs(variable, value)
+        if se.expand(denominator_value) != 0:
+            result = numerator_value / denominator_value
+            return None if result.simplify() in [se.nan, se.zoo] else result
+        if se.expand(numerator_value) != 0:
+            return None
+        numerator, denominator = numerator.diff(variable), denominator.diff(variable)
+    return None
+
 
 class SymengineDist(Distribution):
     @staticmethod
@@ -73,6 +122,8 @@ class SymengineDist(Distribution):
             # Convert other into a SymengineDist with matching variables
             return self._arithmetic_operator(SymengineDist(other, *self.get_variables()), textual_descr, op)
 
+        if isinstance(other, Distribution) and not isinstance(other, SymengineDist):
+            return NotImplemented
         if not isinstance(other, SymengineDist):
             raise SyntaxError(f"You cannot {textual_descr} {type(self)} by {type(other)}.")
 
@@ -94,6 +145,8 @@ class SymengineDist(Distribution):
             return False
         return self._s_func == other._s_func
 
+    __hash__ = Distribution.__hash__
+
     def __le__(self, other: SymengineDist) -> bool:
         if not isinstance(other, SymengineDist):
             raise TypeError(f"Incomparable types {type(self)} and {type(other)}.")
@@ -112,26 +165,15 @@ class SymengineDist(Distribution):
             return True
 
         difference: se.Basic = self._s_func - other._s_func
-        # todo replace once suitable method is found
-        #   cf. https://github.com/symengine/symengine.py/issues/492
-        logger.info("Falling back to sympy")
-        if sp.S(difference).is_polynomial():
-            return all(
-                map(lambda x: x > 0, difference.as_coefficients_dict().values())
-            )
+        terms = _monomial_terms(difference, sorted(self._variables | other._variables, key=str))
+        if terms is not None:
+            return all(map(lambda x: x > 0, terms.values()))
         raise RuntimeError(
             "Both objects have infinite support. We cannot determine the order between them."
         )
 
     def coefficient_sum(self) -> se.Expr:
-        # TODO Limits seem to not be present in SE
-        logger.info("Falling back to sympy")
-        coefficient_sum: sp.Expr = sp.S(self._s_func).simplify()
-        for var in self._variables:
-            coefficient_sum = coefficient_sum.limit(
-                var, 1, "-"
-            )
-        return se.S(coefficient_sum)
+        return self.safe_subs(*[(var, 1) for var in self._variables])
 
     def __str__(self) -> str:
         return f"{self._s_func}"
@@ -143,31 +185,14 @@ class SymengineDist(Distribution):
             v = list(self.get_variables())
             if len(v) == 1:
                 var = v[0]
-                i = 0
-                while True:
-                    yield str(prob_fun(State({var: i}))), State({var: i})
-                    i += 1
+                for i, coefficient in enumerate(self._iter_taylor(self._s_func, se.Symbol(var))):
+                    yield str(coefficient), State({var: i})
             else:
                 for tup in default_monomial_iterator(len(v)):
                     state = State(dict(zip(v, tup)))
                     yield str(prob_fun(state)), state
         else:
-            # TODO replace with symengine method
-            logger.info("Falling back to sympy")
-
-            func: sp.Expr = sp.S(self._s_func)
-            variables: set[sp.Symbol] = {sp.Symbol(v) for v in self.get_variables()}
-
-            if not func.is_polynomial(*variables):
-                func = func.expand().ratsimp().as_poly(*variables)
-            else:
-                func = func.as_poly(*variables)
-
-            assert isinstance(func, sp.Poly)
-
-            while func.as_expr() != 0:
-                yield str(func.EC()), self._monomial_to_state(func.EM().as_expr())
-                func -= func.EC() * func.EM().as_expr()
+            yield from self._iter_polynomial()
 
     def iter_with(self, monomial_iterator: Iterator[List[int]]) -> Iterator[Tuple[str, State]]:
         """
@@ -181,22 +206,21 @@ class SymengineDist(Distribution):
             for tup in monomial_iterator:
                 yield str(prob_fun(State(dict(zip(v, tup))))), State(dict(zip(v, tup)))
         else:
-            # TODO replace with symengine method
-            logger.info("Falling back to sympy")
-
-            func: sp.Expr = sp.S(self._s_func)
-            variables: set[sp.Symbol] = {sp.Symbol(v) for v in self.get_variables()}
+            yield from self._iter_polynomial()
 
-            if not func.is_polynomial(*variables):
-                func = func.expand().ratsimp().as_poly(*variables)
-            else:
-                func = func.as_poly(*variables)
-
-            assert isinstance(func, sp.Poly)
-
-            while func.as_expr() != 0:
-                yield str(func.EC()), self._monomial_to_state(func.EM().as_expr())
-                func -= func.EC() * func.EM().as_expr()
+    def _iter_polynomial(self) -> Iterator[Tuple[str, State]]:
+        """
+        Iterates over the terms of a finite distribution in ascending lexicographic order of their exponents.
+        """
+        variables = sorted(self._variables, key=str)
+        terms = _monomial_terms(self._s_func, variables)
+        if terms is None:
+            # The function only becomes a polynomial after cancellation, e.g., (1 - x**2) / (1 - x)
+            logger.info("Falling back to sympy")
+            terms = _monomial_terms(se.S(sp.S(self._s_func).cancel()), variables)
+            assert terms is not None
+        for exponents in sorted(terms):
+            yield str(terms[exponents]), State(dict(zip(map(str, variables), exponents)))
 
     # TODO integrate these functions better / move them / replace by correct signature
     def get_prob_by_diff(self, state: State) -> se.Basic:
@@ -210,6 +234,47 @@ class SymengineDist(Distribution):
         return (self.safe_subs(*zip(list(self._variables), [0] * len(self._variables)), fun=fun) /
                 se.S("*".join([str(se.gamma(el + 1)) for _, el in state.items()])))
 
+    def _iter_taylor(self, function: se.Basic, variable: se.Symbol) -> Iterator[se.Basic]:
+        """
+        Iterates over the coefficients of `variable^0, variable^1, ...` in the taylor expansion of `function`. The
+        coefficients of polynomials are read off their expansion and the iteration stops after the last one. Otherwise,
+        each derivative is computed from the previous one.
+        :param function: The expanded function, which may contain other variables
+        :param variable: The variable to expand
+        """
+        terms = _monomial_terms(function, [variable])
+        if terms is not None:
+            for k in range(max(terms, default=(-1,))[0] + 1):
+                yield terms.get((k,), se.Integer(0))
+            return
+        derivative = function
+        for k in itertools.count():
+            yield self.safe_subs(variable, 0, fun=derivative) / se.gamma(k + 1)
+            derivative = derivative.diff(variable)
+
+    def _taylor_coefficients(self, function: se.Basic, variable: se.Symbol, degree: int) -> List[se.Basic]:
+        """
+        Get the coefficients of `variable^0, ..., variable^degree` in the taylor expansion of `function`
+        :param function: The expanded function, which may contain other variables
+        :param variable: The variable to expand
+        :param degree: The largest exponent of interest
+        :return: The list of coefficients
+        """
+        coefficients = list(itertools.islice(self._iter_taylor(function, variable), degree + 1))
+        return coefficients + [se.Integer(0)] * (degree + 1 - len(coefficients))
+
+    def coefficients(self, up_to: Dict[str, int]) -> Dict[State, str]:
+        if set(up_to) != self.get_variables():
+            raise ValueError(f"Bounds have to be given for exactly the variables {self.get_variables()}.")
+        variables = sorted(up_to)
+        box: Dict[Tuple[int, ...], se.Basic] = {(): self._s_func}
+        for var in variables:
+            box = {exponents + (k,): coefficient
+                   for exponents, function in box.items()
+                   for k, coefficient in enumerate(self._taylor_coefficients(function, se.Symbol(var), up_to[var]))
+                   if coefficient != 0}
+        return {State(dict(zip(variables, exponents))): str(coefficient) for exponents, coefficient in box.items()}
+
     def get_prob_by_series(self, state: State) -> se.Basic:
         """
         Get the probability of a given state by means of taylor expansion
@@ -303,10 +368,9 @@ class SymengineDist(Distribution):
         return set(map(str, self._parameters))
 
     def _exhaustive_search(self, condition: Expr) -> SymengineDist:
-        res = se.S("0")
-        for prob, state in self:
-            if self.evaluate_condition(condition, state):
-                res += se.S(f"{prob} * {state.to_monomial()}")
+        terms = list(self)
+        holds = self._evaluate_condition_in(condition, [state for _, state in terms])
+        res = se.Add(*(se.S(f"{prob} * {state.to_monomial()}") for (prob, state), keep in zip(terms, holds) if keep))
         return SymenginePGF.from_expr(
             res,
             *self._variables
@@ -370,9 +434,9 @@ class SymengineDist(Distribution):
         }
 
         # Compute the probabilities of the states _var_ = i where i ranges depending on the operator (< , <=, =).
+        coefficients = self._taylor_coefficients(self._s_func, variable, constant)
         for i in ranges[condition.operator]:
-            result += (self.safe_subs(variable, 0, fun=self._s_func.diff(variable, i) / se.gamma(i + 1))
-                       * variable ** i)
+            result += coefficients[i] * variable ** i
         return SymengineDist(result).set_variables_and_parameters(self.get_variables(), self.get_parameters())
 
     def _arithmetic_progression(self, variable: str, modulus: str) -> Sequence[SymengineDist]:
@@ -436,6 +500,8 @@ class SymengineDist(Distribution):
         return self._s_func.is_zero
 
     def is_finite(self) -> bool:
+        if _monomial_terms(self._s_func, list(self._variables)) is not None:
+            return True
         # todo replace once a suitable method is found within symengine
         #   cf. https://github.com/symengine/symengine.py/issues/492
         logger.info("Falling back to sympy")
@@ -443,6 +509,19 @@ class SymengineDist(Distribution):
         #   cf. https://docs.sympy.org/latest/modules/core.html#sympy.core.expr.Expr.is_polynomial
         return sp.S(self._s_func).cancel().is_polynomial()
 
+    def expression_size(self) -> int:
+        size, pending = 0, [self._s_func]
+        while pending:
+            node = pending.pop()
+            size += 1
+            pending.extend(node.args)
+        return size
+
+    def canonical_key(self) -> Hashable:
+        # Symengine keeps expressions in a canonical form, which is also the basis of `__eq__`.
+        return ("SymengineDist", str(self._s_func), tuple(sorted(map(str, self._variables))),
+                tuple(sorted(map(str, self._parameters))))
+
     def get_fresh_variable(self, exclude: set[str] | frozenset[str] = frozenset()) -> str:
         i = 0
         while f'x_{i}' in (
@@ -467,6 +546,32 @@ class SymengineDist(Distribution):
         else:
             return self.copy()
 
+    def update_affine(self, updates: Dict[str, AffineUpdate]) -> SymengineDist:
+        # E[prod_v x_v^(c_v + sum_u a_vu * u)] = prod_v x_v^(c_v) * G(u -> prod_v x_v^(a_vu)), where a_uu = 1 for
+        # variables u that are not updated.
+        variables = self.get_variables()
+        for var, (_, coefficients) in updates.items():
+            if not {var, *coefficients} <= variables:
+                raise ValueError(f"Unknown variable(s) in affine update of {var}: {updates[var]}")
+
+        def exponent(assigned: str, read: str) -> int:
+            if assigned in updates:
+                return updates[assigned][1].get(read, 0)
+            return 1 if assigned == read else 0
+
+        substitution = {}
+        unread = []
+        for read in variables:
+            monomial = se.Mul(*(se.Symbol(assigned) ** exponent(assigned, read) for assigned in variables))
+            if monomial == 1:
+                unread.append(read)
+            elif monomial != se.Symbol(read):
+                substitution[se.Symbol(read)] = monomial
+
+        res = self.marginal(*unread, method=MarginalType.EXCLUDE)._s_func if unread else self._s_func
+        res = res.subs(substitution) * se.Mul(*(se.Symbol(var) ** constant for var, (constant, _) in updates.items()))
+        return SymengineDist(res).set_variables_and_parameters(self.get_variables(), self.get_parameters())
+
     def _update_sum(self, temp_var: str, first_summand: str | int, second_summand: str | int) -> SymengineDist:
         update_var, sum_1, sum_2, res = se.S(temp_var), se.S(first_summand), se.S(second_summand), self._s_func
 
@@ -970,9 +1075,8 @@ class SymengineDist(Distribution):
     def safe_subs(self, *parameters: Union[Tuple[str, str | int], str, se.Expr, int], fun: se.Expr = None) -> se.Expr:
         """
         Substitution with checks for divisions by zero.
-        First tries to use simple substitution, if result is NaN, convert to sympy,
-        then check whether it is rational and depending on that, cancel the fraction or
-        take the limit.
+        First tries to use simple substitution, if result is NaN, common roots of numerator and denominator are
+        cancelled (see `_evaluate_quotient`). Only if this fails, the function is converted to sympy to take the limit.
 
         :param parameters: The substitution parameters of form variable, value.
         :param fun: The function the substitution should be performed on. If not given, self._s_func is used.
@@ -990,17 +1094,14 @@ class SymengineDist(Distribution):
         if fun is None:
             fun = self._s_func
         for (variable, value) in pairs:     # type: ignore
-            f = fun
             # FIXME subs with dict instead of stepwise
-            if f.subs(variable, value).simplify() in [se.nan, se.zoo]:
-                logger.info("Falling back to sympy")
-                sympy_func: sp.Expr = sp.S(fun)
-                if sympy_func.is_Rational:
-                    fun = se.S(sympy_func.cancel().simplify())
-                else:
-                    fun = se.S(sympy_func.limit(variable, value, "-").simplify())
-            else:
-                fun = fun.subs(variable, value)
+            substituted = fun.subs(variable, value)
+            if substituted.simplify() in [se.nan, se.zoo]:
+                substituted = _evaluate_quotient(fun, se.S(variable), se.S(value))
+                if substituted is None:
+                    logger.info("Falling back to sympy")
+                    substituted = se.S(sp.S(fun).limit(variable, value, "-").simplify())
+            fun = substituted
 
         return fun
 
@@ -1022,13 +1123,13 @@ class SymengineDist(Distribution):
         var = se.S(variable)
         if var not in self._variables:
             raise ValueError(f'Not a variable: {variable}')
-        result = 0
-        mass_res = 0
+        result = se.Integer(0)
+        mass_res = se.Integer(0)
 
-        logger.info("Falling back to sympy")
-        sympy_f: sp.Expr = sp.S(self._s_func)
-        # todo remove with symengine method
-        for element in sympy_f.series(sp.S(var), n=None):
+        for power, coefficient in enumerate(self._iter_taylor(self._s_func, var)):
+            if coefficient == 0:
+                continue
+            element = coefficient * var ** power
             result += element
             mass_res += self.safe_subs(*[(sym, 1)
                                          for sym in element.free_symbols], fun=element)
@@ -1037,26 +1138,6 @@ class SymengineDist(Distribution):
 
         raise NotImplementedError("unreachable")
 
-    # TODO replace sympy with symengine
-    def _monomial_to_state(self, monomial: sp.Expr) -> State:
-        """ Converts a `monomial` into a state representation, i.e., a (variable_name, variable_value) dict.
-            This is tied to a specific instance of a generating function as a variable and parameter context
-            is needed to resolve the types of indeterminates in the monomial.
-        """
-        result = State()
-        if monomial.free_symbols == set():
-            for var in self._variables:
-                result[str(var)] = 0
-        else:
-            variables_and_powers = monomial.as_powers_dict()
-            for var in self._variables:
-                var = sp.Symbol(str(var))
-                if var in variables_and_powers.keys():
-                    result[str(var)] = int(variables_and_powers[var])
-                else:
-                    result[str(var)] = 0
-        return result
-
 
 def _parse_to_symengine(expression) -> se.Expr:
     """
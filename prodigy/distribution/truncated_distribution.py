@@ -0,0 +1,247 @@
+# pylint: disable=protected-access
+"""
+A numeric backend for distributions with infinite support. Distributions are stored like dense distributions, but the
+coefficient array of each variable is truncated after a fixed degree. The probability mass cut off by truncation is
+tracked as an error bound, such that every probability computed from the truncated distribution is at most
+`get_truncation_error()` below the exact one. Infinite distributions like geometric or Poisson distributions are
+expanded numerically, and rational generating functions are expanded by power series division, which avoids the
+symbolic Taylor expansions that make loopy programs slow in the symbolic backends.
+"""
+from __future__ import annotations
+
+import logging
+import math
+from typing import Callable, NoReturn, Sequence, Tuple, Type, Union
+
+import numpy as np
+import sympy
+from probably.pgcl import Expr, FunctionCallExpr, VarExpr
+
+from prodigy.distribution.dense_distribution import DenseDist, DensePGF, _scalar, _trimmed
+from prodigy.distribution.distribution import Distribution, DistributionParam
+from prodigy.util.logger import log_setup
+
+logger = log_setup(str(__name__).rsplit(".", maxsplit=1)[-1], logging.DEBUG)
+
+
+def _mass_and_error(operand: DenseDist | float) -> Tuple[float, float]:
+    """Returns the absolute probability mass and the truncation error of an operand."""
+    if isinstance(operand, TruncatedDist):
+        return float(np.abs(operand._array).sum()), operand._error
+    if isinstance(operand, DenseDist):
+        return float(np.abs(operand._array).sum()), 0.0
+    return abs(operand), 0.0
+
+
+def _series_quotient(numerator: np.ndarray, denominator: np.ndarray, degree: int) -> np.ndarray:
+    """Computes the coefficients of numerator / denominator up to `degree` in every variable."""
+    shape = (degree + 1,) * numerator.ndim
+    padded = np.zeros(shape, dtype=numerator.dtype)
+    window = tuple(slice(0, min(extent, degree + 1)) for extent in numerator.shape)
+    padded[window] = numerator[window]
+    constant = denominator[(0,) * denominator.ndim]
+    result = np.zeros(shape, dtype=numerator.dtype)
+    # result[k] = (numerator[k] - sum_{0 < j <= k} denominator[j] * result[k - j]) / denominator[0], where the
+    # sum only ranges over the (usually small) support of the denominator.
+    for index in np.ndindex(*shape):
+        bounds = tuple(min(k, extent - 1) for k, extent in zip(index, denominator.shape))
+        coefficients = denominator[tuple(slice(0, bound + 1) for bound in bounds)]
+        previous = np.flip(result[tuple(slice(k - bound, k + 1) for k, bound in zip(index, bounds))])
+        result[index] = (padded[index] - np.sum(coefficients * previous)) / constant
+    return result
+
+
+def _total_mass(expr: sympy.Expr, names: Sequence[str]) -> float:
+    """Evaluates a generating function at 1 for all variables."""
+    value = expr.subs({sympy.Symbol(name): 1 for name in names})
+    if value.has(sympy.nan, sympy.zoo):
+        value = expr
+        for name in names:
+            value = sympy.limit(value, sympy.Symbol(name), 1)
+    return float(value)
+
+
+class TruncatedDist(DenseDist):
+    """A dense distribution truncated after `degree` in every variable, together with a bound on the cut-off mass."""
+
+    def __init__(self, array: np.ndarray, variables: Sequence[str], degree: int, error: float = 0.0):
+        super().__init__(array, variables)
+        self._error = error
+        self._degree = degree
+
+    def factory(self) -> Type[TruncatedPGF]:  # type: ignore[override]
+        # pylint: disable=arguments-differ
+        return TruncatedPGF.configured(dtype=self._array.dtype.type, degree=self._degree)
+
+    def _new(self, array: np.ndarray, variables: Sequence[str]) -> TruncatedDist:
+        kept = array[tuple(slice(0, self._degree + 1) for _ in range(array.ndim))]
+        dropped = float(np.abs(array).sum() - np.abs(kept).sum())
+        return TruncatedDist(_trimmed(kept), variables, self._degree, self._error + dropped)
+
+    def _with_error(self, result: Distribution, error: float) -> TruncatedDist:
+        """Replaces the error inherited by `result` from this distribution by `error`."""
+        # Every operation of a dense distribution creates its result using `_new`, hence keeps the truncated type.
+        assert isinstance(result, TruncatedDist)
+        result._error += error - self._error
+        return result
+
+    def canonical_key(self) -> Tuple:
+        return super().canonical_key() + (self._degree, repr(self._error))
+
+    def get_truncation_error(self) -> str:
+        """Returns an upper bound on the probability mass lost due to truncation."""
+        return repr(self._error)
+
+    def __repr__(self) -> str:
+        return f"TruncatedDist({self}, variables={self._variables}, error={self._error})"
+
+    def copy(self, deep: bool = True) -> TruncatedDist:
+        return TruncatedDist(self._array.copy() if deep else self._array, self._variables, self._degree, self._error)
+
+    def __add__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return self._with_error(super().__add__(other), self._error + _mass_and_error(other)[1])
+
+    def __sub__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return self._with_error(super().__sub__(other), self._error + _mass_and_error(other)[1])
+
+    def __mul__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        mass, error = _mass_and_error(other)
+        own_mass = float(np.abs(self._array).sum())
+        return self._with_error(super().__mul__(other), self._error * (mass + error) + own_mass * error)
+
+    def __truediv__(self, other) -> Distribution:
+        other = self._operand(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return self._with_error(super().__truediv__(other), self._error / _mass_and_error(other)[0])
+
+    def normalize(self) -> TruncatedDist:
+        mass = float(self._array.sum())
+        return self._with_error(super().normalize(), self._error / mass)
+
+    def hadamard_product(self, other: Distribution) -> TruncatedDist:
+        other_error = other._error if isinstance(other, TruncatedDist) else 0.0
+        return self._with_error(super().hadamard_product(other), self._error + other_error)
+
+    def update_iid(self, sampling_dist: Expr, count: VarExpr, variable: Union[str, VarExpr]) -> TruncatedDist:
+        result = super().update_iid(sampling_dist, count, variable)
+        assert isinstance(result, TruncatedDist)
+        sample = self._sample(sampling_dist, str(variable))
+        sample_error = sample._error if isinstance(sample, TruncatedDist) else 0.0
+        if sample_error == 0:
+            return result
+        # Each of the `count` samples independently falls into the truncated tail with probability `sample_error`.
+        result._error += sample_error * float(self.get_expected_value_of(count.var))
+        return result
+
+
+class TruncatedPGF(DensePGF):
+    """Implements common distributions as truncated distributions."""
+
+    degree: int = 100
+    """The largest value stored for each variable, see `ForwardAnalysisConfig.truncation_degree`."""
+
+    @staticmethod
+    def _infinite(name: str) -> NoReturn:
+        raise AssertionError(f"The {name} distribution is expanded up to the truncation degree, see `_expanded`.")
+
+    @classmethod
+    def _truncated(cls, dist: DenseDist, error: float = 0.0) -> TruncatedDist:
+        return TruncatedDist(np.zeros((1,) * len(dist._variables), dtype=dist._array.dtype), dist._variables,
+                             cls.degree, error)._new(dist._array, dist._variables)
+
+    @classmethod
+    def _expanded(cls, var: Union[str, VarExpr], probability: Callable[[int], float]) -> TruncatedDist:
+        """Expands a univariate distribution given by the probability of each value."""
+        array = np.array([probability(k) for k in range(cls.degree + 1)], dtype=cls.dtype)
+        return TruncatedDist(_trimmed(array), (str(var),), cls.degree, max(0.0, 1 - float(array.sum())))
+
+    @classmethod
+    def geometric(cls, var: Union[str, VarExpr], p: DistributionParam) -> TruncatedDist:
+        prob = DensePGF._probability_param(p)
+        if prob == 0:
+            raise ValueError(f"parameter of geom distr must be 0 < p <= 1, was {p}")
+        return cls._expanded(var, lambda k: prob * (1 - prob) ** k)
+
+    @classmethod
+    def poisson(cls, var: Union[str, VarExpr], lam: DistributionParam) -> TruncatedDist:
+        rate = _scalar(lam)
+        if rate < 0:
+            raise ValueError(f"Parameter of Poisson Distribution must be in [0, oo), but was {lam}")
+        return cls._expanded(var, lambda k: math.exp(k * math.log(rate) - rate - math.lgamma(k + 1))
+                             if rate > 0 else float(k == 0))
+
+    @classmethod
+    def log(cls, var: Union[str, VarExpr], p: DistributionParam) -> TruncatedDist:
+        prob = DensePGF._probability_param(p)
+        if not 0 < prob < 1:
+            raise ValueError(f"Parameter of Logarithmic Distribution must be in (0,1), but was {p}")
+        return cls._expanded(var, lambda k: -prob ** k / (k * math.log(1 - prob)) if k > 0 else 0.0)
+
+    @classmethod
+    def uniform(cls, var: Union[str, VarExpr], lower: DistributionParam, upper: DistributionParam) -> TruncatedDist:
+        return cls._truncated(super().uniform(var, lower, upper))
+
+    @classmethod
+    def bernoulli(cls, var: Union[str, VarExpr], p: DistributionParam) -> TruncatedDist:
+        return cls._truncated(super().bernoulli(var, p))
+
+    @classmethod
+    def binomial(cls, var: Union[str, VarExpr], n: DistributionParam, p: DistributionParam) -> TruncatedDist:
+        return cls._truncated(super().binomial(var, n, p))
+
+    @classmethod
+    def zero(cls, *variables: Union[str, VarExpr]) -> TruncatedDist:
+        return cls._truncated(super().zero(*variables))
+
+    @classmethod
+    def undefined(cls, *variables: Union[str, VarExpr]) -> TruncatedDist:
+        return cls.zero(*variables)
+
+    @classmethod
+    def one(cls, *variables: Union[str, VarExpr]) -> TruncatedDist:
+        return cls._truncated(super().one(*variables))
+
+    @classmethod
+    def from_expr(cls, expression: Union[str, Expr], *variables, **kwargs) -> TruncatedDist:
+        try:
+            return cls._truncated(super().from_expr(expression, *variables, **kwargs))
+        except ValueError:
+            pass
+        names = tuple(dict.fromkeys(map(str, variables)))
+        expr = sympy.sympify(str(expression))
+        if len(names) == 0:
+            names = tuple(sorted(str(symbol) for symbol in expr.free_symbols))
+        if {str(symbol) for symbol in expr.free_symbols} - set(names):
+            raise ValueError(f"The truncated engine does not support parameters, got {expression}.")
+        numerator, denominator = sympy.fraction(sympy.together(expr))
+        try:
+            numerator_array = super().from_expr(sympy.expand(numerator), *names)._array
+            denominator_array = super().from_expr(sympy.expand(denominator), *names)._array
+        except ValueError as err:
+            raise ValueError(f"{expression} is not a rational generating function.") from err
+        if denominator_array[(0,) * len(names)] == 0:
+            raise ValueError(f"{expression} has no power series expansion at 0.")
+        array = _series_quotient(numerator_array, denominator_array, cls.degree)
+        error = max(0.0, _total_mass(expr, names) - float(array.sum()))
+        return TruncatedDist(_trimmed(array), names, cls.degree, error)
+
+    @classmethod
+    def from_function_call(cls, call: FunctionCallExpr, variable: str) -> TruncatedDist:
+        params = call.params[0]
+        if call.function == "geometric":
+            return cls.geometric(variable, *params)
+        if call.function == "poisson":
+            return cls.poisson(variable, *params)
+        if call.function == "logdist":
+            return cls.log(variable, *params)
+        return cls._truncated(super().from_function_call(call, variable))
@@ -1,8 +1,9 @@
-from typing import Optional, Set
+from typing import List, Optional, Set
 
-from probably.pgcl import (Binop, BinopExpr, Expr, NatLitExpr, Unop, UnopExpr,
-                           VarExpr)
-from probably.pgcl.ast.walk import Walk, mut_expr_children, walk_expr
+from probably.pgcl import (Binop, BinopExpr, Expr, Instr, NatLitExpr,
+                           ObserveInstr, Unop, UnopExpr, VarExpr)
+from probably.pgcl.ast.walk import (Walk, mut_expr_children, walk_expr,
+                                    walk_instrs)
 from probably.util.ref import Mut
 
 
@@ -53,3 +54,13 @@ def check_is_constant_constraint(expression: Expr,
         return True
     else:
         return False
+
+
+def check_is_conditioning_free(instrs: List[Instr]) -> bool:
+    """
+    Checks whether the given instructions (including all nested ones) contain
+    no observations, i.e., whether they never change the error probability.
+    """
+    return not any(
+        isinstance(instr_ref.val, ObserveInstr)
+        for instr_ref in walk_instrs(Walk.DOWN, instrs))
@@ -0,0 +1,89 @@
+from fractions import Fraction
+from typing import Any, Callable, Dict, Mapping
+
+import numpy as np
+from probably.pgcl import (Binop, BinopExpr, BoolLitExpr, Expr, NatLitExpr,
+                           RealLitExpr, Unop, UnopExpr, VarExpr)
+from probably.pgcl.ast.walk import Walk, walk_expr
+from probably.util.ref import Mut
+
+Grids = Mapping[str, np.ndarray]
+"""The values of each variable in a batch of states, one array entry per state."""
+
+Compiled = Callable[[Grids], Any]
+
+_COMPARISONS: Dict[Binop, Callable] = {
+    Binop.EQ: np.equal,
+    Binop.LEQ: np.less_equal,
+    Binop.LT: np.less,
+    Binop.GT: np.greater,
+    Binop.GEQ: np.greater_equal,
+    Binop.AND: np.logical_and,
+    Binop.OR: np.logical_or,
+}
+
+_ARITHMETIC: Dict[Binop, Callable] = {
+    Binop.PLUS: np.add,
+    Binop.MINUS: np.subtract,
+    Binop.TIMES: np.multiply,
+    Binop.MODULO: np.mod,
+    Binop.POWER: np.power,
+    Binop.DIVIDE: np.frompyfunc(lambda numerator, denominator: Fraction(numerator) / Fraction(denominator), 2, 1),
+}
+
+
+def _needs_exact_arithmetic(expression: Expr) -> bool:
+    """Divisions, powers and decimal literals are evaluated on Python numbers, which neither round nor overflow."""
+    for ref in walk_expr(Walk.DOWN, Mut.alloc(expression)):
+        if isinstance(ref.val, RealLitExpr) or (isinstance(ref.val, BinopExpr)
+                                               and ref.val.operator in (Binop.DIVIDE, Binop.POWER)):
+            return True
+    return False
+
+
+def _compile(expression: Expr, exact: bool) -> Compiled:
+    # pylint: disable=too-many-return-statements
+    if isinstance(expression, (NatLitExpr, BoolLitExpr)):
+        value = expression.value
+        return lambda grids: value
+    if isinstance(expression, RealLitExpr):
+        fraction = expression.to_fraction()
+        return lambda grids: fraction
+    if isinstance(expression, VarExpr):
+        name = expression.var
+
+        def variable(grids: Grids):
+            if name not in grids:
+                raise ValueError(f"The variable {name} is not part of the states.")
+            return grids[name].astype(object) if exact else grids[name]
+
+        return variable
+    if isinstance(expression, UnopExpr):
+        operand = _compile(expression.expr, exact)
+        if expression.operator == Unop.NEG:
+            return lambda grids: np.logical_not(operand(grids))
+        if expression.operator == Unop.IVERSON:
+            return lambda grids: np.asarray(operand(grids), dtype=bool).astype(np.int64)
+    if isinstance(expression, BinopExpr):
+        lhs, rhs = _compile(expression.lhs, exact), _compile(expression.rhs, exact)
+        operator = _COMPARISONS.get(expression.operator, _ARITHMETIC.get(expression.operator))
+        if operator is not None:
+            return lambda grids: operator(lhs(grids), rhs(grids))
+    raise NotImplementedError(f"Cannot compile the expression {expression}.")
+
+
+def compile_expression(expression: Expr) -> Compiled:
+    """
+    Compiles an expression once into a function that evaluates it in a batch of states at once. The states are given
+    as one integer array per variable. Integer arithmetic is vectorized by NumPy, while divisions, powers and decimal
+    literals are evaluated exactly, using Python integers and fractions.
+
+    Evaluating raises a `ValueError` if the expression contains a variable that is not part of the states.
+    """
+    return _compile(expression, _needs_exact_arithmetic(expression))
+
+
+def compile_condition(condition: Expr) -> Callable[[Grids], np.ndarray]:
+    """Compiles a condition into a function that computes the mask of all states in a batch which satisfy it."""
+    compiled = compile_expression(condition)
+    return lambda grids: np.asarray(compiled(grids), dtype=bool)
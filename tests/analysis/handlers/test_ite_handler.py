@@ -3,6 +3,7 @@ from probably import pgcl as pgcl
 
 from prodigy.analysis.analyzer import compute_discrete_distribution
 from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.instructionhandler.program_info import ProgramInfo
 from prodigy.distribution.fast_generating_function import ProdigyPGF
 from prodigy.distribution.generating_function import SympyPGF
 from prodigy.distribution.symengine_distribution import SymenginePGF
@@ -26,3 +27,43 @@ def test_ite_statement(engine, factory):
         """), factory.from_expr("x*y"),
         ForwardAnalysisConfig(engine=engine))
     assert result == factory.from_expr("x*y^2", "x", "y")
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_ite_error_probability(engine, factory):
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+
+        if (x > y) {
+            {x := 1} [1/2] {observe(false)}
+        } else {
+            y := y + 1
+        }
+        """)
+    prog_info = ProgramInfo(program)
+    assert not prog_info.is_conditioning_free
+    result, error_prob = compute_discrete_distribution(
+        prog_info, factory.from_expr("1/2*x + 1/2*y", "x", "y"), ForwardAnalysisConfig(engine=engine, normalize=False))
+    assert result == factory.from_expr("1/4*x + 1/2*y^2", "x", "y")
+    assert error_prob.get_probability_mass() == factory.from_expr("1/4").get_probability_mass()
+
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+
+        if (x > y) {
+            {x := 1} [1/2] {skip}
+        } else {
+            y := y + 1
+        }
+        """)
+    prog_info = ProgramInfo(program)
+    assert prog_info.is_conditioning_free
+    result, error_prob = compute_discrete_distribution(
+        prog_info, factory.from_expr("1/2*x + 1/2*y", "x", "y"), ForwardAnalysisConfig(engine=engine))
+    assert result == factory.from_expr("1/2*x + 1/2*y^2", "x", "y")
+    assert error_prob.is_zero_dist()
@@ -1,7 +1,7 @@
 import pytest
 from probably.pgcl import parse_pgcl
 
-from prodigy.analysis.analyzer import compute_semantics
+from prodigy.analysis.analyzer import compute_semantics, compute_discrete_distribution
 from prodigy.analysis.config import ForwardAnalysisConfig
 from prodigy.analysis.instructionhandler.probchoice_handler import PChoiceHandler
 from prodigy.analysis.instructionhandler.program_info import ProgramInfo
@@ -56,3 +56,18 @@ def test_probabilistic_choice(engine, factory):
                                         compute_semantics)
 
         assert result[0] == factory.from_expr("1/2 * x^3 + 1/2 * x^5", "x") and result[1] == error
+
+
+@pytest.mark.parametrize('parallelism', [ForwardAnalysisConfig.Parallelism.THREADS,
+                                         ForwardAnalysisConfig.Parallelism.PROCESSES])
+def test_parallel_branches(parallelism):
+    program = parse_pgcl("""
+    nat x;
+    nat y;
+
+    {x := 3} [1/2] {{y := 2} [1/3] {if (x = 0) {x := 1} else {y := 1}}}
+    """)
+    sequential, _ = compute_discrete_distribution(program, SympyPGF.one(), ForwardAnalysisConfig())
+    parallel, _ = compute_discrete_distribution(
+        program, SympyPGF.one(), ForwardAnalysisConfig(branch_parallelism=parallelism, max_workers=2))
+    assert parallel == sequential
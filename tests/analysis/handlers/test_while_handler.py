@@ -0,0 +1,55 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig, LoopPolicy
+from prodigy.analysis.evtinvariants.heuristics.strategies import SynthesisStrategies
+from prodigy.analysis.exceptions import ConfigurationError
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+GEOMETRIC = """
+    nat x;
+    nat c;
+
+    while (c = 0) {
+        {c := 1} [1/2] {x := x + 1}
+    }
+"""
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_bounded_unrolling_policy(engine, factory):
+    config = ForwardAnalysisConfig(
+        engine=engine, normalize=False,
+        loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.ITERATIONS, max_iterations=2))
+    result, _ = compute_discrete_distribution(pgcl.parse_pgcl(GEOMETRIC), factory.one(), config)
+    assert result == factory.from_expr("1/2*c + 1/4*c*x", "x", "c")
+
+
+def test_policies_per_loop():
+    config = ForwardAnalysisConfig(
+        normalize=False,
+        loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.ITERATIONS, max_iterations=1),
+        loop_policies={"c = 0": LoopPolicy(strategy=LoopPolicy.Strategy.THRESHOLD, probability_threshold=0.7)})
+    result, _ = compute_discrete_distribution(pgcl.parse_pgcl(GEOMETRIC), SympyPGF.one(), config)
+    assert result == SympyPGF.from_expr("1/2*c + 1/4*c*x", "x", "c")
+
+
+def test_policy_requires_budget():
+    config = ForwardAnalysisConfig(loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.ITERATIONS))
+    with pytest.raises(ConfigurationError):
+        compute_discrete_distribution(pgcl.parse_pgcl(GEOMETRIC), SympyPGF.one(), config)
+
+
+def test_auto_policy_falls_back_to_unrolling():
+    # The geometric loop has no polynomial invariant, so enumerating polynomial templates never succeeds.
+    config = ForwardAnalysisConfig(
+        normalize=False, strategy=SynthesisStrategies.INF_POLY,
+        loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.AUTO, max_iterations=2, max_candidates=3))
+    result, _ = compute_discrete_distribution(pgcl.parse_pgcl(GEOMETRIC), SympyPGF.one(), config)
+    assert result == SympyPGF.from_expr("1/2*c + 1/4*c*x", "x", "c")
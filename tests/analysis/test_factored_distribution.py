@@ -0,0 +1,56 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.distribution.factored_distribution import FactoredDistribution
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+PROGRAM = """
+    nat x;
+    nat y;
+    nat z;
+
+    x := geometric(1/2)
+    {y := 1} [1/3] {y := 2}
+    if (y = 1) {
+        z := z + 2
+    } else {
+        z := 1
+    }
+    x := x + 1
+"""
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_factorize(engine, factory):
+    dist = factory.from_expr("(1/2*x + 1/2) * y^2", "x", "y")
+    factored = FactoredDistribution.factorize(dist, [{"x"}, {"y"}])
+    assert len(factored.factors) == 2
+    assert factored.joint() == dist
+    assert hash(factored) == hash(FactoredDistribution.factorize(dist, [{"x", "y"}]))
+    assert factored.filter(pgcl.parse_expr("x = 1")).joint() == dist.filter(pgcl.parse_expr("x = 1"))
+    assert factored.marginal("y").joint() == dist.marginal("y")
+
+    coupled = factory.from_expr("1/2*x + 1/2*y", "x", "y")
+    assert len(FactoredDistribution.factorize(coupled, [{"x"}, {"y"}]).factors) == 1
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_factored_analysis_agrees_with_joint_analysis(engine, factory):
+    program = pgcl.parse_pgcl(PROGRAM)
+    dist = factory.one("x", "y", "z")
+    expected, expected_error = compute_discrete_distribution(program, dist, ForwardAnalysisConfig(engine=engine))
+    result, error = compute_discrete_distribution(program, dist,
+                                                  ForwardAnalysisConfig(engine=engine, factorize_distribution=True))
+    assert not isinstance(result, FactoredDistribution)
+    assert result == expected
+    assert error == expected_error
@@ -0,0 +1,47 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.fusion import FusedAssignments, fuse_assignments
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+PROGRAM = """
+    nat x;
+    nat y;
+    nat z;
+
+    x := x + y
+    y := 2 * x + 3
+    z := y
+    {x := 1} [1/2] {skip}
+    x := x * y
+    z := z + 1
+"""
+
+
+def test_fuse_assignments():
+    program = pgcl.parse_pgcl(PROGRAM)
+    fused = fuse_assignments(program.instructions, program.variables.keys())
+    assert len(fused) == 4
+    assert isinstance(fused[0], FusedAssignments)
+    assert dict(fused[0].updates) == {"x": (0, {"x": 1, "y": 1}),
+                                      "y": (3, {"x": 2, "y": 2}),
+                                      "z": (3, {"x": 2, "y": 2})}
+    assert fused[2] == program.instructions[4]
+    assert fused[3] == program.instructions[5]
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_fused_assignments_agree_with_sequential_updates(engine, factory):
+    program = pgcl.parse_pgcl(PROGRAM)
+    dist = factory.from_expr("1/2*x*y + 1/2*y^2", "x", "y", "z")
+    expected, _ = compute_discrete_distribution(program, dist, ForwardAnalysisConfig(engine=engine))
+    result, _ = compute_discrete_distribution(program, dist,
+                                              ForwardAnalysisConfig(engine=engine, fuse_assignments=True))
+    assert result == expected
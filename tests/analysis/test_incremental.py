@@ -0,0 +1,90 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig, LoopPolicy
+from prodigy.analysis.incremental import AnalysisSession, DiskStore, checkpoint_keys
+from prodigy.analysis.instructionhandler.program_info import ProgramInfo
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+PREFIX = """
+    nat x;
+    nat y;
+
+    x := binomial(4, 1/2)
+    {y := x + 1} [1/3] {y := 2 * x}
+"""
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_resume_from_prefix(engine, factory):
+    session = AnalysisSession()
+    config = ForwardAnalysisConfig(engine=engine, checkpoints=session)
+    dist = factory.one("x", "y")
+
+    compute_discrete_distribution(pgcl.parse_pgcl(PREFIX + "x := x + y"), dist, config)
+    assert session.resumed_instructions == 0
+    assert len(session.store) == 3
+
+    edited = pgcl.parse_pgcl(PREFIX + "observe(x < 5)\ny := y + 1")
+    result, error_prob = compute_discrete_distribution(edited, dist, config)
+    assert session.resumed_instructions == 2
+    expected, expected_error_prob = compute_discrete_distribution(edited, dist, ForwardAnalysisConfig(engine=engine))
+    assert result == expected
+    assert error_prob == expected_error_prob
+
+    compute_discrete_distribution(edited, factory.from_expr("x", "x", "y"), config)
+    assert session.resumed_instructions == 0
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_disk_store(engine, factory, tmp_path):
+    program = pgcl.parse_pgcl(PREFIX)
+    dist = factory.one("x", "y")
+    first = AnalysisSession(DiskStore(tmp_path))
+    expected, _ = compute_discrete_distribution(program, dist, ForwardAnalysisConfig(engine=engine, checkpoints=first))
+
+    second = AnalysisSession(DiskStore(tmp_path))
+    result, _ = compute_discrete_distribution(program, dist, ForwardAnalysisConfig(engine=engine, checkpoints=second))
+    assert second.resumed_instructions == 2
+    assert result == expected
+
+
+def test_dead_variables_depend_on_suffix():
+    session = AnalysisSession()
+    config = ForwardAnalysisConfig(checkpoints=session, marginalize_dead_variables=True)
+    dist = SympyPGF.one("x", "y")
+
+    # y is dead after the second instruction, so the stored checkpoint no longer knows its value.
+    compute_discrete_distribution(pgcl.parse_pgcl(PREFIX + "x := x + 1"), dist, config)
+
+    edited = pgcl.parse_pgcl(PREFIX + "x := x + y")
+    result, _ = compute_discrete_distribution(edited, dist, config)
+    assert session.resumed_instructions < 2
+    expected, _ = compute_discrete_distribution(edited, dist, ForwardAnalysisConfig())
+    assert result == expected
+
+
+def test_keys_depend_on_invariant_contents_and_factorization(tmp_path):
+    invariant = tmp_path / "invariant.pgcl"
+    invariant.write_text("nat x;\nx := geometric(1/2)")
+    prog_info = ProgramInfo(pgcl.parse_pgcl(PREFIX + "while (x > 0) { x := x - 1 }"))
+    dist = SympyPGF.one("x", "y")
+    config = ForwardAnalysisConfig(
+        loop_policy=LoopPolicy(strategy=LoopPolicy.Strategy.INVARIANT, invariant_file=str(invariant)))
+
+    keys = checkpoint_keys(prog_info, dist, SympyPGF.zero("x", "y"), config)
+    invariant.write_text("nat x;\nx := 0")
+    edited = checkpoint_keys(prog_info, dist, SympyPGF.zero("x", "y"), config)
+    assert keys[:2] == edited[:2] and keys[2] != edited[2]
+
+    factorized = checkpoint_keys(prog_info, dist, SympyPGF.zero("x", "y"),
+                                 ForwardAnalysisConfig(loop_policy=config.loop_policy, factorize_distribution=True))
+    assert factorized[0] != edited[0]
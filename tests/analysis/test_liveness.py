@@ -0,0 +1,65 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.liveness import live_variables
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+
+def test_live_variables():
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+        nat z;
+
+        y := x + 1
+        z := 3
+        x := y * 2
+        if (z = 3) { x := x + 1 } else { skip }
+        ?Pr[x = 1]
+    """)
+    live = live_variables(program.instructions, program.variables.keys(), live_out=[])
+    assert live == [{"y"}, {"y", "z"}, {"x", "z"}, {"x"}, set()]
+
+
+def test_live_variables_in_loops():
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+        nat c;
+
+        while (c = 0) {
+            {c := 1} [1/2] {x := y}
+            y := y + 1
+        }
+        y := 0
+    """)
+    live = live_variables(program.instructions, program.variables.keys(), live_out=["x"])
+    assert live == [{"x"}, {"x"}]
+    assert live_variables(program.instructions[0].body, program.variables.keys(), live_out=["c", "x", "y"])[0] \
+           == {"c", "x", "y"}
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_marginalize_dead_variables(engine, factory):
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+        nat z;
+
+        {y := 1} [1/2] {y := 2}
+        {z := 1} [1/3] {z := 2}
+        x := y + z
+        y := 0
+        z := 5
+    """)
+    expected, _ = compute_discrete_distribution(program, factory.one(), ForwardAnalysisConfig(engine=engine))
+    result, _ = compute_discrete_distribution(
+        program, factory.one(), ForwardAnalysisConfig(engine=engine, marginalize_dead_variables=True))
+    assert result == expected
@@ -0,0 +1,50 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution, lower, ProgramPlan
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.instructionhandler.program_info import ProgramInfo
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+PROGRAM = """
+    nat x;
+    nat y;
+
+    {x := x + 1} [1/2] {y := y + 1}
+    if (x > y) {
+        x := x + 1
+    } else {
+        skip
+    }
+    loop(2) { y := y + 1 }
+"""
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_program_plan_agrees_with_compute_semantics(engine, factory):
+    expected, _ = compute_discrete_distribution(
+        pgcl.parse_pgcl(PROGRAM), factory.one(),
+        ForwardAnalysisConfig(engine=engine))
+    result, _ = compute_discrete_distribution(
+        pgcl.parse_pgcl(PROGRAM), factory.one(),
+        ForwardAnalysisConfig(engine=engine, use_program_plan=True))
+    assert result == expected
+
+
+def test_program_plan_reuses_lowered_blocks():
+    prog_info = ProgramInfo(pgcl.parse_pgcl(PROGRAM))
+    plan = ProgramPlan(prog_info)
+    assert plan.plan(prog_info.instructions) is plan.plan(prog_info.instructions)
+    branch = prog_info.instructions[1].true
+    assert plan.plan(branch) is plan.plan(branch)
+    assert len(plan.plan(prog_info.instructions).steps) == 3
+
+
+def test_lower_rejects_illegal_instructions():
+    with pytest.raises(TypeError):
+        lower(object())
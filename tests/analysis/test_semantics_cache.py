@@ -0,0 +1,81 @@
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.cache import SemanticsCache
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_cached_results_are_reused(engine, factory):
+    program = pgcl.parse_pgcl("""
+        nat x;
+        nat y;
+
+        {x := x + 1} [1/3] {y := y + 1}
+    """)
+    cache = SemanticsCache()
+    config = ForwardAnalysisConfig(engine=engine, semantics_cache=cache)
+    first, _ = compute_discrete_distribution(program, factory.one(), config)
+    misses = cache.misses
+    second, _ = compute_discrete_distribution(program, factory.one(), config)
+    assert first == second
+    assert cache.misses == misses
+    assert cache.hits > 0
+    assert first == factory.from_expr("1/3*x + 2/3*y", "x", "y")
+
+
+def test_cache_eviction():
+    program = pgcl.parse_pgcl("""
+        nat x;
+        x := x + 1
+    """)
+    cache = SemanticsCache(maxsize=1)
+    config = ForwardAnalysisConfig(semantics_cache=cache)
+    compute_discrete_distribution(program, SympyPGF.from_expr("x"), config)
+    compute_discrete_distribution(program, SympyPGF.from_expr("x^2"), config)
+    assert len(cache) == 1
+    compute_discrete_distribution(program, SympyPGF.from_expr("x"), config)
+    assert cache.hits == 0
+
+
+def test_blocks_with_queries_are_not_cached():
+    program = pgcl.parse_pgcl("""
+        nat x;
+        x := x + 1
+        ?Pr[x = 1]
+    """)
+    cache = SemanticsCache()
+    config = ForwardAnalysisConfig(semantics_cache=cache)
+    compute_discrete_distribution(program, SympyPGF.one(), config)
+    compute_discrete_distribution(program, SympyPGF.one(), config)
+    assert len(cache) == 0
+    assert cache.hits == 0
+
+
+def test_cache_is_bounded_and_respects_configuration():
+    source = """
+        nat x;
+        x := x + 1
+    """
+    cache = SemanticsCache(maxsize=2)
+    config = ForwardAnalysisConfig(semantics_cache=cache)
+    for _ in range(5):
+        # Every parsed program consists of fresh instruction objects, which must not be retained indefinitely.
+        compute_discrete_distribution(pgcl.parse_pgcl(source), SympyPGF.one("x"), config)
+    assert len(cache._instruction_keys) <= 2
+    hits = cache.hits
+    assert hits > 0
+
+    try:
+        compute_discrete_distribution(pgcl.parse_pgcl(source), SympyPGF.one("x"),
+                                      ForwardAnalysisConfig(semantics_cache=cache, use_rings=True))
+    finally:
+        ForwardAnalysisConfig()
+    assert cache.hits == hits
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from probably import pgcl as pgcl
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.analysis.trace import Trace
+from prodigy.distribution.fast_generating_function import ProdigyPGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.symengine_distribution import SymenginePGF
+
+PROGRAM = """
+    nat x;
+    nat y;
+
+    x := 3
+    if (x = 3) {
+        y := x + 1
+    } else {
+        skip
+    }
+"""
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SYMPY, SympyPGF),
+                          (ForwardAnalysisConfig.Engine.GINAC, ProdigyPGF),
+                          (ForwardAnalysisConfig.Engine.SYMENGINE, SymenginePGF)])
+def test_trace(engine, factory, tmp_path):
+    trace = Trace()
+    program = pgcl.parse_pgcl(PROGRAM)
+    compute_discrete_distribution(program, factory.one("x", "y"), ForwardAnalysisConfig(engine=engine, trace=trace))
+
+    assert sorted(event.position for event in trace.events) == [(0,), (1,), (1, 0, 0), (1, 1, 0)]
+    handlers = {event.position: event.handler for event in trace.events}
+    assert handlers == {(0,): "AssignmentHandler", (1,): "ITEHandler", (1, 0, 0): "AssignmentHandler",
+                        (1, 1, 0): "skip"}
+    first, ite = trace.events[0], trace.events[-1]
+    assert first.output.variables == 2
+    assert first.output.finite
+    assert ite.duration >= max(event.duration for event in trace.events if len(event.position) == 3)
+
+    trace.write(tmp_path / "trace.jsonl")
+    lines = (tmp_path / "trace.jsonl").read_text().splitlines()
+    assert len(lines) == len(trace.events)
+    assert json.loads(lines[0])["handler"] == trace.events[0].handler
+
+    trace.write(tmp_path / "trace.json", Trace.Format.CHROME)
+    chrome = json.loads((tmp_path / "trace.json").read_text())
+    assert len(chrome["traceEvents"]) == len(trace.events)
+    assert all(event["ph"] == "X" for event in chrome["traceEvents"])
+
+
+def test_trace_positions_of_top_level_instructions():
+    trace = Trace()
+    config = ForwardAnalysisConfig(trace=trace, marginalize_dead_variables=True)
+    compute_discrete_distribution(pgcl.parse_pgcl(PROGRAM), SympyPGF.one("x", "y"), config)
+    assert sorted(event.position for event in trace.events) == [(0,), (1,), (1, 0, 0), (1, 1, 0)]
@@ -97,11 +97,9 @@ class TestDistributionInterface:
         for i, term in enumerate(gf):
             if i >= 11:
                 break
-            print(term)
             generated_terms.append(term)
 
-        # FIXME Multivariate iteration sometimes swaps the values of variables
-        # assert generated_terms == expected_terms
+        assert generated_terms == expected_terms
 
     def test_copy(self):
         gf = create_random_gf(3, 5)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from probably.pgcl.parser import parse_expr
+
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.distribution import State
+from prodigy.distribution.dense_distribution import DenseDist, DensePGF
+from prodigy.distribution.generating_function import SympyPGF
+
+
+def test_from_expr():
+    dist = DensePGF.from_expr("1/2*x^2*y + 0.5*y", "x", "y")
+    assert dist.get_probability_mass() == "1.0"
+    assert dist._array.shape == (3, 2)
+    assert set(dist) == {("0.5", State({"x": 2, "y": 1})), ("0.5", State({"x": 0, "y": 1}))}
+    assert DensePGF.from_expr("1/4*x + 3/4", "x") == SympyPGF.from_expr("1/4*x + 3/4", "x")
+
+    with pytest.raises(ValueError):
+        DensePGF.from_expr("p*x", "x")
+
+
+def test_update():
+    dist = DensePGF.from_expr("1/2*x*y^3 + 1/2*x^4*y", "x", "y")
+    assert dist.update(parse_expr("x = y * x")) == DensePGF.from_expr("1/2*x^3*y^3 + 1/2*x^4*y", "x", "y")
+    assert dist.update(parse_expr("x = x % 3")) == DensePGF.from_expr("1/2*x*y^3 + 1/2*x*y", "x", "y")
+    assert dist.update(parse_expr("x = y - 1")).filter(parse_expr("x = 2")).get_probability_mass() == "0.5"
+
+
+def test_set_variables():
+    dist = DensePGF.from_expr("1/2*x*y^3 + 1/2*x", "x", "y")
+    assert dist.set_variables("z", "x", "y")._array.shape == (1, 2, 4)
+    with pytest.raises(ValueError):
+        dist.set_variables("x")
+
+
+def test_dtype():
+    assert DensePGF.binomial("x", "4", "1/2")._array.dtype == np.float64
+
+    factory = ForwardAnalysisConfig(engine=ForwardAnalysisConfig.Engine.NUMPY, use_long_double=True).factory
+    precise = factory.binomial("x", "4", "1/2")
+    assert precise._array.dtype == np.longdouble
+    assert precise.factory().one("x")._array.dtype == np.longdouble
+    assert DensePGF.binomial("x", "4", "1/2")._array.dtype == np.float64
+
+
+def test_hash_respects_tolerance():
+    dist = DensePGF.from_expr("1/2*x*y^3 + 1/2", "x", "y")
+    # Equality is up to the tolerance, so the hash must not depend on the exact probabilities.
+    close = dist + DensePGF.from_expr("1/2", "x", "y") * DenseDist.tolerance / 2
+    assert close == dist and hash(close) == hash(dist)
+    assert dist.canonical_key() != dist.filter(parse_expr("x = 0")).canonical_key()
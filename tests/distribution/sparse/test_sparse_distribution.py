@@ -0,0 +1,31 @@
+from fractions import Fraction
+
+from probably.pgcl.parser import parse_expr
+
+from prodigy.distribution import State
+from prodigy.distribution.sparse_distribution import SparseDist, SparsePGF
+
+
+def test_exact_rationals():
+    dist = SparsePGF.from_expr("1/2*x^2*y + 0.5*y", "x", "y")
+    assert dist.get_probability_mass() == "1"
+    assert set(dist) == {("1/2", State({"x": 2, "y": 1})), ("1/2", State({"x": 0, "y": 1}))}
+
+    dist = SparsePGF.binomial("x", "4", "1/2")
+    assert dist.get_expected_value_of("x") == "2"
+    assert dist.get_expected_value_of("x * x") == "5"
+    assert isinstance(dist._terms[(2,)], Fraction)
+    assert dist == SparseDist({(k,): Fraction([1, 4, 6, 4, 1][k], 16) for k in range(5)}, ("x",))
+    assert dist.filter(parse_expr("x % 3 = 1")).get_probability_mass() == "5/16"
+
+
+def test_parameters():
+    dist = SparsePGF.from_expr("1/3*x + 2/3", "x")
+    assert dist * "p" == SparsePGF.from_expr("p/3*x + 2*p/3", "x")
+    assert (dist * "p").get_parameters() == {"p"}
+    assert SparsePGF.from_expr("1/2*x*y^3 + 1/2*x", "x", "y").set_variables("x").get_parameters() == {"y"}
+
+
+def test_coefficients():
+    dist = SparsePGF.from_expr("1/2*x*y^3 + 1/4*x^2 + 1/4", "x", "y")
+    assert dist.coefficients({"x": 1, "y": 3}) == {State({"x": 1, "y": 3}): "1/2", State({"x": 0, "y": 0}): "1/4"}
@@ -566,7 +566,11 @@ class TestDistributionInterface:
         gf = SymengineDist("(1/11)*(1/2 + (1/2)*y)**10*(-1 + x**11)/(-1 + x)")
         assert gf._s_func.subs("x", 1).simplify() == se.nan
         assert gf.safe_subs("x", 1) == se.S("(1/1024)*(1 + y)**10")
-        # TODO add test for limit
+
+        # Roots of higher multiplicity are cancelled as well
+        gf = SymengineDist("(1 - x)**2 * y / (1 - 2*x + x**2)")
+        assert gf.safe_subs("x", 1) == se.S("y")
+        assert SymenginePGF.geometric("x", "p").coefficient_sum() == 1
 
     def test_update(self):
         gf = SymengineDist("(1-sqrt(1-c**2))/c")
@@ -651,7 +655,13 @@ class TestDistributionInterface:
                 pass
 
     def test_approximate_unilaterally(self):
-        pass    # TODO
+        gf = SymengineDist("1/2 * x**3 + 1/4 * x**5 + 1/4 * x**7 * y", "x", "y")
+        assert gf.approximate_unilaterally("x", "3/4") == SymengineDist("1/2 * x**3 + 1/4 * x**5", "x", "y")
+        assert list(gf) == [("1/2", State({"x": 3, "y": 0})), ("1/4", State({"x": 5, "y": 0})),
+                            ("1/4", State({"x": 7, "y": 1}))]
+
+        gf = SymengineDist("1/(2-x)", "x")
+        assert gf.approximate_unilaterally("x", "3/4") == SymengineDist("1/2 + 1/4 * x", "x")
 
     def test_arithmetic_progression(self):
         pass    # TODO
@@ -735,3 +745,10 @@ class TestDistributionInterface:
         with pytest.raises(NotImplementedError):
             gf1.hadamard_product(gf2)
 
+
+def test_coefficients():
+    dist = SymengineDist("exp(y - 1) / (2 - x)", "x", "y")
+    coefficients = dist.coefficients({"x": 3, "y": 1})
+    assert len(coefficients) == 8
+    assert se.S(coefficients[State({"x": 2, "y": 1})]) == se.S("exp(-1) / 8")
+    assert dist.filter(parse_expr("x <= 2")) == SymengineDist("exp(y - 1) * (1/2 + x/4 + x^2/8)", "x", "y")
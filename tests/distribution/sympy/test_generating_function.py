@@ -1,3 +1,4 @@
+import itertools
 import random
 
 import pytest
@@ -7,7 +8,8 @@ from probably.pgcl.parser import parse_expr
 
 from prodigy.distribution.distribution import MarginalType, State
 from prodigy.distribution.generating_function import (GeneratingFunction,
-                                                      SympyPGF)
+                                                      SympyPGF,
+                                                      _differs_at_random_point)
 
 
 def create_random_gf(number_of_variables: int = 1, terms: int = 1):
@@ -313,3 +315,153 @@ def test_predefined_variable_names(name):
     assert len(gf.get_parameters()) == 1
     assert gf.update(parse_expr('x = 2')) == GeneratingFunction(
         f'{name}*x^2', 'x')
+
+
+def test_canonical_key():
+    gf = GeneratingFunction("(1 - x^2) / (2 * (1 - x))", "x")
+    same = GeneratingFunction("1/2 + x/2", "x")
+    assert gf.canonical_key() == same.canonical_key()
+    assert hash(gf) == hash(same)
+    assert len({gf, same, GeneratingFunction("x", "x")}) == 2
+    assert gf.canonical_key() != GeneratingFunction("1/2 + x/2", "x", "y").canonical_key()
+    assert gf.canonical_key() != same.set_parameters("x").canonical_key()
+
+
+def test_equality_precheck(monkeypatch):
+    gf = GeneratingFunction("(1 - x^2) / (2 * (1 - x)) * exp(y - 1)", "x", "y")
+    assert gf == GeneratingFunction("(1/2 + x/2) * exp(y - 1)", "x", "y")
+
+    # Inequality is detected by evaluation, without symbolic simplification.
+    def fail(*args, **kwargs):
+        raise AssertionError("symbolic equality check was used")
+
+    monkeypatch.setattr(sympy.Expr, "equals", fail)
+    assert gf != GeneratingFunction("(1/2 + x/2) * exp(y - 1) + x^40 / 10^12", "x", "y")
+    assert gf != GeneratingFunction("1/(2 - x) * exp(y - 1)", "x", "y")
+
+    # The sample points only depend on the compared expressions.
+    points = []
+    monkeypatch.setattr(sympy.Expr, "xreplace", lambda self, rule: points.append(tuple(rule.values())) or self)
+    for _ in range(2):
+        _differs_at_random_point(sympy.S("x + y"), sympy.S("x*y"), 3)
+        _differs_at_random_point(sympy.S("x*y"), sympy.S("x + y"), 3)
+    assert len(points) == 24 and len(set(points)) == 3
+
+
+def test_coefficients():
+    gf = GeneratingFunction("exp(y - 1) / (2 - x)", "x", "y")
+    coefficients = gf.coefficients({"x": 3, "y": 1})
+    assert len(coefficients) == 8
+    assert sympy.S(coefficients[State({"x": 2, "y": 1})]) == sympy.S("exp(-1) / 8")
+    assert gf.filter(parse_expr("x <= 2")) == GeneratingFunction("exp(y - 1) * (1/2 + x/4 + x^2/8)", "x", "y")
+    with pytest.raises(ValueError):
+        gf.coefficients({"x": 3})
+
+    # Iterating infinite distributions reuses the expanded coefficients.
+    assert list(gf.marginal("x").approximate(4))[-1] == \
+        GeneratingFunction("1/2 + x/4 + x^2/8 + x^3/16", "x")
+
+
+def test_coefficient_iterator():
+    gf = GeneratingFunction("(1 + y) / (2 * (2 - x) * (3 - x))", "x", "y")
+    coefficients = list(itertools.islice(gf.coefficient_iterator("x"), 4))
+    assert [sympy.expand(c) for c in coefficients] == [sympy.expand(f"({n}) / (2 * {d}) * (1 + y)")
+                                                       for n, d in [(1, 6), (5, 36), (19, 216), (65, 1296)]]
+    numeric = list(itertools.islice(GeneratingFunction("1 / (2 - x)").coefficient_iterator("x", numeric=True), 3))
+    assert [float(c) for c in numeric] == [0.5, 0.25, 0.125]
+    assert list(itertools.islice(GeneratingFunction("exp(x - 1)").coefficient_iterator("x"), 3)) == \
+        ["exp(-1)", "exp(-1)", "exp(-1)/2"]
+
+    # Iteration of univariate rational functions streams the coefficients.
+    terms = list(itertools.islice(GeneratingFunction("1 / (2 - x)"), 3))
+    assert terms == [("1/2", State({"x": 0})), ("1/4", State({"x": 1})), ("1/8", State({"x": 2}))]
+
+
+def test_lazy_finiteness():
+    gf = GeneratingFunction("x*y + 1/2", "x", "y")
+    assert gf._finite is None and gf._closed is None
+    assert gf.is_finite() and gf._finite
+
+    # Finiteness is known for sums and products of polynomials without recomputation.
+    result = gf * gf + gf
+    assert result._finite
+    assert (gf / "2")._finite
+    assert (gf / GeneratingFunction("1 - x", "x"))._finite is None
+    assert not (gf / GeneratingFunction("1 - x", "x")).is_finite()
+    assert gf.copy()._finite and gf.copy()._closed is None
+    assert not gf.marginal("x")._is_closed_form
+
+
+def test_scoped_assumptions():
+    size = len(sympy.assumptions.global_assumptions)
+    gf = GeneratingFunction("p * x", "x")
+    assert len(sympy.assumptions.global_assumptions) == size
+
+    x, p = sympy.Symbol("x", real=True), sympy.Symbol("p", real=True)
+    with gf.assumptions():
+        assert sympy.ask(sympy.Q.nonnegative(x))
+        assert sympy.ask(sympy.Q.positive(p))
+    assert sympy.ask(sympy.Q.nonnegative(x)) is None
+
+
+def test_ring_engine():
+    GeneratingFunction.use_rings = True
+    try:
+        gf = GeneratingFunction("p * x / (1 - (1 - p) * x)", "x")
+        product = gf * GeneratingFunction("y / 2 + 1 / 2", "y")
+        assert product._expr is None
+        assert product.get_variables() == {"x", "y"} and product.get_parameters() == {"p"}
+        assert product.coefficient_sum() == 1
+        assert product.marginal("x") == gf
+        assert product == GeneratingFunction("p * x * (y + 1) / (2 - 2 * (1 - p) * x)", "x", "y")
+        assert not product.is_finite()
+        assert (gf - gf).is_zero_dist()
+
+        # Floats and transcendental functions are not represented in the ring.
+        assert GeneratingFunction("exp(x - 1)", "x")._as_fraction() is None
+        assert (GeneratingFunction("1 / (2 - x)", "x") * GeneratingFunction("exp(y - 1)", "y")).coefficient_sum() == 1
+
+        coefficients = list(itertools.islice(GeneratingFunction("1 / (2 - x)").coefficient_iterator("x"), 3))
+        assert coefficients == ["1/2", "1/4", "1/8"]
+
+        # The expression is only computed for printing or operations without a ring implementation.
+        expected = GeneratingFunction("p * x * (y + 1) / (2 - 2 * (1 - p) * x)", "x", "y")
+        assert sympy.simplify(product._function - expected._function) == 0
+    finally:
+        GeneratingFunction.use_rings = False
+
+
+def test_marginal_removable_singularity():
+    gf = GeneratingFunction("(1 - x**3) / (3 * (1 - x)) * (1 - y**2) / (2 * (1 - y)) * z", "x", "y", "z")
+    assert gf.marginal("z") == GeneratingFunction("z", "z")
+    assert gf.marginal("x", method=MarginalType.EXCLUDE) == GeneratingFunction("(1 + y) / 2 * z", "y", "z")
+    assert gf.coefficient_sum() == 1
+    assert GeneratingFunction("1 / (1 - x)", "x").coefficient_sum() == sympy.oo
+
+
+def test_compiled_exhaustive_search():
+    gf = GeneratingFunction("1/6 * (1 + x + x^2) * (y + y^3)", "x", "y")
+    assert gf.filter(parse_expr("x * y > 3")) == GeneratingFunction("1/6 * x^2 * y^3", "x", "y")
+    assert gf.filter(parse_expr("x / 2 = y")) == GeneratingFunction("1/6 * x^2 * y", "x", "y")
+    assert gf.filter(parse_expr("x - y >= 0 | not (y < 2)")) == GeneratingFunction(
+        "1/6 * (x + x^2) * y + 1/6 * (1 + x + x^2) * y^3", "x", "y")
+    assert gf.filter(parse_expr("x * 0.5 < y & x = 2")) == GeneratingFunction("1/6 * x^2 * y^3", "x", "y")
+
+
+def test_disjoint_filtering(monkeypatch):
+    gf = GeneratingFunction("1/10 * (1 - x^10) / (1 - x)", "x")
+    condition = parse_expr("(x < 3 | x > 6) & not (x = 1) | x = 5")
+    assert gf.filter(condition) == GeneratingFunction("1/10 * (1 + x^2 + x^5 + x^7 + x^8 + x^9)", "x")
+    assert gf.filter(parse_expr("not (x < 3 | x >= 3)")).is_zero_dist()
+
+    # Each atomic constraint is filtered at most once along every branch of the expansion.
+    calls = []
+    original = GeneratingFunction._filter_constant_condition
+
+    def counting(self, condition):
+        calls.append(str(condition))
+        return original(self, condition)
+
+    monkeypatch.setattr(GeneratingFunction, "_filter_constant_condition", counting)
+    gf.filter(parse_expr("x < 2 | x < 4 | x < 6 | x < 8"))
+    assert len(calls) <= 8
@@ -0,0 +1,129 @@
+import pytest
+from probably import pgcl
+from probably.pgcl.parser import parse_expr
+
+from prodigy.analysis.analyzer import compute_discrete_distribution
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.distribution import MarginalType, State
+from prodigy.distribution.dense_distribution import DensePGF
+from prodigy.distribution.generating_function import SympyPGF
+from prodigy.distribution.sparse_distribution import SparsePGF
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_from_expr(engine, factory):
+    dist = factory.from_expr("1/2*x^2*y + 0.5*y", "x", "y")
+    assert dist.get_variables() == {"x", "y"}
+    assert float(dist.get_probability_mass()) == pytest.approx(1)
+    assert {state for _, state in dist} == {State({"x": 2, "y": 1}), State({"x": 0, "y": 1})}
+
+    with pytest.raises(ValueError):
+        factory.from_expr("1/(2-x)", "x")
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_arithmetic(engine, factory):
+    dist = factory.from_expr("1/4*x + 3/4", "x")
+    assert dist * "1/2" + dist * "1/2" == dist
+    assert (dist - dist).is_zero_dist()
+    assert dist * factory.from_expr("y", "y") == factory.from_expr("1/4*x*y + 3/4*y", "x", "y")
+    assert dist * dist == factory.from_expr("1/16*x^2 + 6/16*x + 9/16", "x")
+    assert dist / "2" == factory.from_expr("1/8*x + 3/8", "x")
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_filter(engine, factory):
+    dist = factory.uniform("x", "0", "5") * factory.bernoulli("y", "1/2")
+    assert dist.filter(parse_expr("x < 2 & y = 1")) == factory.from_expr("1/12*y + 1/12*x*y", "x", "y")
+    assert float(dist.filter(parse_expr("x % 3 = 1")).get_probability_mass()) == pytest.approx(1 / 3)
+    assert float(dist.filter(parse_expr("not (x = y)")).get_probability_mass()) == pytest.approx(5 / 6)
+    assert float(dist.get_probability_of(parse_expr("x * y > 3"))) == pytest.approx(1 / 6)
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_update(engine, factory):
+    dist = factory.from_expr("1/2*x*y^3 + 1/2*x^4*y", "x", "y")
+    assert dist.update(parse_expr("x = x + 2*y")) == factory.from_expr("1/2*x^7*y^3 + 1/2*x^6*y", "x", "y")
+    assert float(dist.update(parse_expr("x = y - 1")).filter(parse_expr("x = 2")).get_probability_mass()) == \
+        pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        dist.update(parse_expr("x = x - y"))
+    with pytest.raises(ValueError):
+        dist.update(parse_expr("x = x / 2"))
+    assert dist.update_affine({"x": (1, {"y": 2}), "y": (0, {"x": 1})}) == \
+        factory.from_expr("1/2*x^7*y + 1/2*x^3*y^4", "x", "y")
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_update_iid(engine, factory):
+    dist = factory.from_expr("1/2*n + 1/2*n^2", "n", "x")
+    result = dist.update_iid(parse_expr("bernoulli(1/2)"), parse_expr("n"), "x")
+    assert result == factory.from_expr("1/4*n + 1/4*n*x + 1/8*n^2 + 1/4*n^2*x + 1/8*n^2*x^2", "n", "x")
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_marginal_and_variables(engine, factory):
+    dist = factory.from_expr("1/2*x*y^3 + 1/2*x", "x", "y")
+    assert dist.marginal("x") == factory.from_expr("x", "x")
+    assert dist.marginal("x", method=MarginalType.EXCLUDE) == factory.from_expr("1/2*y^3 + 1/2", "y")
+    assert dist.set_variables("x", "y", "z").get_variables() == {"x", "y", "z"}
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_expected_value_and_normalize(engine, factory):
+    dist = factory.binomial("x", "4", "1/2")
+    assert float(dist.get_expected_value_of("x")) == pytest.approx(2)
+    assert float(dist.get_expected_value_of("x * x")) == pytest.approx(5)
+    assert (dist * "1/4").normalize() == dist
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_analysis_agrees_with_sympy(engine, factory):
+    program = pgcl.parse_pgcl("""
+        nat c1;
+        nat c2;
+        nat counter;
+
+        c1 := unif(0, 2)
+        {c2 := 1} [1/3] {c2 := 0}
+        if (c1 + c2 > 1) {
+            counter := counter + c1
+        } else {
+            observe(c1 < 2)
+        }
+    """)
+    expected, expected_error = compute_discrete_distribution(
+        program, SympyPGF.one("c1", "c2", "counter"), ForwardAnalysisConfig())
+    initial = factory.one("c1", "c2", "counter")
+    result, error = compute_discrete_distribution(program, initial, ForwardAnalysisConfig(engine=engine))
+    assert isinstance(result, type(initial))
+    assert result == expected
+    assert float(error.get_probability_mass()) == pytest.approx(float(expected_error.get_probability_mass()))
+
+
+@pytest.mark.parametrize('engine,factory',
+                         [(ForwardAnalysisConfig.Engine.SPARSE, SparsePGF),
+                          (ForwardAnalysisConfig.Engine.NUMPY, DensePGF)])
+def test_canonical_key(engine, factory):
+    dist = factory.from_expr("1/2*x*y^3 + 1/2", "x", "y")
+    reordered = factory.from_expr("1/2 + 1/2*y^3*x", "y", "x")
+    assert dist == reordered and hash(dist) == hash(reordered)
+    assert dist.canonical_key() == reordered.canonical_key()
+    assert {dist: 1}[reordered] == 1
+    assert dist.canonical_key() != (dist * "1/2").canonical_key()
@@ -0,0 +1,69 @@
+import pytest
+from probably.pgcl.parser import parse_expr
+
+from prodigy.analysis.config import ForwardAnalysisConfig
+from prodigy.distribution.dense_distribution import DensePGF
+from prodigy.distribution.truncated_distribution import TruncatedDist, TruncatedPGF
+
+
+@pytest.fixture
+def factory():
+    return ForwardAnalysisConfig(engine=ForwardAnalysisConfig.Engine.TRUNCATED, truncation_degree=20).factory
+
+
+def test_geometric_tracks_tail_mass(factory):
+    dist = factory.geometric("x", "1/2")
+    assert dist._array.shape == (21,)
+    assert float(dist.get_truncation_error()) == pytest.approx(0.5 ** 21)
+    assert float(dist.get_probability_mass()) + float(dist.get_truncation_error()) == pytest.approx(1)
+    assert float(dist.filter(parse_expr("x < 3")).get_probability_mass()) == pytest.approx(0.875)
+
+
+def test_poisson_and_log(factory):
+    dist = factory.poisson("x", "3")
+    assert float(dist.get_expected_value_of("x")) == pytest.approx(3, abs=1e-4)
+    assert float(dist.get_truncation_error()) < 1e-5
+    assert float(factory.log("x", "1/2").get_probability_mass()) == pytest.approx(1, abs=1e-6)
+
+
+def test_from_rational_expression(factory):
+    dist = factory.from_expr("1/(2-x)", "x")
+    assert float(dist.filter(parse_expr("x = 3")).get_probability_mass()) == pytest.approx(1 / 16)
+    assert float(dist.get_truncation_error()) == pytest.approx(0.5 ** 21)
+
+    joint = factory.from_expr("1/((2-x)*(2-y))", "x", "y")
+    assert float(joint.marginal("x").filter(parse_expr("x = 3")).get_probability_mass()) == pytest.approx(1 / 16)
+    assert float(joint.get_probability_mass()) + float(joint.get_truncation_error()) == pytest.approx(1)
+
+    with pytest.raises(ValueError):
+        factory.from_expr("exp(x - 1)", "x")
+
+
+def test_operations_propagate_error(factory):
+    dist = factory.geometric("x", "1/2")
+    error = float(dist.get_truncation_error())
+    assert float((dist * "1/2").get_truncation_error()) == pytest.approx(error / 2)
+    assert float((dist + dist).get_truncation_error()) == pytest.approx(2 * error)
+
+    # Updates which exceed the degree move probability mass into the error.
+    shifted = dist.update(parse_expr("x = x + 5"))
+    assert float(shifted.get_probability_mass()) + float(shifted.get_truncation_error()) == pytest.approx(1)
+
+    # Convolutions of overlapping variables also truncate.
+    square = dist * factory.from_expr("1/(2-x)", "x")
+    assert isinstance(square, TruncatedDist)
+    assert square._array.shape == (21,)
+    assert float(square.get_probability_mass()) + float(square.get_truncation_error()) == pytest.approx(1)
+
+
+def test_finite_distributions_are_exact(factory):
+    dist = factory.binomial("x", "4", "1/2")
+    assert dist == DensePGF.binomial("x", "4", "1/2")
+    assert dist.get_truncation_error() == "0.0"
+
+
+def test_degree_is_kept_by_distributions(factory):
+    dist = factory.geometric("x", "1/2")
+    assert TruncatedPGF.geometric("x", "1/2")._array.shape == (101,)
+    assert dist.factory().geometric("y", "1/2")._array.shape == (21,)
+    assert (dist * TruncatedPGF.geometric("y", "1/2"))._array.shape == (21, 21)